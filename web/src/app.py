@@ -29,6 +29,11 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 from src.models import *
 db.init_app(app)
 
+# tasks are kept in memory unless TASK_STORE=database, see services.task_store
+from src.services.task_manager import task_manager
+from src.services.task_store import create_task_store
+task_manager.use_store(create_task_store(app))
+
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)
@@ -58,6 +63,12 @@ import src.controllers.user_controller  # Register user management routes
 
 import src.services.metrics_service as metrics_service
 from src.utilities.auth import login_required, repository_access_required
+from src.services.fetch_coordinator import fetch_coordinator
+
+# Keep the cached clones that were used recently up to date in the background (0 disables it)
+FETCH_SCHEDULER_INTERVAL = float(os.getenv('FETCH_SCHEDULER_INTERVAL', '0'))
+if FETCH_SCHEDULER_INTERVAL > 0:
+    fetch_coordinator.start_scheduler(FETCH_SCHEDULER_INTERVAL)
 
 
 @app.route('/', methods=['GET'])
@@ -93,13 +104,47 @@ def dashboard(owner, name):
     try:
         repo = repository_service.get_repository_by_owner_and_name(owner, name)
         branches = branch_service.get_branches_by_repository_id(repo.id)
+        onboarding_task_id = request.args.get('task_id')  # Set right after the repository is created
 
-        return render_template('dashboard.html', repository=repo, branches=branches)
+        return render_template('dashboard.html', repository=repo, branches=branches, onboarding_task_id=onboarding_task_id)
     except Exception as e:
         print(str(e))
         return render_template('dashboard.html', repository=None, branches=None)
 
 
+def _start_debt_evolution_task(repo_id, branch_id, start_date, end_date, incremental, sampling, refine):
+    """
+        Start the debt evolution calculation of a range in the background, or attach to the one
+        already running for the same parameters. Returns the id of the task.
+    """
+    from src.services.task_manager import task_key, task_manager
+
+    key = task_key("debt_evolution", repo_id, branch_id, start_date, end_date, incremental, sampling, refine)
+    task_id, created = task_manager.create_or_get_task("debt_evolution", key)
+    if not created:
+        return task_id
+
+    def _run_debt_calc(task_id, repo_id, branch_id, start_date, end_date, incremental, sampling, refine):
+        return metrics_service.calculate_debt_evolution(
+            repo_id, branch_id, start_date, end_date, task_id, incremental, sampling, refine,
+            cancellation=task_manager.cancellation_token(task_id)
+        )
+
+    task_manager.run_task_in_background(
+        task_id,
+        _run_debt_calc,
+        app,  # Pass Flask app for context
+        repo_id,
+        branch_id,
+        start_date,
+        end_date,
+        incremental,
+        sampling,
+        refine
+    )
+    return task_id
+
+
 @app.route('/debt_evolution/<owner>/<name>/', methods=['GET'])
 @login_required
 @repository_access_required('read')
@@ -126,6 +171,9 @@ def debt_evolution(owner, name):
         end_date = request.args.get('end_date', default_end_date)
         branch_name = request.args.get('branch', 'main' if branches else None)
         task_id = request.args.get('task_id')  # Check if we're polling for results
+        incremental = request.args.get('incremental') == '1'  # Only analyze files changed between commits
+        sampling = metrics_service.parse_sampling(request.args.get('sampling'))  # Coarse series first: day, week or every N-th commit
+        refine = request.args.get('refine') != '0'  # Fill in the commits between the samples
         
         # Find the selected branch or use the first one
         selected_branch = None
@@ -154,26 +202,12 @@ def debt_evolution(owner, name):
                             start_date=start_date,
                             end_date=end_date)
                     else:
-                        # Still loading
+                        # Still loading, show the coarser series while it is refined
+                        debt_data = task.partial_result or []
                         is_loading = True
                 else:
-                    # Task not found, may have been cleaned up - start new one
-                    new_task_id = task_manager.create_task("debt_evolution")
-                    
-                    def _run_debt_calc(task_id, repo_id, branch_id, start_date, end_date):
-                        return metrics_service.calculate_debt_evolution(
-                            repo_id, branch_id, start_date, end_date, task_id
-                        )
-                    
-                    task_manager.run_task_in_background(
-                        new_task_id,
-                        _run_debt_calc,
-                        app,  # Pass Flask app for context
-                        repo.id,
-                        selected_branch.id,
-                        start_date,
-                        end_date
-                    )
+                    # Task not found, may have been cleaned up - start new one (or attach to the same running one)
+                    new_task_id = _start_debt_evolution_task(repo.id, selected_branch.id, start_date, end_date, incremental, sampling, refine)
                     
                     # Redirect to same page with new task_id
                     return redirect(url_for('debt_evolution', 
@@ -182,27 +216,21 @@ def debt_evolution(owner, name):
                         task_id=new_task_id,
                         start_date=start_date,
                         end_date=end_date,
-                        branch=selected_branch.name))
+                        branch=selected_branch.name,
+                        incremental='1' if incremental else None,
+                        sampling=sampling,
+                        refine=None if refine else '0'))
             else:
-                # No task_id - check if we need to start a new calculation
-                # For now, just calculate synchronously for small datasets or start async
-                # We'll start it async and return loading state
-                new_task_id = task_manager.create_task("debt_evolution")
-                
-                def _run_debt_calc(task_id, repo_id, branch_id, start_date, end_date):
-                    return metrics_service.calculate_debt_evolution(
-                        repo_id, branch_id, start_date, end_date, task_id
-                    )
-                
-                task_manager.run_task_in_background(
-                    new_task_id,
-                    _run_debt_calc,
-                    app,  # Pass Flask app for context
-                    repo.id,
-                    selected_branch.id,
-                    start_date,
-                    end_date
+                # No task_id - render from the cache when the commits of the range did not change
+                debt_data = metrics_service.get_cached_debt_evolution(
+                    repo.id, selected_branch.id, start_date, end_date, incremental, sampling, refine
                 )
+
+            if debt_data is None:
+                # Otherwise start the calculation async and return loading state,
+                # only the commits without snapshots are analyzed. A refresh or a second tab
+                # attaches to the calculation already running for the same range
+                new_task_id = _start_debt_evolution_task(repo.id, selected_branch.id, start_date, end_date, incremental, sampling, refine)
                 
                 # Redirect to same page with task_id
                 return redirect(url_for('debt_evolution', 
@@ -211,7 +239,10 @@ def debt_evolution(owner, name):
                     task_id=new_task_id,
                     start_date=start_date,
                     end_date=end_date,
-                    branch=selected_branch.name))
+                    branch=selected_branch.name,
+                    incremental='1' if incremental else None,
+                    sampling=sampling,
+                    refine=None if refine else '0'))
 
         return render_template('debt_evolution.html', 
             repository=repo, 
@@ -221,6 +252,8 @@ def debt_evolution(owner, name):
             start_date=start_date,
             end_date=end_date,
             task_id=task_id,
+            sampling=sampling,
+            refine=refine,
             is_loading=is_loading)
     except Exception as e:
         print(f"Error in debt_evolution: {str(e)}")
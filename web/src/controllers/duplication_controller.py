@@ -5,6 +5,7 @@ from src.database.code_duplication_db_facade import CodeDuplicationDatabaseFacad
 from src.services.code_duplication_service import CodeDuplicationService
 from src.reports.duplication_report import DuplicationReport
 from src.utilities.extensions import Extensions
+from src.services.cancellation import CancellationToken
 
 class DuplicationController: 
     _singleton = None
@@ -38,7 +39,7 @@ class DuplicationController:
         self._tools["pmd_cpd"] = pmd_cpd
         return 
 
-    def find_duplications(self, tool : str, dir : str, files : list[File]):
+    def find_duplications(self, tool : str, dir : str, files : list[File], cancellation : CancellationToken = None):
 
         if len(files) > 0:
             #print(type(files[0]))
@@ -52,8 +53,12 @@ class DuplicationController:
             raise Exception(tool + " is not a valid duplication tool.")
         
         duplication_tool = self._tools[tool]
-        report_list = duplication_tool.run(dir, file_extensions)
+        cancellation = cancellation or CancellationToken()
+        # only the stored files are analyzed, the others were filtered out by github_service.fetch_files
+        report_list = duplication_tool.run(dir, file_extensions, cancellation, [file.name for file in files])
 
+        # nothing is written for a cancelled task
+        cancellation.check()
         self._service.insert_from_report(report_list, files)
         return
     
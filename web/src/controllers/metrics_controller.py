@@ -12,8 +12,12 @@ import src.services.metrics_service as metrics_service
 import src.services.branch_service as branch_service
 from src.services.code_duplication_service import *
 from src.database.code_duplication_db_facade import *
+from src.database.analysis_bulk_writer import AnalysisBulkWriter
 from src.services.metrics_service import * 
-from src.services.task_manager import task_manager
+from src.services.task_manager import task_key, task_manager
+from src.services.cancellation import CancellationToken
+from src.services.analysis_engine import analysis_engine
+from contextlib import closing
 import time
 import json
 
@@ -21,27 +25,36 @@ from src.controllers.recommendation_controller import RecommendationController
 from src.controllers.duplication_controller import DuplicationController
 from src.utilities.json_encoder import JsonEncoder
 
-def save_commit_and_analyse(repo : Repository, commit : Commit) -> list[File]: 
+def save_commit_and_analyse(repo : Repository, commit : Commit, cancellation : CancellationToken = None) -> list[File]: 
+    cancellation = cancellation or CancellationToken()
     files = file_service.get_files_by_commit_id(commit.id)
     
     if len(files) == 0: 
-        # we need to get the files
-        remote_files = github_service.fetch_files(repo.owner, repo.name, commit.sha)
+        try:
+            # we need to get the files
+            remote_files = github_service.fetch_files(repo.owner, repo.name, commit.sha)
+
+            # calculate the various metrics on the analysis workers, store them in db from here
+            entity_ids = {entity.name: entity.id for entity in identifiable_entity_service.get_all_identifiable_entities()}
+            writer = AnalysisBulkWriter(commit.id)
+            with closing(analysis_engine.analyze(remote_files, entity_ids)) as analysis:
+                for filename, functions, entity_lines in analysis:
+                    cancellation.check()
+                    writer.add_file(filename, functions, entity_lines, entity_ids)
+            cancellation.check()
+            files = writer.flush()
+
+            # duplications, the rows of the commit are committed with them
+            with github_service.lease_worktree(repo.owner, repo.name, commit.sha) as dir:
+                duplication_controller : DuplicationController = DuplicationController.singleton()
+                duplication_controller.find_duplications("pmd_cpd", dir, files, cancellation) 
+            db.session.commit()
+        except Exception:
+            # nothing of a cancelled (or failed) analysis is kept
+            db.session.rollback()
+            raise
 
-        # store the files in db 
-        for filename, code in remote_files:
-            file = file_service.create_file(filename, commit.id)
-
-            # calculate the various metrics here
-            metrics_service.calculate_cyclomatic_complexity_analysis(file, code)
-            metrics_service.calculate_identifiable_identities_analysis(file, code)
-    
         files = file_service.get_files_by_commit_id(commit.id)
-        dir = github_service.ensure_local_repo(repo.owner, repo.name)
-        
-        # duplications 
-        duplication_controller : DuplicationController = DuplicationController.singleton()
-        duplication_controller.find_duplications("pmd_cpd", dir, files) 
 
     return files
 
@@ -68,8 +81,10 @@ def get_recommendations(files : list[File], complexity : list, todofixme : list,
     return controller.get_recommendations(files, complexity, todofixme, duplication)
 
 
-def _run_metrics_calculation(task_id, repository_id, branch_id, commit_id, include_complexity, include_identifiable_identities, include_code_duplication):
-    """Background task for calculating metrics with progress tracking."""
+def _run_metrics_calculation(task_id, repository_id, branch_id, commit_id, include_complexity, include_identifiable_identities, include_code_duplication,
+                             cancellation=None):
+    """Background task for calculating metrics with progress tracking, stopped between files when `cancellation` is cancelled."""
+    cancellation = cancellation or task_manager.cancellation_token(task_id)
     try:
         task_manager.update_progress(task_id, 5, "Fetching commit data", "Loading commit information...")
         
@@ -77,7 +92,8 @@ def _run_metrics_calculation(task_id, repository_id, branch_id, commit_id, inclu
         repo = repository_service.get_repository_by_repository_id(repository_id)
         
         task_manager.update_progress(task_id, 15, "Analyzing files", "Fetching and analyzing repository files...")
-        files = save_commit_and_analyse(repo, commit)
+        with github_service.hold_local_repo(repo.owner, repo.name):
+            files = save_commit_and_analyse(repo, commit, cancellation)
         
         metrics = {
             "commit_sha": commit.sha,
@@ -89,6 +105,7 @@ def _run_metrics_calculation(task_id, repository_id, branch_id, commit_id, inclu
         }
 
         # Calculate complexity (25% of work)
+        cancellation.check()
         task_manager.update_progress(task_id, 30, "Calculating complexity", "Analyzing cyclomatic complexity...")
         cyclomatic_complexity_analysis = get_complexity(files)
         
@@ -101,6 +118,7 @@ def _run_metrics_calculation(task_id, repository_id, branch_id, commit_id, inclu
         duplication_analysis = get_duplications(files)
         
         # Generate recommendations (20% of work)
+        cancellation.check()
         task_manager.update_progress(task_id, 85, "Generating recommendations", "Creating actionable recommendations...")
         recommendation_analysis = get_recommendations(files, cyclomatic_complexity_analysis, identifiable_identities_analysis, duplication_analysis)
 
@@ -138,8 +156,14 @@ def display_metrics_by_commit_id():
     include_identifiable_identities = data.get('include_identifiable_identities')
     include_code_duplication = data.get('include_code_duplication')
     
-    # Create a task
-    task_id = task_manager.create_task("metrics_calculation")
+    # Create a task, or attach to the one already computing the same metrics of the commit
+    key = task_key("metrics_calculation", commit_id, bool(include_complexity), bool(include_identifiable_identities), bool(include_code_duplication))
+    task_id, created = task_manager.create_or_get_task("metrics_calculation", key)
+    if not created:
+        return jsonify({
+            "task_id": task_id,
+            "message": "Metrics calculation already running"
+        })
     
     # Start the calculation in the background
     task_manager.run_task_in_background(
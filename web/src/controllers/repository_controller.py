@@ -6,14 +6,8 @@ from src.app import app, db
 from src.utilities.auth import login_required
 from src.models.model import RepositoryAccess
 
-from datetime import datetime
-
-from flask_sqlalchemy import SQLAlchemy
-
 import src.services.repository_service as repository_service
-import src.services.branch_service as branch_service
-import src.services.github_service as github_service
-import src.services.commit_service as commit_service
+from src.services.task_manager import task_key, task_manager
 
 
 @app.route('/create_repository', methods=['POST'])
@@ -45,21 +39,14 @@ def create_repository():
         db.session.add(access)
         db.session.commit()
 
-    # store all the branches
-    branches = branch_service.create_branches_from_repository(repo.id)
+    # store the branches and their latest commits in the background, once per repository
+    task_id, created = task_manager.create_or_get_task("repository_onboarding", task_key("repository_onboarding", repo.id))
 
-    # store the commits for the 10 latest commits
-    for branch in branches:
-        commits = github_service.get_latest_commits(owner, name, branch.name)
+    def _run_onboarding(task_id, repository_id):
+        return repository_service.onboard_repository(repository_id, task_id)
 
-        for commit in commits:
-            sha = commit.get('hash')
-            date = datetime.fromisoformat(commit.get('date'))
-            author = commit.get('author')
-            message = commit.get('message')
-            commit_service.create_commit(sha, date, author, message, branch.id)
-    
-            
+    if created:
+        task_manager.run_task_in_background(task_id, _run_onboarding, app, repo.id)
 
-    # Redirect to the repository dashboard after creating it
-    return redirect(url_for('dashboard', owner=owner, name=name))
\ No newline at end of file
+    # Redirect to the repository dashboard, which follows the onboarding task
+    return redirect(url_for('dashboard', owner=owner, name=name, task_id=task_id))
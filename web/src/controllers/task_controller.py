@@ -26,19 +26,30 @@ def stream_task_progress(task_id):
     if not task:
         return jsonify({"error": "Task not found"}), 404
 
+    # events after this point are streamed, the ones before are covered by the initial state and the replay
+    cursor = task_manager.event_cursor(task_id)
+    data_points = task_manager.get_data_points(task_id)
+
     def generate():
         """Generator function for SSE."""
         # Send initial task state
         yield f"data: {json.dumps(task.to_dict(), cls=DateTimeEncoder)}\n\n"
+
+        # Replay the data points published before the client connected (the client drops duplicates)
+        for data_point in data_points:
+            yield f"event: data_point\ndata: {json.dumps(data_point, cls=DateTimeEncoder)}\n\n"
         
         # Stream updates
-        for update in task_manager.get_task_updates(task_id, timeout=30.0):
+        for update in task_manager.get_task_updates(task_id, timeout=30.0, cursor=cursor):
             if update["type"] == "heartbeat":
                 # Send heartbeat to keep connection alive
                 yield f": heartbeat\n\n"
             elif update["type"] == "update":
                 # Send actual update
                 yield f"data: {json.dumps(update['data'], cls=DateTimeEncoder)}\n\n"
+            elif update["type"] == "data_point":
+                # Send a partial result as a named event
+                yield f"event: data_point\ndata: {json.dumps(update['data'], cls=DateTimeEncoder)}\n\n"
         
         # Ensure we send a final update
         final_task = task_manager.get_task(task_id)
@@ -58,7 +69,7 @@ def stream_task_progress(task_id):
 
 @app.route('/api/task/<task_id>/cancel', methods=['POST'])
 def cancel_task(task_id):
-    """Cancel a running task (mark as cancelled, actual cancellation depends on implementation)."""
+    """Cancel a queued or running task: its work stops at the next commit or file and its child processes are terminated."""
     task = task_manager.get_task(task_id)
     if not task:
         return jsonify({"error": "Task not found"}), 404
@@ -66,5 +77,5 @@ def cancel_task(task_id):
     if task.status in ["completed", "failed"]:
         return jsonify({"error": "Task already finished"}), 400
     
-    task_manager.fail_task(task_id, "Cancelled by user")
+    task_manager.cancel_task(task_id)
     return jsonify({"message": "Task cancelled"})
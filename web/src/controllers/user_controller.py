@@ -6,6 +6,8 @@ from flask_login import current_user
 from src.app import app, db
 from src.models.model import User, Repository, RepositoryAccess
 from src.utilities.auth import admin_required, hash_password
+from src.services.github_service import repo_cache_root
+from src.services.repo_cache import repo_cache
 
 
 @app.route('/admin/users')
@@ -231,3 +233,10 @@ def api_user_repositories(user_id):
         })
     
     return jsonify(access_list)
+
+
+@app.route('/api/admin/repo-cache')
+@admin_required
+def api_admin_repo_cache():
+    """API endpoint to get the size, quota and clones of the repository cache"""
+    return jsonify(repo_cache.stats(repo_cache_root()))
@@ -0,0 +1,149 @@
+import uuid
+
+from sqlalchemy.dialects.postgresql import insert
+
+from src.models import db
+from src.models.model import *
+
+
+class AnalysisBulkWriter:
+    """
+    Buffers the File, Function, Complexity and FileIdentifiableEntity rows of
+    one commit and writes them with multi-row `INSERT ... ON CONFLICT` upserts.
+
+    Rows that already exist are reused instead of being looked up first: a
+    file is unique per (commit, name), a function per (file, name), a
+    complexity per function and an entity occurrence per (file, entity, line).
+    Nothing is committed, the caller owns the transaction.
+
+    ```
+    writer = AnalysisBulkWriter(commit.id)
+    writer.add_file("src/app.py", [("main", 1, 3)], [("todo", 12)], entity_ids)
+    files = writer.flush()
+    db.session.commit()
+    ```
+    """
+    BATCH_SIZE = 1000
+
+    commit_id : str
+    batch_size : int
+
+    def __init__(self, commit_id : str, batch_size : int = None):
+        self.commit_id = commit_id
+        self.batch_size = batch_size or AnalysisBulkWriter.BATCH_SIZE
+        self._files = {}  # name -> provisional file id
+        self._functions = {}  # (file id, name) -> line position
+        self._complexities = {}  # (file id, function name) -> value
+        self._file_entities = set()  # (file id, identifiable entity id, line)
+
+    def add_file(self, name : str, functions : list, entity_lines : list, entity_ids : dict[str, str]) -> str:
+        """
+        Buffer a file with its functions ((name, start_line, complexity)) and
+        identifiable entities ((entity name, line)).
+
+        Returns:
+            str: provisional id of the file, see flush
+        """
+        file_id = self._files.get(name)
+        if file_id is None:
+            file_id = str(uuid.uuid4())
+            self._files[name] = file_id
+
+        self.add_functions(file_id, functions)
+        self.add_entity_lines(file_id, entity_lines, entity_ids)
+        return file_id
+
+    def add_functions(self, file_id : str, functions : list):
+        """Buffer functions of a file; a function name seen twice keeps its first line and its last complexity."""
+        for name, line_position, complexity in functions:
+            self._functions.setdefault((file_id, name), line_position)
+            self._complexities[(file_id, name)] = complexity
+
+    def add_entity_lines(self, file_id : str, entity_lines : list, entity_ids : dict[str, str]):
+        for entity_name, line in entity_lines:
+            self._file_entities.add((file_id, entity_ids[entity_name], line))
+
+    def flush(self) -> list[File]:
+        """
+        Write the buffered rows in the current transaction and clear the buffers.
+
+        Returns:
+            list[File]: the files added with add_file, with their stored ids (detached from the session)
+        """
+        file_ids = self._insert_files()
+        function_ids = self._insert_functions(file_ids)
+        self._insert_complexities(file_ids, function_ids)
+        self._insert_file_entities(file_ids)
+
+        files = [
+            File(id=file_ids[provisional_id], name=name, commit_id=self.commit_id)
+            for name, provisional_id in self._files.items()
+        ]
+
+        self._files = {}
+        self._functions = {}
+        self._complexities = {}
+        self._file_entities = set()
+        return files
+
+    def _chunks(self, rows : list):
+        for i in range(0, len(rows), self.batch_size):
+            yield rows[i:i + self.batch_size]
+
+    def _insert_files(self) -> dict[str, str]:
+        """Returns: provisional file id -> stored file id"""
+        # ids not buffered by add_file belong to files that are already stored
+        file_ids = {file_id: file_id for file_id, _ in self._functions}
+        file_ids.update({file_id: file_id for file_id, _, _ in self._file_entities})
+
+        table = File.__table__
+        rows = [{"id": file_id, "name": name, "commit_id": self.commit_id} for name, file_id in self._files.items()]
+        for chunk in self._chunks(rows):
+            stmt = insert(table).values(chunk)
+            # no-op update, so that RETURNING also reports the rows that already existed
+            stmt = stmt.on_conflict_do_update(index_elements=[table.c.commit_id, table.c.name], set_={"name": stmt.excluded.name})
+            for stored_id, name in db.session.execute(stmt.returning(table.c.id, table.c.name)):
+                file_ids[self._files[name]] = stored_id
+
+        return file_ids
+
+    def _insert_functions(self, file_ids : dict[str, str]) -> dict[tuple[str, str], str]:
+        """Returns: (stored file id, function name) -> stored function id"""
+        table = Function.__table__
+        rows = [
+            {"id": str(uuid.uuid4()), "name": name, "line_position": line_position, "file_id": file_ids[file_id]}
+            for (file_id, name), line_position in self._functions.items()
+        ]
+
+        function_ids = {}
+        for chunk in self._chunks(rows):
+            stmt = insert(table).values(chunk)
+            stmt = stmt.on_conflict_do_update(index_elements=[table.c.file_id, table.c.name], set_={"name": stmt.excluded.name})
+            for stored_id, file_id, name in db.session.execute(stmt.returning(table.c.id, table.c.file_id, table.c.name)):
+                function_ids[(file_id, name)] = stored_id
+
+        return function_ids
+
+    def _insert_complexities(self, file_ids : dict[str, str], function_ids : dict[tuple[str, str], str]):
+        table = Complexity.__table__
+        rows = [
+            {"id": str(uuid.uuid4()), "value": value, "function_id": function_ids[(file_ids[file_id], name)]}
+            for (file_id, name), value in self._complexities.items()
+        ]
+
+        for chunk in self._chunks(rows):
+            stmt = insert(table).values(chunk)
+            stmt = stmt.on_conflict_do_update(index_elements=[table.c.function_id], set_={"value": stmt.excluded.value})
+            db.session.execute(stmt)
+
+    def _insert_file_entities(self, file_ids : dict[str, str]):
+        table = FileIdentifiableEntity.__table__
+        rows = [
+            {"id": str(uuid.uuid4()), "file_id": file_ids[file_id], "identifiable_entity_id": entity_id, "line_position": line}
+            for file_id, entity_id, line in self._file_entities
+        ]
+
+        for chunk in self._chunks(rows):
+            stmt = insert(table).values(chunk)
+            stmt = stmt.on_conflict_do_nothing(index_elements=[table.c.file_id, table.c.identifiable_entity_id, table.c.line_position])
+            db.session.execute(stmt)
@@ -5,15 +5,14 @@ from sqlalchemy.orm import Query
 from sqlalchemy.engine import Row
 
 class CodeDuplicationDatabaseFacade: 
+    # the inserts are committed by the caller, with the rest of the analysis of the commit
     def insert_many_fragments(self, fragments : list[CodeFragment]): 
         for cd in fragments:
             db.session.add(cd)
-        db.session.commit()
 
     def insert_many_duplications(self, duplications : list[Duplication]):
         for dups in duplications:
             db.session.add(dups)
-        db.session.commit()
 
     def get_duplication_by_id(self, id : str) -> CodeFragment:
         return db.session.query(CodeFragment).filter_by(id=id).first()
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, String, Integer, Float, Text, ForeignKey, DateTime, Boolean, Table
+    Column, String, Integer, Float, Text, ForeignKey, DateTime, Boolean, Table, UniqueConstraint, JSON, Index, text
 )
 from sqlalchemy import inspect
 from sqlalchemy.orm import relationship
@@ -117,12 +117,15 @@ class Commit(ModelMixin, db.Model):
     date = Column(DateTime, nullable=False)
     author = Column(Text, nullable=False)
     message = Column(Text, nullable=True)
+    # None until the message is classified, see metrics_service.classify_bug_linked_commits
+    is_bug_linked = Column(Boolean, nullable=True)
 
     branch_id = Column(String(36), ForeignKey("branch.id"))
 
 
 class File(ModelMixin, db.Model):
     __tablename__ = "file"
+    __table_args__ = (UniqueConstraint("commit_id", "name", name="uq_file_commit_id_name"),)
     id = Column(String(36), primary_key=True)
     name = Column(Text, nullable=False)
 
@@ -130,6 +133,7 @@ class File(ModelMixin, db.Model):
 
 class Function(ModelMixin, db.Model):
     __tablename__ = "function"
+    __table_args__ = (UniqueConstraint("file_id", "name", name="uq_function_file_id_name"),)
     id = Column(String(36), primary_key=True)
     name = Column(Text, nullable=False)
     line_position = Column(Integer)
@@ -145,6 +149,7 @@ class IdentifiableEntity(ModelMixin, db.Model):
 
 class FileIdentifiableEntity(ModelMixin, db.Model):
     __tablename__ = "file_identifiable_entity"
+    __table_args__ = (UniqueConstraint("file_id", "identifiable_entity_id", "line_position", name="uq_file_identifiable_entity_file_id_entity_id_line"),)
 
     id = Column(String(36), primary_key=True)
     file_id = Column(String(36), ForeignKey("file.id"))
@@ -172,12 +177,75 @@ class ComplexityCount(ModelMixin, db.Model):
 
 class Complexity(ModelMixin, db.Model):
     __tablename__ = "complexity"
+    __table_args__ = (UniqueConstraint("function_id", name="uq_complexity_function_id"),)
     id = Column(String(36), primary_key=True)
     value = Column(Integer)
 
     function_id = Column(String(36), ForeignKey("function.id"))
 
 
+class CommitMetricSummary(ModelMixin, db.Model):
+    """Headline numbers of a commit, written with its snapshot so that charts and lists read one row per commit."""
+    __tablename__ = "commit_metric_summary"
+    id = Column(String(36), primary_key=True)
+    total_complexity = Column(Integer)
+    average_complexity = Column(Float)
+    function_count = Column(Integer)
+    entity_counts = Column(JSON)  # entity name -> count
+    # None when the duplications were not analyzed (incremental snapshots)
+    duplication_count = Column(Integer)
+    duplicated_line_count = Column(Integer)
+    file_count = Column(Integer)
+    is_bug_linked = Column(Boolean)
+
+    commit_id = Column(String(36), ForeignKey("commit.id"), unique=True)
+
+
+class DebtEvolutionResult(ModelMixin, db.Model):
+    """Cached result of metrics_service.calculate_debt_evolution, see services.debt_evolution_cache."""
+    __tablename__ = "debt_evolution_result"
+    id = Column(String(36), primary_key=True)
+    cache_key = Column(String(64), nullable=False, unique=True)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    last_used_at = Column(DateTime, nullable=False)
+
+    branch_id = Column(String(36), ForeignKey("branch.id"))
+
+
+class BackgroundTask(ModelMixin, db.Model):
+    """State of a task of the task manager, see services.task_store.DatabaseTaskStore."""
+    __tablename__ = "background_task"
+    # at most one unfinished task per idempotency key, see TaskManager.create_or_get_task
+    __table_args__ = (
+        Index("uq_background_task_active_idempotency_key", "idempotency_key", unique=True, postgresql_where=text("status IN ('pending', 'running')")),
+    )
+    id = Column(String(36), primary_key=True)
+    task_type = Column(Text, nullable=False)
+    idempotency_key = Column(Text)
+    status = Column(Text, nullable=False)
+    progress = Column(Integer, nullable=False, default=0)
+    current_step = Column(Text)
+    message = Column(Text)
+    result = Column(JSON)
+    partial_result = Column(JSON)
+    error = Column(Text)
+    created_at = Column(DateTime)
+    started_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    updated_at = Column(DateTime)
+
+
+class BackgroundTaskEvent(ModelMixin, db.Model):
+    """Update or data point of a task, read by the SSE streams of every worker."""
+    __tablename__ = "background_task_event"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    type = Column(Text, nullable=False)
+    data = Column(JSON)
+
+    task_id = Column(String(36), ForeignKey("background_task.id", ondelete="CASCADE"), index=True)
+
+
 # ---------------- AUTHENTICATION & AUTHORIZATION TABLES ---------------- #
 
 class User(UserMixin, ModelMixin, db.Model):
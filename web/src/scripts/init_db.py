@@ -8,17 +8,75 @@ import sys
 # Add the parent directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from sqlalchemy import text
+
 from src.app import app, db
 from src.models.model import User
 from src.utilities.auth import hash_password
 
 
+def _duplicate_ids(table, columns, where=None):
+    """
+    Ids of the rows of `table` repeating an earlier row on `columns`, one row
+    of each group is kept. Rows with a NULL column never conflict in a unique
+    index, so they are left alone. `where` restricts the rows, as for a
+    partial index.
+    """
+    conditions = [f"{column} IS NOT NULL" for column in columns] + ([where] if where else [])
+    return (
+        f"SELECT id FROM (SELECT id, row_number() OVER (PARTITION BY {', '.join(columns)} ORDER BY id) AS n "
+        f"FROM {table} WHERE {' AND '.join(conditions)}) AS ranked WHERE n > 1"
+    )
+
+
+ACTIVE_TASK = "status IN ('pending', 'running')"
+DUPLICATE_FILES = _duplicate_ids("file", ["commit_id", "name"])
+DUPLICATE_FUNCTIONS = _duplicate_ids("function", ["file_id", "name"])
+
+# columns and constraints added to existing tables after their creation, create_all() only handles new tables.
+# Rows written twice before a unique index existed are deleted first (with the rows referencing them),
+# the index could not be created otherwise
+UPGRADES = [
+    'ALTER TABLE "commit" ADD COLUMN IF NOT EXISTS is_bug_linked BOOLEAN',
+    "ALTER TABLE background_task ADD COLUMN IF NOT EXISTS idempotency_key TEXT",
+    f"UPDATE background_task SET idempotency_key = NULL WHERE id IN ({_duplicate_ids('background_task', ['idempotency_key'], where=ACTIVE_TASK)})",
+    f"CREATE UNIQUE INDEX IF NOT EXISTS uq_background_task_active_idempotency_key ON background_task (idempotency_key) WHERE {ACTIVE_TASK}",
+    f"DELETE FROM complexity WHERE function_id IN (SELECT id FROM function WHERE file_id IN ({DUPLICATE_FILES}))",
+    f"DELETE FROM function WHERE file_id IN ({DUPLICATE_FILES})",
+    f"DELETE FROM file_identifiable_entity WHERE file_id IN ({DUPLICATE_FILES})",
+    f"DELETE FROM duplication WHERE file_id IN ({DUPLICATE_FILES})",
+    f"DELETE FROM file WHERE id IN ({DUPLICATE_FILES})",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_file_commit_id_name ON file (commit_id, name)",
+    f"DELETE FROM complexity WHERE function_id IN ({DUPLICATE_FUNCTIONS})",
+    f"DELETE FROM function WHERE id IN ({DUPLICATE_FUNCTIONS})",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_function_file_id_name ON function (file_id, name)",
+    f"DELETE FROM complexity WHERE id IN ({_duplicate_ids('complexity', ['function_id'])})",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_complexity_function_id ON complexity (function_id)",
+    f"DELETE FROM file_identifiable_entity WHERE id IN ({_duplicate_ids('file_identifiable_entity', ['file_id', 'identifiable_entity_id', 'line_position'])})",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_file_identifiable_entity_file_id_entity_id_line ON file_identifiable_entity (file_id, identifiable_entity_id, line_position)",
+]
+
+
 def init_db():
     """Initialize database tables"""
     print("Creating database tables...")
     with app.app_context():
         db.create_all()
         print("✓ Database tables created successfully!")
+        upgrade_db()
+
+
+def upgrade_db():
+    """Bring the tables of an existing database up to date, exits on the first statement that fails"""
+    for statement in UPGRADES:
+        try:
+            db.session.execute(text(statement))
+            db.session.commit()
+        except Exception as e:
+            # the statements after it rely on it (e.g. ON CONFLICT needs the unique indexes)
+            db.session.rollback()
+            print(f"✗ Could not apply '{statement}': {str(e)}")
+            sys.exit(1)
 
 
 def create_admin_user():
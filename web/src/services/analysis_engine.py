@@ -0,0 +1,115 @@
+"""
+CPU-bound analysis of source files (lizard complexity and identifiable
+entities) on a pool of worker processes.
+
+Workers only receive `(path, code)` and the entity names to look for, and
+return plain tuples; they never touch the database. The caller persists the
+results from the parent process.
+"""
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from lizard import analyze_file
+
+import src.services.identifiable_entity_service as identifiable_entity_service
+
+
+def default_worker_count():
+    """ANALYSIS_WORKERS, or the number of cores when unset."""
+    workers = int(os.getenv("ANALYSIS_WORKERS", "0"))
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def analyze_source(path, code, entity_names):
+    """
+    Analyze one file. Runs in a worker process.
+
+    Returns:
+        tuple: (path, functions, entity_lines) where functions is a list of
+        (name, start_line, cyclomatic_complexity) and entity_lines a list of
+        (entity_name, line)
+    """
+    analysis = analyze_file.analyze_source_code(path, code)
+    functions = [(func.name, func.start_line, func.cyclomatic_complexity) for func in analysis.function_list]
+
+    # the scanner of the catalogue is compiled once per worker process
+    entity_lines = identifiable_entity_service.search_identifiable_entities(code, entity_names)
+
+    return path, functions, entity_lines
+
+
+class AnalysisEngine:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers if max_workers is not None else default_worker_count()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _reset(self, executor):
+        # a worker died (e.g. killed by the OOM killer), start a fresh pool next time
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def analyze(self, files, entity_names):
+        """
+        Analyze `(path, code)` pairs on the worker processes.
+
+        Files are consumed lazily and only a bounded number of them is in
+        flight, so memory does not grow with the repository. A file whose
+        analysis fails is logged and skipped.
+
+        Yields:
+            tuple: see analyze_source, in completion order
+        """
+        entity_names = tuple(entity_names)
+        executor = self._get_executor()
+        max_pending = self.max_workers * 2
+        pending = {}
+
+        def collect(done):
+            results = []
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool:
+                    self._reset(executor)
+                    raise
+                except Exception as e:
+                    print(f"Error processing file {path}: {str(e)}")
+            return results
+
+        try:
+            for path, code in files:
+                pending[executor.submit(analyze_source, path, code, entity_names)] = path
+
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from collect(done)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        finally:
+            # the caller stopped early (or failed): drop what was not started yet
+            for future in pending:
+                future.cancel()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+
+# Global singleton instance
+analysis_engine = AnalysisEngine()
@@ -11,17 +11,22 @@ def create_branches_from_repository(repository_id):
 
     branches = github_service.fetch_branches(repo.owner, repo.name)
 
-    branch_objs = []
-    for branch in branches:
-        branch_obj = Branch(
+    return create_branches(repo.id, branches)
+
+
+def create_branches(repository_id, branch_names):
+    """Insert all the branches of a repository with a single statement."""
+    branch_objs = [
+        Branch(
             id = str(uuid.uuid4()),
-            repository_id = repo.id,
+            repository_id = repository_id,
             name = branch,
         )
+        for branch in branch_names
+    ]
 
-        db.session.add(branch_obj)
-        db.session.commit()
-        branch_objs.append(branch_obj)
+    db.session.add_all(branch_objs)
+    db.session.commit()
 
     return branch_objs
 
@@ -0,0 +1,87 @@
+"""
+Cooperative cancellation of background tasks.
+
+A task checks its token at its natural boundaries (between commits, between
+files) and stops with TaskCancelled once it is cancelled. The child
+processes it registers with `track` are terminated as soon as the token is
+cancelled, so the CPU they use is released without waiting for them. A
+process started with `start_new_session=True` is terminated with its whole
+process group, e.g. the JVM started by a launcher script.
+
+```
+token = CancellationToken()
+with token.track(subprocess.Popen(args, start_new_session=True)) as process:
+    output, _ = process.communicate()
+token.check()  # raises TaskCancelled if cancel() was called meanwhile
+```
+"""
+import os
+import signal
+import subprocess
+import threading
+from contextlib import contextmanager
+
+
+class TaskCancelled(Exception):
+    """Raised by CancellationToken.check once the task is cancelled."""
+
+
+class CancellationToken:
+    # seconds a terminated process has to exit before it is killed
+    TERMINATE_TIMEOUT = 5
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._processes = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        """Cancel the task and terminate its tracked processes. Returns immediately."""
+        with self._lock:
+            self._event.set()
+            processes = list(self._processes)
+
+        for process in processes:
+            threading.Thread(target=self._terminate, args=(process,), daemon=True).start()
+
+    def check(self):
+        if self._event.is_set():
+            raise TaskCancelled("Cancelled by user")
+
+    @contextmanager
+    def track(self, process):
+        """Terminate `process` if the token is cancelled while it runs (or was already cancelled)."""
+        with self._lock:
+            self._processes.add(process)
+            cancelled = self._event.is_set()
+
+        if cancelled:
+            self._terminate(process)
+        try:
+            yield process
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+    def _terminate(self, process):
+        if process.poll() is not None:
+            return
+        self._signal(process, signal.SIGTERM)
+        try:
+            process.wait(timeout=self.TERMINATE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self._signal(process, signal.SIGKILL)
+
+    def _signal(self, process, sig):
+        try:
+            # the leader of its own group: its children would otherwise keep running (and keep its pipes open)
+            if os.getpgid(process.pid) == process.pid:
+                os.killpg(process.pid, sig)
+                return
+        except ProcessLookupError:
+            return
+        process.send_signal(sig)
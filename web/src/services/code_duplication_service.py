@@ -47,16 +47,21 @@ class CodeDuplicationService:
 
         for report in report_list:
             fragment = CodeFragment(report.get_fragment(), report.get_lines())
-            fragments_list.append(fragment)
             lines = report.get_lines()
             
+            fragment_duplications : list[Duplication] = []
             for element in report:
+                # files filtered out of the analysis (vendored, minified, ...) are not stored, their copies are ignored
                 if element.filename not in filename_dict:
-                    raise Exception("filename '" + element.filename + "' in duplication report does not exists in database.")
+                    continue
         
                 file : File = filename_dict[element.filename]
                 duplication = Duplication(fragment.id, file.id, lines, element.lines, element.columns)
-                duplication_list.append(duplication)
+                fragment_duplications.append(duplication)
+
+            if fragment_duplications:
+                fragments_list.append(fragment)
+                duplication_list.extend(fragment_duplications)
 
         self.insert(fragments_list, duplication_list)
         return
\ No newline at end of file
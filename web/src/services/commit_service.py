@@ -23,6 +23,37 @@ def create_commit(commit_sha, commit_date, author, message, branch_id):
     return commit
 
 
+def create_commits_for_branches(commits_by_branch):
+    """
+    Insert the commits of many branches with a single statement.
+
+    Args:
+        commits_by_branch (list[tuple[str, list[dict]]]): (branch_id, commits) pairs, the commits
+            as returned by github_service (sha, date, author, message)
+
+    Returns:
+        int: number of inserted commits
+    """
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "sha": commit.get("sha"),
+            "date": datetime.fromisoformat(commit.get("date").replace('Z', '+00:00')),
+            "author": commit.get("author"),
+            "message": commit.get("message"),
+            "branch_id": branch_id,
+        }
+        for branch_id, commits in commits_by_branch
+        for commit in commits
+    ]
+
+    if rows:
+        db.session.bulk_insert_mappings(Commit, rows)
+        db.session.commit()
+
+    return len(rows)
+
+
 def ensure_commit_exists_by_sha(commit, branch_id):
     found_commit = get_commit_by_sha(commit.get("sha"))
     if not found_commit:
@@ -0,0 +1,104 @@
+"""
+Cache of the debt evolution results (see metrics_service.calculate_debt_evolution).
+
+A result is keyed by the branch, the commits it covers and the versions of
+the analyzers that produced it, so that a new commit in the range, a change
+of the entity catalogue or an upgrade of lizard all miss the cache. Entries
+expire after a TTL and the least recently used ones are evicted past a
+maximum number of entries.
+"""
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from lizard_ext import version as lizard_version
+from sqlalchemy.dialects.postgresql import insert
+
+from src.models import db
+from src.models.model import DebtEvolutionResult, IdentifiableEntity
+
+# bump when the content of the data points changes
+DATA_POINT_VERSION = 1
+
+
+def analyzer_versions():
+    """The versions of everything the data points depend on, besides the commits."""
+    entity_names = sorted(name for name, in db.session.query(IdentifiableEntity.name).all())
+    return {
+        "data_points": DATA_POINT_VERSION,
+        "lizard": lizard_version,
+        "identifiable_entities": entity_names,
+    }
+
+
+class DebtEvolutionCache:
+    def __init__(self, ttl_seconds=None, max_entries=None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv("DEBT_EVOLUTION_CACHE_TTL_SECONDS", str(24 * 3600)))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("DEBT_EVOLUTION_CACHE_MAX_ENTRIES", "200"))
+
+    def key(self, branch_id, commit_shas, incremental=False):
+        payload = json.dumps({
+            "branch_id": branch_id,
+            "commits": list(commit_shas),
+            "incremental": bool(incremental),
+            "versions": analyzer_versions(),
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, branch_id, commit_shas, incremental=False):
+        """
+        Returns:
+            list | None: the cached data points, None when missing or expired
+        """
+        entry = DebtEvolutionResult.query.filter_by(cache_key=self.key(branch_id, commit_shas, incremental)).first()
+        if entry is None:
+            return None
+
+        now = datetime.utcnow()
+        if now - entry.created_at > timedelta(seconds=self.ttl_seconds):
+            db.session.delete(entry)
+            db.session.commit()
+            return None
+
+        entry.last_used_at = now
+        db.session.commit()
+        return entry.result
+
+    def put(self, branch_id, commit_shas, incremental, result):
+        now = datetime.utcnow()
+        table = DebtEvolutionResult.__table__
+        stmt = insert(table).values(
+            id=str(uuid.uuid4()),
+            cache_key=self.key(branch_id, commit_shas, incremental),
+            branch_id=branch_id,
+            result=result,
+            created_at=now,
+            last_used_at=now,
+        )
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.cache_key],
+            set_={"result": stmt.excluded.result, "created_at": now, "last_used_at": now},
+        ))
+        db.session.commit()
+        self.evict()
+
+    def evict(self):
+        """Delete the expired entries, then the least recently used ones past max_entries."""
+        expired_before = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        DebtEvolutionResult.query.filter(DebtEvolutionResult.created_at < expired_before).delete(synchronize_session=False)
+
+        if self.max_entries > 0:
+            kept = db.session.query(DebtEvolutionResult.id).order_by(
+                DebtEvolutionResult.last_used_at.desc()
+            ).limit(self.max_entries).subquery()
+            DebtEvolutionResult.query.filter(
+                DebtEvolutionResult.id.notin_(db.session.query(kept.c.id))
+            ).delete(synchronize_session=False)
+
+        db.session.commit()
+
+
+# Global singleton instance
+debt_evolution_cache = DebtEvolutionCache()
@@ -0,0 +1,118 @@
+"""
+Per-repository coordination of `git fetch` against origin.
+
+- Concurrent requests for the same fetch share a single in-flight fetch.
+- A fetch is skipped when the same one succeeded less than `ttl` seconds ago.
+- Tracked repositories can be kept warm by a background scheduler.
+"""
+import os
+import subprocess
+import threading
+import time
+
+
+class _InFlightFetch:
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class FetchCoordinator:
+    def __init__(self, ttl=None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("FETCH_TTL_SECONDS", "60"))
+        self._lock = threading.Lock()
+        self._in_flight = {}  # (repo_path, args) -> _InFlightFetch
+        self._last_success = {}  # (repo_path, args) -> time.monotonic() of the last successful fetch
+        self._tracked = set()
+        self._scheduler = None
+        self._stop = threading.Event()
+
+    def fetch(self, repo_path, *args, force=False):
+        """
+        Run `git -C repo_path fetch <args>`, unless the same fetch is fresher than the TTL.
+
+        Callers asking for a fetch that is already running wait for it and
+        share its outcome instead of starting another one.
+
+        Returns:
+            bool: True if a fetch ran (or was joined), False if it was skipped as fresh
+        Raises:
+            subprocess.CalledProcessError: if the fetch failed
+        """
+        key = (repo_path, tuple(args))
+
+        with self._lock:
+            last = self._last_success.get(key)
+            if not force and last is not None and time.monotonic() - last < self.ttl:
+                return False
+
+            flight = self._in_flight.get(key)
+            is_owner = flight is None
+            if is_owner:
+                flight = _InFlightFetch()
+                self._in_flight[key] = flight
+
+        if not is_owner:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return True
+
+        try:
+            subprocess.run(["git", "-C", repo_path, "fetch", *args], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            with self._lock:
+                self._last_success[key] = time.monotonic()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight.done.set()
+
+        return True
+
+    def refresh(self, repo_path, force=False):
+        """Fetch all branches of origin (pruning deleted ones) and keep the repository warm from now on."""
+        self.track(repo_path)
+        return self.fetch(repo_path, "--prune", "origin", force=force)
+
+    def track(self, repo_path):
+        with self._lock:
+            self._tracked.add(repo_path)
+
+    def untrack(self, repo_path):
+        with self._lock:
+            self._tracked.discard(repo_path)
+            for key in [key for key in self._last_success if key[0] == repo_path]:
+                del self._last_success[key]
+
+    def start_scheduler(self, interval):
+        """Refresh every tracked repository each `interval` seconds in a daemon thread."""
+        if self._scheduler is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                with self._lock:
+                    tracked = list(self._tracked)
+                for repo_path in tracked:
+                    try:
+                        self.fetch(repo_path, "--prune", "origin", force=True)
+                    except Exception as e:
+                        print(f"Scheduled fetch of {repo_path} failed: {str(e)}")
+
+        self._scheduler = threading.Thread(target=loop, daemon=True)
+        self._scheduler.start()
+
+    def stop_scheduler(self):
+        if self._scheduler is None:
+            return
+        self._stop.set()
+        self._scheduler.join()
+        self._scheduler = None
+
+
+# Global singleton instance
+fetch_coordinator = FetchCoordinator()
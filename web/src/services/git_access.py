@@ -0,0 +1,272 @@
+"""
+Git plumbing over long-lived processes.
+
+Each cached clone gets one `git cat-file --batch` process (object contents)
+and one `git cat-file --batch-check` process (object type and size). Commit
+metadata, trees and blobs are read over their pipes, so answering a question
+about the repository costs a round trip instead of a process launch.
+"""
+import os
+import subprocess
+import threading
+from datetime import datetime, timedelta, timezone
+
+
+class _CatFileProcess:
+    """One `git cat-file` process in batch mode, restarted if it dies."""
+
+    def __init__(self, repo_path, mode):
+        self.repo_path = repo_path
+        self.mode = mode
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                ["git", "-C", self.repo_path, "cat-file", self.mode],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._proc
+
+    def request(self, rev):
+        """
+        Returns:
+            tuple[list[bytes], bytes]: header fields and content (None with --batch-check),
+            or (None, None) if the object is missing
+        """
+        with self._lock:
+            proc = self._ensure_started()
+            proc.stdin.write(f"{rev}\n".encode())
+            proc.stdin.flush()
+
+            header = proc.stdout.readline()
+            if not header:
+                # process died, restart on next call
+                self._proc = None
+                return None, None
+
+            parts = header.split()
+            if len(parts) != 3:
+                # "<rev> missing" or "<rev> ambiguous"
+                return None, None
+
+            if self.mode != "--batch":
+                return parts, None
+
+            data = proc.stdout.read(int(parts[2]))
+            proc.stdout.read(1)  # trailing LF
+            return parts, data
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                try:
+                    self._proc.stdin.close()
+                    self._proc.wait(timeout=5)
+                except Exception:
+                    self._proc.kill()
+                self._proc = None
+
+
+class GitAccess:
+    """
+    Read-only access to the objects and metadata of one repository.
+
+    ```
+    git = get_git_access(repo_path)
+    sha = git.resolve("refs/remotes/origin/main")
+    commit = git.read_commit(sha)
+    for path, mode, oid in git.iter_tree(sha):
+        data = git.read(oid)
+    ```
+    """
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self._batch = _CatFileProcess(repo_path, "--batch")
+        self._batch_check = _CatFileProcess(repo_path, "--batch-check")
+        self._config = {}
+
+    def read(self, rev):
+        """Return the raw content of `rev` as bytes, or None if the object is missing."""
+        return self._batch.request(rev)[1]
+
+    def info(self, rev):
+        """
+        Returns:
+            tuple[str, str, int]: (sha, type, size) of `rev`, or None if it is missing
+        """
+        parts, _ = self._batch_check.request(rev)
+        if parts is None:
+            return None
+        return parts[0].decode(), parts[1].decode(), int(parts[2])
+
+    def resolve(self, rev):
+        """Return the sha `rev` points to (e.g. a ref name), or None."""
+        info = self.info(rev)
+        return info[0] if info is not None else None
+
+    def has_commit(self, sha):
+        return self.info(f"{sha}^{{commit}}") is not None
+
+    def read_commit(self, rev):
+        """
+        Returns:
+            dict: sha, tree, parents, author, author_email, author_date, committer,
+            committer_email, committer_date (aware datetimes) and message, or None
+        """
+        parts, data = self._batch.request(f"{rev}^{{commit}}")
+        if parts is None:
+            return None
+        commit = parse_commit(data)
+        commit["sha"] = parts[0].decode()
+        return commit
+
+    def iter_commits(self, rev, max_count=None):
+        """
+        Walk the history of `rev` newest first (by committer date, like `git rev-list`).
+
+        Yields:
+            dict: see read_commit
+        """
+        start = self.read_commit(rev)
+        if start is None:
+            return
+
+        seen = {start["sha"]}
+        pending = [start]
+        count = 0
+        while pending and (max_count is None or count < max_count):
+            # the history of a branch is a few merges wide, a linear scan is enough
+            newest = max(range(len(pending)), key=lambda i: pending[i]["committer_date"])
+            commit = pending.pop(newest)
+            yield commit
+            count += 1
+
+            for parent in commit["parents"]:
+                if parent in seen:
+                    continue
+                seen.add(parent)
+                parent_commit = self.read_commit(parent)
+                # missing in a shallow clone
+                if parent_commit is not None:
+                    pending.append(parent_commit)
+
+    def iter_tree(self, rev, prefix=""):
+        """
+        Recursively list the entries of a tree (or of the tree of a commit), except subtrees.
+
+        Yields:
+            tuple[str, str, str]: (path, mode, sha)
+        """
+        data = self.read(f"{rev}^{{tree}}")
+        if data is None:
+            raise ValueError(f"No tree for {rev} in {self.repo_path}")
+
+        # entries are in tree order, so recursing in place matches `git ls-tree -r`
+        for mode, name, oid in parse_tree(data):
+            path = f"{prefix}{name}"
+            if mode == "40000":
+                yield from self.iter_tree(oid, f"{path}/")
+            else:
+                yield path, mode, oid
+
+    def config(self, key):
+        """Return a config value of the repository (read once, then cached), or None."""
+        if key not in self._config:
+            try:
+                self._config[key] = subprocess.check_output(
+                    ["git", "-C", self.repo_path, "config", "--get", key],
+                    text=True, stderr=subprocess.DEVNULL,
+                ).strip()
+            except subprocess.CalledProcessError:
+                self._config[key] = None
+        return self._config[key]
+
+    def set_config(self, key, value):
+        self._config[key] = value
+
+    def is_shallow(self):
+        return os.path.exists(os.path.join(self.repo_path, ".git", "shallow"))
+
+    def close(self):
+        self._batch.close()
+        self._batch_check.close()
+
+
+def parse_tree(data):
+    """
+    Parse a raw tree object.
+
+    Returns:
+        list[tuple[str, str, str]]: (mode, name, sha) in tree order
+    """
+    entries = []
+    i = 0
+    while i < len(data):
+        space = data.index(b" ", i)
+        nul = data.index(b"\0", space)
+        mode = data[i:space].decode()
+        name = data[space + 1:nul].decode("utf-8", errors="surrogateescape")
+        oid = data[nul + 1:nul + 21].hex()
+        entries.append((mode, name, oid))
+        i = nul + 21
+    return entries
+
+
+def _parse_signature(value):
+    # "Name <email> 1700000000 +0100"
+    identity, timestamp, offset = value.rsplit(" ", 2)
+    name, _, email = identity.partition(" <")
+    sign = -1 if offset.startswith("-") else 1
+    tz = timezone(sign * timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5])))
+    return name, email.rstrip(">"), datetime.fromtimestamp(int(timestamp), tz)
+
+
+def parse_commit(data):
+    """Parse a raw commit object (without its sha, see GitAccess.read_commit)."""
+    text = data.decode("utf-8", errors="replace")
+    headers, _, message = text.partition("\n\n")
+
+    commit = {"tree": None, "parents": [], "message": message}
+    for line in headers.split("\n"):
+        if line.startswith(" "):
+            # continuation of a multi-line header (gpgsig, mergetag)
+            continue
+        key, _, value = line.partition(" ")
+        if key == "tree":
+            commit["tree"] = value
+        elif key == "parent":
+            commit["parents"].append(value)
+        elif key in ("author", "committer"):
+            name, email, date = _parse_signature(value)
+            commit[key] = name
+            commit[f"{key}_email"] = email
+            commit[f"{key}_date"] = date
+
+    return commit
+
+
+_accesses = {}
+_accesses_lock = threading.Lock()
+
+
+def get_git_access(repo_path):
+    """Return the shared GitAccess of a repository, starting its processes on first use."""
+    with _accesses_lock:
+        access = _accesses.get(repo_path)
+        if access is None:
+            access = GitAccess(repo_path)
+            _accesses[repo_path] = access
+        return access
+
+
+def close_git_access(repo_path):
+    """Stop the processes of a repository (e.g. before deleting its clone)."""
+    with _accesses_lock:
+        access = _accesses.pop(repo_path, None)
+    if access is not None:
+        access.close()
@@ -1,11 +1,19 @@
+import bisect
 import os
+import posixpath
 import shutil
 import subprocess
+import threading
 import requests
 
+from contextlib import contextmanager
 from datetime import datetime, timezone
 
-from git import Repo
+from src.services.fetch_coordinator import fetch_coordinator
+from src.services.git_access import close_git_access, get_git_access
+from src.services.repo_cache import repo_cache
+from src.services.worktree_pool import get_worktree_pool
+from src.utilities.source_filter import SourceFilter
 
 def repo_cache_root():
     root = os.getenv("REPO_CACHE_DIR")
@@ -26,6 +34,14 @@ def remote_url(owner, name):
     return f"https://github.com/{owner}/{name}.git"
 
 
+def clone_filter():
+    """
+    Object filter of new clones (REPO_CLONE_FILTER), e.g. "blob:none" for a
+    blobless partial clone. Empty (the default) makes full clones.
+    """
+    return os.getenv("REPO_CLONE_FILTER", "").strip()
+
+
 def ensure_local_repo(owner, name):
     path = repo_dir(owner, name)
     url = remote_url(owner, name)
@@ -36,248 +52,392 @@ def ensure_local_repo(owner, name):
             shutil.rmtree(path, ignore_errors=True)
 
         # don't checkout for faster performance (suppress git output)
-        subprocess.run(["git", "clone", "--no-checkout", url, path], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        cmd = ["git", "clone", "--no-checkout"]
+        object_filter = clone_filter()
+        if object_filter:
+            # blobs are fetched later, only for the files that get analyzed
+            cmd.append(f"--filter={object_filter}")
+        subprocess.run([*cmd, url, path], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # the directory was replaced, forget what was read from the previous clone
+        close_git_access(path)
+        repo_cache.touch(path)
+        # make room for the new clone (REPO_CACHE_QUOTA_BYTES)
+        repo_cache.enforce_quota(repo_cache_root(), keep=path)
         return path
 
-    try:
-        current = subprocess.check_output(["git", "-C", path, "remote", "get-url", "origin"], text=True).strip()
-        if current != url:
-            # suppress output
-            subprocess.run(["git", "-C", path, "remote", "set-url", "origin", url], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except subprocess.CalledProcessError:
+    repo_cache.touch(path)
+
+    # the remote is read once per process, then cached
+    git = get_git_access(path)
+    current = git.config("remote.origin.url")
+    if current is None:
         # suppress output
         subprocess.run(["git", "-C", path, "remote", "add", "origin", url], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        git.set_config("remote.origin.url", url)
+    elif current != url:
+        # suppress output
+        subprocess.run(["git", "-C", path, "remote", "set-url", "origin", url], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        git.set_config("remote.origin.url", url)
 
     return path
 
 
+@contextmanager
+def hold_local_repo(owner, name):
+    """Keep the cached clone of a repository from being evicted while a task uses it."""
+    with repo_cache.hold(repo_dir(owner, name)) as path:
+        yield path
+
+
+def forget_local_repo(repo_path):
+    """Drop the in-memory state of a cached clone before it is deleted."""
+    close_git_access(repo_path)
+    with _history_coverage_lock:
+        for key in [key for key in _history_coverage if key[0] == repo_path]:
+            del _history_coverage[key]
+    fetch_coordinator.untrack(repo_path)
+
+
 SUPPORTED_SOURCE_EXTENSIONS = {
     ".py", ".c", ".cpp", ".h", ".hpp",
     ".java", ".js", ".ts", ".html", ".go",
     ".css", ".php", ".xml"
 }
 
-def safe_walk_source_files(root_dir):
-    for root, _, filenames in os.walk(root_dir):
-        # Skip .git directory
-        parts = set(root.replace("\\", "/").split("/"))
-        if ".git" in parts:
+
+def list_tree_blobs(repo_path, commit_sha, with_sizes=True):
+    """
+    List every regular file of a commit straight from its tree.
+
+    Sizes are read from the blobs themselves, so in a partial clone pass
+    `with_sizes=False` to avoid downloading every blob of the tree.
+
+    Returns:
+        list[tuple[str, str, int]]: (relative path, blob sha, size in bytes or None)
+    """
+    git = get_git_access(repo_path)
+
+    blobs = []
+    for path, mode, oid in git.iter_tree(commit_sha):
+        # skip submodules and symlinks
+        if mode in ("160000", "120000"):
             continue
-        for filename in filenames:
-            # only yield files with supported source extensions
-            _, ext = os.path.splitext(filename)
-            if ext in SUPPORTED_SOURCE_EXTENSIONS:
-                yield root, filename
+        size = git.info(oid)[2] if with_sizes else None
+        blobs.append((path, oid, size))
 
+    return blobs
 
-def fetch_files(owner, name, commit_sha):
-    repo_path = ensure_local_repo(owner, name)
-    files = []
-    
-    # checkout commit
-    try:
-        # suppress git fetch/checkout output to avoid noisy logs
-        subprocess.run(["git", "-C", repo_path, "fetch", "--depth", "1", "origin", commit_sha], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        subprocess.run(["git", "-C", repo_path, "checkout", "-f", commit_sha], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except subprocess.CalledProcessError:
-        raise
 
-    for root, filename in safe_walk_source_files(repo_path):
-        file_path = os.path.join(root, filename)
-        try:
-            with open(file_path, encoding="utf-8", errors="ignore") as f:
-                code = f.read()
-                rel_path = os.path.relpath(file_path, repo_path) 
-                files.append((rel_path, code))
-                #print(rel_path)
-        except Exception:
-            print("err2")
-            pass
+def is_partial_clone(repo_path):
+    """True if the clone was made with an object filter (blobs may be missing locally)."""
+    return get_git_access(repo_path).config("remote.origin.promisor") == "true"
 
-    #print(len(files)) 
-    return files
 
+def hydrate_blobs(repo_path, commit_sha, oids):
+    """
+    Download the blobs of `oids` missing from a partial clone in a single fetch.
 
-def get_closest_commit(repo_url, branch, date_str):
+    Without this, every missing blob read through cat-file would be fetched
+    from origin on its own round trip.
+
+    Returns:
+        int: number of blobs fetched
     """
-    Find the commit on `branch` of `repo_url` whose committer date is closest to `date_str`.
+    wanted = set(oids)
+    if not wanted:
+        return 0
+
+    # missing objects of the commit tree are printed as "?<oid>", listing them never fetches
+    out = subprocess.check_output(
+        ["git", "-C", repo_path, "rev-list", "--objects", "--no-walk", "--missing=print", commit_sha],
+        text=True, stderr=subprocess.DEVNULL,
+    )
+    missing = [line[1:].strip() for line in out.splitlines() if line.startswith("?") and line[1:].strip() in wanted]
+    if not missing:
+        return 0
+
+    # same request git makes for its own batched lazy fetches
+    subprocess.run(
+        ["git", "-C", repo_path, "-c", "fetch.negotiationAlgorithm=noop", "fetch", "origin",
+         "--no-tags", "--no-write-fetch-head", "--recurse-submodules=no", "--filter=blob:none", "--stdin"],
+        input="\n".join(missing) + "\n", text=True, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return len(missing)
+
+
+def max_source_file_bytes():
+    return int(os.getenv("MAX_SOURCE_FILE_BYTES", str(1024 * 1024)))
+
+
+def ensure_commit(repo_path, commit_sha):
+    """Fetch `commit_sha` from origin unless it is already in the object store."""
+    if not get_git_access(repo_path).has_commit(commit_sha):
+        fetch_coordinator.fetch(repo_path, "--depth", "1", "origin", commit_sha)
+
+
+def fetch_files(owner, name, commit_sha, paths=None, max_file_bytes=None):
+    """
+    Lazily yield the supported source files of a commit as (rel_path, code) pairs.
+
+    Files are read one at a time from the object store (see git_access),
+    the working directory of the cached clone is never touched. Skipped files:
+    - over `max_file_bytes` (default MAX_SOURCE_FILE_BYTES, 1 MiB)
+    - binary or minified
+    - vendored (vendor/, node_modules/, dist/, ...) or matched by a .gitignore of the commit
+
+    When `paths` is given, only those files are read.
+
+    In a partial clone (REPO_CLONE_FILTER), the blobs of the files to read are
+    downloaded in one batch per commit first; other blobs are never fetched.
+    Blob sizes are unknown until then, so the size cap is checked after the
+    download.
+    """
+    repo_path = ensure_local_repo(owner, name)
+    git = get_git_access(repo_path)
+    ensure_commit(repo_path, commit_sha)
+
+    partial = is_partial_clone(repo_path)
+    blobs = list_tree_blobs(repo_path, commit_sha, with_sizes=not partial)
+    source_filter = SourceFilter(max_file_bytes if max_file_bytes is not None else max_source_file_bytes())
+
+    # .gitignore rules apply from the root down, so parents are added first
+    gitignores = sorted((path for path, _, _ in blobs if posixpath.basename(path) == ".gitignore"), key=lambda path: path.count("/"))
+    gitignore_oids = {path: oid for path, oid, _ in blobs}
+    if partial:
+        hydrate_blobs(repo_path, commit_sha, [gitignore_oids[path] for path in gitignores])
+    for path in gitignores:
+        data = git.read(gitignore_oids[path])
+        if data is not None:
+            source_filter.add_gitignore(posixpath.dirname(path), data.decode("utf-8", errors="ignore"))
+
+    selected = []
+    for rel_path, oid, size in blobs:
+        if paths is not None and rel_path not in paths:
+            continue
+        _, ext = os.path.splitext(rel_path)
+        if ext not in SUPPORTED_SOURCE_EXTENSIONS:
+            continue
+        if (size is not None and source_filter.is_too_large(size)) or source_filter.is_excluded(rel_path):
+            continue
+        selected.append((rel_path, oid))
 
-    - Searches on both sides of the target date (before and after)
-    - Uses a local persistent clone with shallow fetch and progressive deepening
-    - If both sides are equidistant, prefers the later commit (assumption documented)
+    if partial:
+        hydrate_blobs(repo_path, commit_sha, [oid for _, oid in selected])
+
+    for rel_path, oid in selected:
+        data = git.read(oid)
+        if data is None or source_filter.is_binary(data):
+            continue
+        if partial and source_filter.is_too_large(len(data)):
+            continue
+
+        code = data.decode("utf-8", errors="ignore")
+        if source_filter.is_minified(code):
+            continue
+
+        yield rel_path, code
+
+
+def diff_name_status(owner, name, old_sha, new_sha):
+    """
+    Return the supported source files changed between two commits.
 
     Returns:
-      (commit_sha, commit_date_dd_mm_YYYY_HH_MM) or (None, None) if not found.
+        dict[str, str]: path -> status letter ("A", "M", "D", ...). Renames
+        are reported as a deletion plus an addition.
     """
-    # Normalize target to UTC and use ISO format for git options
-    target_dt = datetime.strptime(date_str, "%d/%m/%Y %H:%M").replace(tzinfo=timezone.utc)
-    target_git_date = target_dt.isoformat(" ")
+    repo_path = ensure_local_repo(owner, name)
+    ensure_commit(repo_path, old_sha)
+    ensure_commit(repo_path, new_sha)
+
+    out = subprocess.check_output(
+        ["git", "-C", repo_path, "diff", "--name-status", "--no-renames", "-z", old_sha, new_sha],
+        stderr=subprocess.DEVNULL,
+    )
+
+    changes = {}
+    fields = out.split(b"\0")
+    for status, path in zip(fields[0::2], fields[1::2]):
+        rel_path = path.decode("utf-8", errors="surrogateescape")
+        _, ext = os.path.splitext(rel_path)
+        if ext in SUPPORTED_SOURCE_EXTENSIONS:
+            changes[rel_path] = status.decode()[:1]
+
+    return changes
+
+
+@contextmanager
+def lease_worktree(owner, name, commit_sha):
+    """
+    Lease a worktree of the cached clone with `commit_sha` checked out.
+
+    Only needed by tools that read the files from disk (e.g. PMD-CPD). The
+    worktree comes from a per-repository pool, so concurrent tasks never
+    move each other's checkout. Only the files with a supported source
+    extension are checked out, so a partial clone never downloads the other
+    blobs of the commit.
+
+    Usage:
+        with lease_worktree(owner, name, sha) as path:
+            ...
+    """
+    repo_path = ensure_local_repo(owner, name)
+    ensure_commit(repo_path, commit_sha)
+
+    sparse_patterns = sorted(f"*{ext}" for ext in SUPPORTED_SOURCE_EXTENSIONS)
+    with get_worktree_pool(repo_path, sparse_patterns).lease(commit_sha) as path:
+        yield path
+
 
-    # Derive owner/name from URL
+def _owner_and_name_from_url(repo_url):
     url_no_git = repo_url[:-4] if repo_url.endswith(".git") else repo_url
     parts = url_no_git.rstrip('/').split('/')
-    owner, name = parts[-2], parts[-1]
-    repo_path = ensure_local_repo(owner, name)
+    return parts[-2], parts[-1]
 
-    def _get_commit_date(sha: str) -> datetime | None:
-        if not sha:
-            return None
-        try:
-            iso = subprocess.check_output(
-                ["git", "-C", repo_path, "show", "-s", "--format=%cI", sha],
-                text=True,
-            ).strip()
-
-            # Convert commit date to UTC for consistent comparisons
-            dt = datetime.fromisoformat(iso.replace("Z", "+00:00"))
-            return dt.astimezone(timezone.utc)
-        except subprocess.CalledProcessError:
-            return None
 
-    def _rev_before() -> str:
-        try:
-            return subprocess.check_output(
-                [
-                    "git", "-C", repo_path, "rev-list", "-n", "1",
-                    f"--before={target_git_date}", f"refs/remotes/origin/{branch}"
-                ],
-                text=True,
-                stderr=subprocess.DEVNULL,
-            ).strip()
-        except subprocess.CalledProcessError:
-            return ""
+# (repo_path, branch) -> oldest date from which the branch history is known to be
+# fetched, or _HISTORY_COMPLETE when the clone is not shallow
+_history_coverage = {}
+_history_coverage_lock = threading.Lock()
+_HISTORY_COMPLETE = "complete"
 
-    def _rev_after() -> str:
-        try:
-            return subprocess.check_output(
-                [
-                    "git", "-C", repo_path, "rev-list", "--reverse", "-n", "1",
-                    f"--since={target_git_date}", f"refs/remotes/origin/{branch}"
-                ],
-                text=True,
-                stderr=subprocess.DEVNULL,
-            ).strip()
-        except subprocess.CalledProcessError:
-            return ""
-
-    def _select_best() -> tuple[str, datetime] | None:
-        before_sha = _rev_before()
-        after_sha = _rev_after()
-        before_dt = _get_commit_date(before_sha)
-        after_dt = _get_commit_date(after_sha)
-        if not before_dt and not after_dt:
-            return None
-        if before_dt and after_dt:
-            diff_before = abs((target_dt - before_dt).total_seconds())
-            diff_after = abs((after_dt - target_dt).total_seconds())
-            return (
-                (after_sha, after_dt) if diff_after <= diff_before else (before_sha, before_dt)
-            )
-        if before_dt:
-            return before_sha, before_dt
-        return after_sha, after_dt
 
+def ensure_branch_history(repo_path, branch, since_dt):
+    """
+    Make sure the branch history is fetched back to `since_dt`, plus the closest commit before it.
+
+    The coverage is remembered per repository and branch, so history that was
+    already fetched is never requested again. The tip of the branch still is,
+    through the TTL-coalesced fetch_coordinator.refresh.
+    """
     try:
-        max_depth = 131072
-        try:
-            subprocess.run(
-                [
-                    "git", "-C", repo_path, "fetch", "--force", "--prune",
-                    f"--shallow-since={target_git_date}", "origin",
-                    f"{branch}:refs/remotes/origin/{branch}",
-                ],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-        except subprocess.CalledProcessError:
-            subprocess.run(
-                [
-                    "git", "-C", repo_path, "fetch", "--depth", "32", "origin",
-                    f"{branch}:refs/remotes/origin/{branch}",
-                ],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-
-        # Initial selection after fetch
-        best = _select_best()
-        if best:
-            best_sha, best_dt = best
-            # If we fetched with shallow-since, the 'after' candidate is globally earliest after target.
-            # We only need to deepen if 'before' is missing and could be the closer one.
-            before_sha = _rev_before()
-            if before_sha:
-                return best_sha, best_dt.astimezone(timezone.utc).strftime("%d/%m/%Y %H:%M")
-
-        # Progressive backward deepening loop
-        depth = 32
-        while True:
-            before_sha = _rev_before()
-            if before_sha:
-                # Recompute best with the new history in place
-                best2 = _select_best()
-                if best2:
-                    best_sha, best_dt = best2
-                    return best_sha, best_dt.astimezone(timezone.utc).strftime("%d/%m/%Y %H:%M")
-
-            if depth >= max_depth:
-                # Try to unshallow fully and decide
-                try:
-                    subprocess.run(
-                        [
-                            "git", "-C", repo_path, "fetch", "--unshallow", "origin",
-                            f"{branch}:refs/remotes/origin/{branch}"
-                        ],
-                        check=True,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                    )
-                except subprocess.CalledProcessError:
-                    pass
-
-                best3 = _select_best()
-                if best3:
-                    best_sha, best_dt = best3
-                    return best_sha, best_dt.astimezone(timezone.utc).strftime("%d/%m/%Y %H:%M")
-                return None, None
-
-            deepen_by = depth if depth < 8192 else 8192
-            subprocess.run(
-                [
-                    "git", "-C", repo_path, "fetch", f"--deepen={deepen_by}", "origin",
-                    f"{branch}:refs/remotes/origin/{branch}"
-                ],
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
-            depth += deepen_by
+        fetch_coordinator.refresh(repo_path)
     except subprocess.CalledProcessError:
+        # offline: answer with the history we already have
         pass
 
-    return None, None
+    key = (repo_path, branch)
+    with _history_coverage_lock:
+        coverage = _history_coverage.get(key)
+    if coverage == _HISTORY_COMPLETE or (coverage is not None and coverage <= since_dt):
+        return
+
+    refspec = f"{branch}:refs/remotes/origin/{branch}"
+    try:
+        if get_git_access(repo_path).is_shallow():
+            fetch_coordinator.fetch(repo_path, "--force", f"--shallow-since={since_dt.isoformat(' ')}", "origin", refspec)
+            # one more commit so the closest commit before `since_dt` is known too
+            fetch_coordinator.fetch(repo_path, "--force", "--deepen=1", "origin", refspec, force=True)
+        coverage = since_dt if get_git_access(repo_path).is_shallow() else _HISTORY_COMPLETE
+    except subprocess.CalledProcessError:
+        # offline: answer with the history we already have
+        return
+
+    with _history_coverage_lock:
+        _history_coverage[key] = coverage
+
+
+def load_commit_dates(repo_path, branch):
+    """
+    Load the (committer timestamp, sha) pairs of a branch with a single git log, oldest first.
+
+    Returns:
+        tuple[list[int], list[str]]: sorted timestamps and the matching shas
+    """
+    try:
+        out = subprocess.check_output(
+            ["git", "-C", repo_path, "log", "--format=%ct %H", f"refs/remotes/origin/{branch}", "--"],
+            text=True, stderr=subprocess.DEVNULL,
+        )
+    except subprocess.CalledProcessError:
+        return [], []
+
+    pairs = []
+    for line in out.splitlines():
+        timestamp, sha = line.split(" ", 1)
+        pairs.append((int(timestamp), sha))
+    pairs.sort()
+
+    return [p[0] for p in pairs], [p[1] for p in pairs]
+
+
+def get_closest_commits(repo_url, branch, date_strs):
+    """
+    Find, for each date, the commit on `branch` whose committer date is closest to it.
+
+    The branch history is loaded once and each date is answered with a bisect.
+    If the commits before and after a date are equidistant, the later one is
+    preferred.
+
+    Args:
+        repo_url (str): Repository URL
+        branch (str): Branch name
+        date_strs (list[str]): Target dates "dd/mm/YYYY HH:MM" (UTC)
+
+    Returns:
+        list[tuple]: (commit_sha, commit_date_dd_mm_YYYY_HH_MM) or (None, None) per date, in input order.
+    """
+    if not date_strs:
+        return []
+
+    targets = [
+        datetime.strptime(date_str, "%d/%m/%Y %H:%M").replace(tzinfo=timezone.utc)
+        for date_str in date_strs
+    ]
+
+    owner, name = _owner_and_name_from_url(repo_url)
+    repo_path = ensure_local_repo(owner, name)
+    ensure_branch_history(repo_path, branch, min(targets))
+
+    timestamps, shas = load_commit_dates(repo_path, branch)
+
+    results = []
+    for target_dt in targets:
+        target = target_dt.timestamp()
+        index = bisect.bisect_left(timestamps, target)
+        candidates = []
+        if index < len(timestamps):
+            candidates.append(index)
+        if index > 0:
+            candidates.append(index - 1)
+
+        if not candidates:
+            results.append((None, None))
+            continue
+
+        # ties go to the later commit, which comes first in candidates
+        best = min(candidates, key=lambda i: abs(timestamps[i] - target))
+        best_dt = datetime.fromtimestamp(timestamps[best], tz=timezone.utc)
+        results.append((shas[best], best_dt.strftime("%d/%m/%Y %H:%M")))
+
+    return results
+
+
+def get_closest_commit(repo_url, branch, date_str):
+    """
+    Find the commit on `branch` of `repo_url` whose committer date is closest to `date_str`.
+
+    See get_closest_commits to resolve many dates at once.
+
+    Returns:
+      (commit_sha, commit_date_dd_mm_YYYY_HH_MM) or (None, None) if not found.
+    """
+    return get_closest_commits(repo_url, branch, [date_str])[0]
 
 
 def get_commit_message(repo_url, sha):
     """Return the commit subject (first line) for the given SHA, or None if unavailable."""
     if not sha:
         return None
-    # Derive owner/name from URL
-    url_no_git = repo_url[:-4] if repo_url.endswith(".git") else repo_url
-    parts = url_no_git.rstrip('/').split('/')
-    owner, name = parts[-2], parts[-1]
+    owner, name = _owner_and_name_from_url(repo_url)
     repo_path = ensure_local_repo(owner, name)
-    try:
-        subject = subprocess.check_output(
-            ["git", "-C", repo_path, "show", "-s", "--format=%s", sha],
-            text=True,
-            stderr=subprocess.DEVNULL,
-        ).strip()
-        return subject or None
-    except subprocess.CalledProcessError:
+    commit = get_git_access(repo_path).read_commit(sha)
+    if commit is None:
         return None
+    # subject: the first paragraph, joined like `git show --format=%s`
+    subject = " ".join(commit["message"].strip().split("\n\n", 1)[0].split("\n")).strip()
+    return subject or None
 
 
 def fetch_branches(owner, name):
@@ -285,67 +445,117 @@ def fetch_branches(owner, name):
     try:
         repo_path = ensure_local_repo(owner, name)
 
-        # Update refs from origin (quietly)
+        # Update refs from origin, unless they were fetched recently
         try:
-            subprocess.run(["git", "-C", repo_path, "fetch", "--prune", "origin"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            fetch_coordinator.refresh(repo_path)
         except subprocess.CalledProcessError:
             pass
 
-        # List remote heads and parse branch names
-        out = subprocess.check_output(["git", "-C", repo_path, "ls-remote", "--heads", "origin"], text=True)
-        branches = []
-        for line in out.splitlines():
-            parts = line.split()
-            if len(parts) >= 2 and parts[1].startswith("refs/heads/"):
-                branches.append(parts[1].replace("refs/heads/", ""))
-        
-        return branches
+        # List the remote-tracking branches fetched above
+        out = subprocess.check_output(
+            ["git", "-C", repo_path, "for-each-ref", "--format=%(refname:strip=3)", "refs/remotes/origin/"],
+            text=True,
+        )
+        return [branch for branch in out.splitlines() if branch and branch != "HEAD"]
     except subprocess.CalledProcessError as e:
         return []
 
 
+def get_branch_commits(owner, name, branch_name, max_count=100):
+    """
+    Return the latest commits of a branch from the cached clone, without fetching.
+
+    Returns:
+        list[dict]: sha, author, date (ISO 8601 UTC) and message, newest first
+    """
+    repo_path = ensure_local_repo(owner, name)
+    return list(iter_git_log(repo_path, f"refs/remotes/origin/{branch_name}", f"--max-count={max_count}"))
+
+
 def get_latest_commits(owner, name, branch_name):
     repo_path = ensure_local_repo(owner, name)
 
-    repo = Repo(repo_path)
-    # Fetch quietly to avoid printing git progress/info to logs
+    # Update refs from origin, unless they were fetched recently
     try:
-        subprocess.run(["git", "-C", repo_path, "fetch", "--prune", "origin"], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        fetch_coordinator.refresh(repo_path)
     except Exception:
-        # Fall back to GitPython fetch if subprocess fails
-        try:
-            repo.remotes.origin.fetch()
-        except Exception:
-            pass
+        pass
 
     # only search for origin references
-    for r in repo.references:
-        if r.name == f"origin/{branch_name}":
-            ref = r
+    git = get_git_access(repo_path)
+    ref = git.resolve(f"refs/remotes/origin/{branch_name}")
 
     if not ref:
         raise ValueError(
-            f"Branch '{branch_name}' not found. Available refs: {[r.name for r in repo.references]}"
+            f"Branch '{branch_name}' not found. Available branches: {fetch_branches(owner, name)}"
         )
 
-    commits = list(repo.iter_commits(ref, max_count=100))
-
     return [
         {
-            "hash": c.hexsha,
-            "short_hash": c.hexsha[:7],
-            "author": c.author.name,
-            "email": c.author.email,
-            "date": c.committed_datetime.isoformat(),
-            "message": c.message.strip(),
+            "hash": c["sha"],
+            "short_hash": c["sha"][:7],
+            "author": c["author"],
+            "email": c["author_email"],
+            "date": c["committer_date"].isoformat(),
+            "message": c["message"].strip(),
         }
-        for c in commits
+        for c in git.iter_commits(ref, max_count=100)
     ]
 
 
+_LOG_FIELD_SEP = "\x1f"
+_LOG_RECORD_SEP = "\x1e"
+
+
+def iter_git_log(repo_path, rev, *args):
+    """
+    Stream the commits of `git log <args> <rev>` without loading the whole output.
+
+    Yields:
+        dict: sha, author, date (author date, ISO 8601 UTC) and message
+    """
+    cmd = [
+        "git", "-C", repo_path, "log",
+        f"--format=%H{_LOG_FIELD_SEP}%an{_LOG_FIELD_SEP}%aI{_LOG_FIELD_SEP}%B{_LOG_RECORD_SEP}",
+        *args, rev, "--",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding="utf-8", errors="replace")
+
+    buffer = ""
+    try:
+        for chunk in iter(lambda: proc.stdout.read(65536), ""):
+            buffer += chunk
+            *records, buffer = buffer.split(_LOG_RECORD_SEP)
+            for record in records:
+                record = record.lstrip("\n")
+                if record:
+                    yield _parse_log_record(record)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def _parse_log_record(record):
+    sha, author, date, message = record.split(_LOG_FIELD_SEP, 3)
+    utc_date = datetime.fromisoformat(date).astimezone(timezone.utc)
+
+    return {
+        "sha": sha,
+        "author": author,
+        "date": utc_date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "message": message.rstrip("\n"),
+    }
+
+
 def get_commits_in_date_range(owner, name, branch_name, start_date, end_date):
     """
-    Get all commits from a specific GitHub branch between two dates (no authentication).
+    Get all commits from a branch between two dates.
+
+    The commits are read from the cached clone with `git log`; the GitHub REST
+    API is only used as a fallback when the branch cannot be read locally.
 
     Args:
         owner (str): Repository owner (e.g. "torvalds")
@@ -355,8 +565,65 @@ def get_commits_in_date_range(owner, name, branch_name, start_date, end_date):
         end_date (str): End date "dd/mm/YYYY HH:MM"
 
     Returns:
-        list[dict]: List of commits with sha, message, author, and date.
+        list[dict]: List of commits with sha, message, author, date and url, newest first.
     """
+    try:
+        return get_commits_in_date_range_from_clone(owner, name, branch_name, start_date, end_date)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Local commit listing failed for {owner}/{name}@{branch_name}, using the GitHub API: {e}")
+        return get_commits_in_date_range_from_api(owner, name, branch_name, start_date, end_date)
+
+
+def get_commits_in_date_range_from_clone(owner, name, branch_name, start_date, end_date):
+    """Same as get_commits_in_date_range, read from the cached clone only."""
+    repo_path = ensure_local_repo(owner, name)
+
+    # Refresh the branches, but keep working offline with what the clone already has
+    try:
+        fetch_coordinator.refresh(repo_path)
+    except subprocess.CalledProcessError:
+        pass
+
+    return _log_commits_in_date_range(repo_path, owner, name, branch_name, start_date, end_date)
+
+
+def get_cached_commits_in_date_range(owner, name, branch_name, start_date, end_date):
+    """
+    Same as get_commits_in_date_range, from the clone as it is: nothing is
+    cloned or fetched, so it is cheap enough for a request handler.
+
+    Returns:
+        list[dict] | None: None when the repository is not cloned or the branch cannot be read
+    """
+    path = repo_dir(owner, name)
+    # the clone is not evicted while it is read
+    with repo_cache.hold(path):
+        if not os.path.isdir(os.path.join(path, ".git")):
+            return None
+        try:
+            return _log_commits_in_date_range(path, owner, name, branch_name, start_date, end_date)
+        except (subprocess.CalledProcessError, OSError):
+            return None
+
+
+def _log_commits_in_date_range(repo_path, owner, name, branch_name, start_date, end_date):
+    # Dates are given in UTC, like the GitHub API
+    start_dt = datetime.strptime(start_date, "%d/%m/%Y %H:%M").replace(tzinfo=timezone.utc)
+    end_dt = datetime.strptime(end_date, "%d/%m/%Y %H:%M").replace(tzinfo=timezone.utc)
+
+    commits = []
+    for commit in iter_git_log(
+        repo_path, f"refs/remotes/origin/{branch_name}",
+        f"--since={start_dt.isoformat(' ')}", f"--until={end_dt.isoformat(' ')}",
+    ):
+        commit["url"] = f"https://github.com/{owner}/{name}/commit/{commit['sha']}"
+        commits.append(commit)
+
+    return commits
+
+
+def get_commits_in_date_range_from_api(owner, name, branch_name, start_date, end_date):
+    """Same as get_commits_in_date_range, through the GitHub REST API (no authentication)."""
     # Convert to ISO 8601 for GitHub API
     start_dt = datetime.strptime(start_date, "%d/%m/%Y %H:%M").isoformat() + "Z"
     end_dt = datetime.strptime(end_date, "%d/%m/%Y %H:%M").isoformat() + "Z"
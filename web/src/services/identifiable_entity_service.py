@@ -1,8 +1,8 @@
 import uuid
-import re
 
 from src.models import db
 from src.models.model import *
+from src.utilities.entity_scanner import get_entity_scanner
 
 
 def create_identifiable_entity(name):
@@ -73,15 +73,15 @@ def search_identifable_entity(code, identifiable_entity):
     Returns:
         List of objects with line numbers where the string was found
     """
+    return get_entity_scanner((identifiable_entity,)).scan(code)[identifiable_entity]
 
-    pattern = re.compile(rf'(?im)\b(?P<tag>{re.escape(identifiable_entity)})\b\s*:?\s*(?P<rest>.*)')
-    findings = []
-    for i, line in enumerate(code.splitlines(), start=1):
 
-        m = pattern.search(line)
-        if not m:
-            # if not found then skip code and check next lines  
-            continue
+def search_identifiable_entities(code, entity_names):
+    """
+    Search for several entities in one pass over the file content (see EntityScanner).
 
-        findings.append(i)
-    return findings
\ No newline at end of file
+    Returns:
+        list[tuple[str, int]]: (entity name, line number), grouped by entity in `entity_names` order
+    """
+    found = get_entity_scanner(tuple(entity_names)).scan(code)
+    return [(name, line) for name in entity_names for line in found[name]]
@@ -1,9 +1,15 @@
+import os
 import uuid
 import time
+import threading
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+from datetime import datetime
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import ExitStack, closing
+
 from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 
 from src.models import db
 from src.models.model import *
@@ -17,61 +23,13 @@ import src.services.repository_service as repository_service
 import src.services.branch_service as branch_service
 import src.services.commit_service as commit_service
 import src.services.file_service as file_service
+from src.services.analysis_engine import analysis_engine
+from src.services.cancellation import CancellationToken, TaskCancelled
+from src.services.debt_evolution_cache import debt_evolution_cache
+from src.database.analysis_bulk_writer import AnalysisBulkWriter
 import re
 from src.controllers.duplication_controller import DuplicationController
 
-# Thread-safe database operation lock
-_db_lock = Lock()
-
-
-def _process_single_file_for_metrics(filename, code, commit_id, identifiable_entities, app):
-    """
-    Process a single file for metrics analysis in parallel.
-    
-    Args:
-        filename: Name of the file
-        code: Source code content
-        commit_id: ID of the commit
-        identifiable_entities: List of identifiable entities to search for
-        app: Flask application instance for context
-        
-    Returns:
-        dict: Contains file object, analysis results, and metrics
-    """
-    with app.app_context():
-        # Create file record (thread-safe)
-        with _db_lock:
-            file = file_service.create_file(filename, commit_id)
-            
-            # Check if duplications already exist for this specific file
-            existing_file_duplications = (
-                db.session.query(Duplication)
-                .filter(Duplication.file_id == file.id)
-                .first()
-            )
-        
-        needs_duplication = not existing_file_duplications
-        
-        # Calculate identifiable entities for this file
-        identifiable_identities_analysis = calculate_identifiable_identities_analysis(file, code)
-        
-        # Calculate complexity for this file
-        complexity_analysis = calculate_cyclomatic_complexity_analysis(file, code)
-        
-        # Compute metrics
-        file_complexity = sum(c["cyclomatic_complexity"] for c in complexity_analysis)
-        file_function_count = len(complexity_analysis)
-        
-        return {
-            'file': file,
-            'needs_duplication': needs_duplication,
-            'identifiable_identities': identifiable_identities_analysis,
-            'complexity_analysis': complexity_analysis,
-            'total_complexity': file_complexity,
-            'function_count': file_function_count
-        }
-
-
 class MetricsClass:
     repo = None
     branch = None
@@ -87,105 +45,76 @@ class MetricsClass:
 
         return commits_in_range
 
-    def ensure_metric_snapshot(self, commit_to_check):
+    def ensure_metric_snapshot(self, commit_to_check, cancellation=None):
+        cancellation = cancellation or CancellationToken()
+
         # check if there is a snapshot of the count of identifiable identities
         existing_counts = IdentifiableEntityCount.query.filter_by(commit_id=commit_to_check.id).all()
         existing_complexity = ComplexityCount.query.filter_by(commit_id=commit_to_check.id).first()
 
-        if existing_counts and existing_complexity:
+        if existing_counts and existing_complexity and not _has_incremental_snapshot(commit_to_check.id):
             # snapshots already calculated for this commit
             return
+        # an incremental snapshot only has the counts, the files and duplications are added below
 
         try:
-            # the snapshot has not yet been calculated, so we calculate it
+            # the snapshot has not yet been calculated, so we calculate it (files are streamed)
             remote_files = github_service.fetch_files(self.repo.owner, self.repo.name, commit_to_check.sha)
 
             # Initialize counters for each identifiable entity type
             identifiable_entities = identifiable_entity_service.get_all_identifiable_entities()
             entity_totals = {}
+            entity_ids = {}
             for entity in identifiable_entities:
                 entity_totals[entity.id] = {"name": entity.name, "count": 0}
+                entity_ids[entity.name] = entity.id
 
             # Initialize complexity tracking
             total_complexity = 0
             function_count = 0
-            files_for_duplication = []
-
-            # Get Flask app for context in threads
-            try:
-                app = current_app._get_current_object()
-            except RuntimeError:
-                # Fallback if not in app context
-                from src.app import app as flask_app
-                app = flask_app
-
-            # Process files in parallel using ThreadPoolExecutor
-            max_workers = min(8, len(remote_files)) if remote_files else 1
-            
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Submit all file processing tasks
-                future_to_file = {
-                    executor.submit(_process_single_file_for_metrics, filename, code, commit_to_check.id, identifiable_entities, app): (filename, code)
-                    for filename, code in remote_files
-                }
-                
-                # Collect results as they complete
-                for future in as_completed(future_to_file):
-                    try:
-                        result = future.result()
-                        
-                        # Accumulate entity counts
-                        for entity_analysis in result['identifiable_identities']:
-                            entity_name = entity_analysis["entity_name"]
-                            for entity_id, entity_info in entity_totals.items():
-                                if entity_info["name"] == entity_name:
-                                    entity_totals[entity_id]["count"] += 1
-                                    break
-                        
-                        # Accumulate complexity metrics
-                        total_complexity += result['total_complexity']
-                        function_count += result['function_count']
-                        
-                        # Track files needing duplication analysis
-                        if result['needs_duplication']:
-                            files_for_duplication.append(result['file'])
-                            
-                    except Exception as e:
-                        filename, code = future_to_file[future]
-                        print(f"Error processing file {filename}: {str(e)}")
-
-            # Calculate code duplications for files that don't have them yet
+            writer = AnalysisBulkWriter(commit_to_check.id)
+
+            # lizard runs on the worker processes of the analysis engine, the rows are written from here.
+            # Closing the analysis drops the files still queued when the task is cancelled
+            with closing(analysis_engine.analyze(remote_files, entity_ids)) as analysis:
+                for filename, functions, entity_lines in analysis:
+                    cancellation.check()
+                    writer.add_file(filename, functions, entity_lines, entity_ids)
+
+                    # Accumulate entity counts
+                    for entity_name, _ in entity_lines:
+                        entity_totals[entity_ids[entity_name]]["count"] += 1
+
+                    # Accumulate complexity metrics
+                    total_complexity += sum(complexity for _, _, complexity in functions)
+                    function_count += len(functions)
+
+            # the duplication analysis links its rows to the stored files. They are only committed once
+            # PMD is done, so a snapshot cancelled before leaves no partial rows behind
+            cancellation.check()
+            files = writer.flush()
+
+            # Calculate code duplications for files that don't have them yet. The writer returns every
+            # file of the commit, also the ones already stored (and analyzed) by save_commit_and_analyse
+            analyzed_file_ids = _files_with_duplications(commit_to_check.id)
+            files_for_duplication = [file for file in files if file.id not in analyzed_file_ids]
             if files_for_duplication:
                 try:
-                    # Ensure local repository is available
-                    repo_dir = github_service.ensure_local_repo(self.repo.owner, self.repo.name)
-                    
-                    # Get duplication controller and run analysis
-                    duplication_controller = DuplicationController.singleton()
-                    duplication_controller.find_duplications("pmd_cpd", repo_dir, files_for_duplication)
+                    # PMD reads the files from disk, so it runs on a worktree checked out at the commit
+                    with github_service.lease_worktree(self.repo.owner, self.repo.name, commit_to_check.sha) as repo_dir:
+                        # Get duplication controller and run analysis
+                        duplication_controller = DuplicationController.singleton()
+                        duplication_controller.find_duplications("pmd_cpd", repo_dir, files_for_duplication, cancellation)
+                except TaskCancelled:
+                    raise
                 except Exception as e:
-                    print("error calculating duplication")
-
-            # Store the entity counts in the database
-            if not existing_counts:
-                for entity_id, entity_info in entity_totals.items():
-                    db.session.add(IdentifiableEntityCount(
-                        id = str(uuid.uuid4()),
-                        identifiable_entity_id = entity_id,
-                        commit_id = commit_to_check.id,
-                        count = entity_info["count"],
-                    ))
-
-            # Store the complexity summary in the database
-            if not existing_complexity:
-                average_complexity = total_complexity / function_count if function_count > 0 else 0
-                db.session.add(ComplexityCount(
-                    id = str(uuid.uuid4()),
-                    commit_id = commit_to_check.id,
-                    total_complexity = total_complexity,
-                    function_count = function_count,
-                    average_complexity = average_complexity,
-                ))
+                    print(f"error calculating duplication: {str(e)}")
+
+            _add_snapshot_counts(
+                commit_to_check.id, entity_totals, total_complexity, function_count,
+                add_entity_counts=not existing_counts, add_complexity=not existing_complexity,
+            )
+            _write_commit_summary(commit_to_check, entity_totals, total_complexity, function_count, len(files))
 
             db.session.commit()
 
@@ -193,26 +122,206 @@ class MetricsClass:
             db.session.rollback()
             raise
 
+    def ensure_incremental_snapshot(self, commit_to_check, baseline=None, cancellation=None):
+        """
+        Diff-driven variant of ensure_metric_snapshot.
+
+        Only the files changed since `baseline` (the last commit analyzed in
+        this mode) are fetched and analyzed, the contributions of the other
+        files are carried forward. Per-file rows and duplications are not
+        stored in this mode, only the commit totals.
+
+        Args:
+            commit_to_check: Commit to snapshot
+            baseline (SnapshotBaseline, optional): per-file metrics of a previously analyzed commit
+            cancellation (CancellationToken, optional): checked between files
+
+        Returns:
+            SnapshotBaseline: the baseline to pass for the next commit
+        """
+        cancellation = cancellation or CancellationToken()
+        existing_counts = IdentifiableEntityCount.query.filter_by(commit_id=commit_to_check.id).all()
+        existing_complexity = ComplexityCount.query.filter_by(commit_id=commit_to_check.id).first()
+
+        if existing_counts and existing_complexity:
+            # nothing to compute, keep diffing from the previous baseline
+            return baseline
+
+        try:
+            identifiable_entities = identifiable_entity_service.get_all_identifiable_entities()
+
+            if baseline is None:
+                file_metrics = {}
+                remote_files = github_service.fetch_files(self.repo.owner, self.repo.name, commit_to_check.sha)
+            else:
+                file_metrics = dict(baseline.file_metrics)
+                changes = github_service.diff_name_status(self.repo.owner, self.repo.name, baseline.sha, commit_to_check.sha)
+                for path in changes:
+                    file_metrics.pop(path, None)
+
+                changed_paths = {path for path, status in changes.items() if status != "D"}
+                remote_files = []
+                if changed_paths:
+                    remote_files = github_service.fetch_files(self.repo.owner, self.repo.name, commit_to_check.sha, paths=changed_paths)
+
+            entity_ids = {entity.name: entity.id for entity in identifiable_entities}
+            with closing(analysis_engine.analyze(remote_files, entity_ids)) as analysis:
+                for filename, functions, entity_lines in analysis:
+                    cancellation.check()
+                    file_metrics[filename] = summarize_file_analysis(functions, entity_lines, entity_ids)
+            cancellation.check()
+
+            entity_totals = {}
+            for entity in identifiable_entities:
+                entity_totals[entity.id] = {"name": entity.name, "count": 0}
+
+            total_complexity = 0
+            function_count = 0
+            for metrics in file_metrics.values():
+                total_complexity += metrics["total_complexity"]
+                function_count += metrics["function_count"]
+                for entity_id, count in metrics["entity_counts"].items():
+                    if entity_id in entity_totals:
+                        entity_totals[entity_id]["count"] += count
+
+            _add_snapshot_counts(
+                commit_to_check.id, entity_totals, total_complexity, function_count,
+                add_entity_counts=not existing_counts, add_complexity=not existing_complexity,
+            )
+            _write_commit_summary(
+                commit_to_check, entity_totals, total_complexity, function_count, len(file_metrics), count_duplications=False
+            )
+            db.session.commit()
+
+            return SnapshotBaseline(commit_to_check.sha, file_metrics)
+
+        except Exception as e:
+            db.session.rollback()
+            raise
+
+
+class SnapshotBaseline:
+    """Per-file metrics of the last commit analyzed by ensure_incremental_snapshot."""
+
+    def __init__(self, sha, file_metrics):
+        self.sha = sha
+        # path -> {"total_complexity", "function_count", "entity_counts": {entity_id: count}}
+        self.file_metrics = file_metrics
+
+
+def _add_snapshot_counts(commit_id, entity_totals, total_complexity, function_count, add_entity_counts=True, add_complexity=True):
+    """Add the IdentifiableEntityCount and ComplexityCount rows of a commit to the session."""
+    # Store the entity counts in the database
+    if add_entity_counts:
+        for entity_id, entity_info in entity_totals.items():
+            db.session.add(IdentifiableEntityCount(
+                id = str(uuid.uuid4()),
+                identifiable_entity_id = entity_id,
+                commit_id = commit_id,
+                count = entity_info["count"],
+            ))
+
+    # Store the complexity summary in the database
+    if add_complexity:
+        average_complexity = total_complexity / function_count if function_count > 0 else 0
+        db.session.add(ComplexityCount(
+            id = str(uuid.uuid4()),
+            commit_id = commit_id,
+            total_complexity = total_complexity,
+            function_count = function_count,
+            average_complexity = average_complexity,
+        ))
+
+
+def _write_commit_summary(commit, entity_totals, total_complexity, function_count, file_count, count_duplications=True):
+    """
+    Upsert the CommitMetricSummary of a commit in the current transaction.
+
+    Args:
+        commit: the Commit
+        entity_totals (dict): entity id -> {"name", "count"}, as for _add_snapshot_counts
+        file_count (int): number of files of the snapshot
+        count_duplications (bool): False when the duplications of the commit were not analyzed
+    """
+    duplication_count = duplicated_line_count = None
+    if count_duplications:
+        # each duplication repeats the lines of its stored fragment
+        duplication_count, duplicated_line_count = db.session.query(
+            func.count(Duplication.id), func.coalesce(func.sum(CodeFragment.line_count), 0)
+        ).join(File, File.id == Duplication.file_id).join(
+            CodeFragment, CodeFragment.id == Duplication.code_fragment_id
+        ).filter(File.commit_id == commit.id).one()
+
+    is_bug_linked = commit.is_bug_linked
+    if is_bug_linked is None:
+        # classified once, the commit and its summary keep the same flag (see classify_bug_linked_commits)
+        is_bug_linked = is_bug_linked_message(commit.message)
+        Commit.query.filter(Commit.id == commit.id).update({Commit.is_bug_linked: is_bug_linked}, synchronize_session=False)
+
+    values = {
+        "total_complexity": total_complexity,
+        "average_complexity": total_complexity / function_count if function_count > 0 else 0,
+        "function_count": function_count,
+        "entity_counts": {entity_info["name"]: entity_info["count"] for entity_info in entity_totals.values()},
+        "duplication_count": duplication_count,
+        "duplicated_line_count": duplicated_line_count,
+        "file_count": file_count,
+        "is_bug_linked": is_bug_linked,
+    }
+
+    table = CommitMetricSummary.__table__
+    stmt = insert(table).values(id=str(uuid.uuid4()), commit_id=commit.id, **values)
+    db.session.execute(stmt.on_conflict_do_update(index_elements=[table.c.commit_id], set_=values))
+
+
+def _has_incremental_snapshot(commit_id):
+    """True when the snapshot of a commit was taken by ensure_incremental_snapshot (no files, no duplications)."""
+    return db.session.query(
+        CommitMetricSummary.query.filter(
+            CommitMetricSummary.commit_id == commit_id, CommitMetricSummary.duplication_count.is_(None)
+        ).exists()
+    ).scalar()
+
+
+def _files_with_duplications(commit_id):
+    """Ids of the stored files of a commit that already have duplications."""
+    rows = db.session.query(Duplication.file_id).join(File, File.id == Duplication.file_id).filter(
+        File.commit_id == commit_id
+    ).distinct().all()
+    return {file_id for file_id, in rows}
+
+
+def summarize_file_analysis(functions, entity_lines, entity_ids):
+    """
+    Reduce the analysis of one file (see analysis_engine.analyze_source) to its totals.
+
+    Returns:
+        dict: total_complexity, function_count and entity_counts (entity id -> count)
+    """
+    entity_counts = {}
+    for entity_name, _ in entity_lines:
+        entity_id = entity_ids[entity_name]
+        entity_counts[entity_id] = entity_counts.get(entity_id, 0) + 1
+
+    return {
+        "total_complexity": sum(complexity for _, _, complexity in functions),
+        "function_count": len(functions),
+        "entity_counts": entity_counts,
+    }
+
 
 def calculate_cyclomatic_complexity_analysis(file, code):
     
     cyclomatic_complexity_analysis = []
     analysis = analyze_file.analyze_source_code(file.name, code)
-    for func in analysis.function_list:
-        # ensure function record exists
-        function = function_service.get_function_by_name_and_file(func.name, file.id)
-        if not function:
-            function = function_service.create_function(func.name, func.start_line, file.id)
 
-        # update or create complexity
-        existing_complexity = Complexity.query.filter_by(function_id=function.id).first()
-
-        if existing_complexity:
-            existing_complexity.value = func.cyclomatic_complexity
-            db.session.commit()
-        else:
-            complexity_service.create_complexity(func.cyclomatic_complexity, function.id)
+    # functions and complexities are upserted, no need to look them up first
+    writer = AnalysisBulkWriter(file.commit_id)
+    writer.add_functions(file.id, [(func.name, func.start_line, func.cyclomatic_complexity) for func in analysis.function_list])
+    writer.flush()
+    db.session.commit()
 
+    for func in analysis.function_list:
         cyclomatic_complexity_analysis.append({
             "file": file.name,
             "function": func.name,
@@ -223,24 +332,28 @@ def calculate_cyclomatic_complexity_analysis(file, code):
     return cyclomatic_complexity_analysis
 
 
-def calculate_identifiable_identities_analysis(file, code):
+def calculate_identifiable_identities_analysis(file, code, identities=None):
     identifiable_entity_analysis = []
 
-    # get all the identifiable identities to search for
-    identities = identifiable_entity_service.get_all_identifiable_entities()
-    for identity in identities:
-        # search the file for the identity (e.g. <TODO>, <FIXME>)
-        found_identities = identifiable_entity_service.search_identifable_entity(code, identity.name)
+    # get all the identifiable identities to search for, unless the caller already loaded them
+    if identities is None:
+        identities = identifiable_entity_service.get_all_identifiable_entities()
+    entity_ids = {identity.name: identity.id for identity in identities}
 
-        # link the found identity to the file it was found in
-        for line in found_identities:
-            identifiable_entity_service.create_file_entity(identity.id, file.id, line)
+    # search the file for all the identities (e.g. <TODO>, <FIXME>) at once
+    entity_lines = identifiable_entity_service.search_identifiable_entities(code, list(entity_ids))
+    for entity_name, line in entity_lines:
+        identifiable_entity_analysis.append({
+            "file": file.name,
+            "start_line": line,
+            "entity_name": entity_name,
+        })
 
-            identifiable_entity_analysis.append({
-                "file": file.name,
-                "start_line": line,
-                "entity_name": identity.name,
-            })
+    # link the found identities to the file they were found in, in one insert
+    writer = AnalysisBulkWriter(file.commit_id)
+    writer.add_entity_lines(file.id, entity_lines, entity_ids)
+    writer.flush()
+    db.session.commit()
 
     return identifiable_entity_analysis
 
@@ -249,6 +362,150 @@ def calculate_identifiable_identities_analysis(file, code):
 # commits_in_range = github_service.get_commits_in_date_range(repo.owner, repo.name, branch.name, start_date, end_date)
 
 
+def get_snapshotted_commit_ids(commit_shas, full=False):
+    """
+    Find the commits that already have their metric snapshots (complexity and
+    identifiable entity counts).
+
+    Args:
+        commit_shas (list[str]): SHAs of the commits
+        full (bool, optional): skip the incremental snapshots, which have no files and duplications
+            (see ensure_metric_snapshot)
+
+    Returns:
+        dict[str, str]: SHA -> commit ID, for the commits with snapshots
+    """
+    has_complexity = db.session.query(ComplexityCount.id).filter(ComplexityCount.commit_id == Commit.id).exists()
+    has_entity_counts = db.session.query(IdentifiableEntityCount.id).filter(IdentifiableEntityCount.commit_id == Commit.id).exists()
+
+    conditions = [has_complexity, has_entity_counts]
+    if full:
+        conditions.append(~db.session.query(CommitMetricSummary.id).filter(
+            CommitMetricSummary.commit_id == Commit.id, CommitMetricSummary.duplication_count.is_(None)
+        ).exists())
+
+    snapshotted = {}
+    for i in range(0, len(commit_shas), 1000):
+        rows = db.session.query(Commit.sha, Commit.id).filter(
+            Commit.sha.in_(commit_shas[i:i + 1000]), *conditions
+        ).all()
+        for sha, commit_id in rows:
+            snapshotted.setdefault(sha, commit_id)
+
+    return snapshotted
+
+
+def get_debt_evolution_points(commit_ids):
+    """
+    Read the debt evolution data points of commits whose snapshots exist.
+
+    The points are read from CommitMetricSummary, one row per commit. Commits
+    analyzed before the summaries existed are read with
+    _aggregate_debt_evolution_points.
+
+    Args:
+        commit_ids (list[str]): commit IDs
+
+    Returns:
+        dict[str, dict]: commit ID -> data point (see calculate_debt_evolution)
+    """
+    if not commit_ids:
+        return {}
+
+    rows = db.session.query(
+        Commit.id, Commit.sha, Commit.date, Commit.author, Commit.message, CommitMetricSummary
+    ).join(
+        CommitMetricSummary, CommitMetricSummary.commit_id == Commit.id
+    ).filter(Commit.id.in_(commit_ids)).all()
+
+    data_points = {}
+    for commit_id, sha, date, author, message, summary in rows:
+        entity_breakdown = summary.entity_counts or {}
+        data_points[commit_id] = {
+            "commit_sha": sha,
+            "commit_date": date.isoformat() if date else None,
+            "commit_author": author,
+            "commit_message": message,
+            "total_identifiable_entities": sum(entity_breakdown.values()),
+            "entity_breakdown": entity_breakdown,
+            "complexity_data": {
+                "total_complexity": summary.total_complexity,
+                "function_count": summary.function_count,
+                "average_complexity": summary.average_complexity
+            },
+            "total_number_duplications": summary.duplication_count or 0,
+        }
+
+    missing = [commit_id for commit_id in commit_ids if commit_id not in data_points]
+    if missing:
+        data_points.update(_aggregate_debt_evolution_points(missing))
+
+    return data_points
+
+
+def _aggregate_debt_evolution_points(commit_ids):
+    """
+    Read the debt evolution data points of commits without CommitMetricSummary
+    with one query, instead of one query per commit and metric.
+
+    The entity counts and the duplications are aggregated per commit in
+    subqueries before being joined, so they do not multiply each other.
+    """
+    if not commit_ids:
+        return {}
+
+    entity_counts = db.session.query(
+        IdentifiableEntityCount.commit_id.label("commit_id"),
+        func.json_object_agg(IdentifiableEntity.name, IdentifiableEntityCount.count).label("entity_breakdown"),
+    ).join(
+        IdentifiableEntity, IdentifiableEntity.id == IdentifiableEntityCount.identifiable_entity_id
+    ).filter(
+        IdentifiableEntityCount.commit_id.in_(commit_ids)
+    ).group_by(IdentifiableEntityCount.commit_id).subquery()
+
+    duplications = db.session.query(
+        File.commit_id.label("commit_id"),
+        func.count(Duplication.id).label("total_number_duplications"),
+    ).join(
+        Duplication, Duplication.file_id == File.id
+    ).filter(
+        File.commit_id.in_(commit_ids)
+    ).group_by(File.commit_id).subquery()
+
+    rows = db.session.query(
+        Commit.id, Commit.sha, Commit.date, Commit.author, Commit.message,
+        ComplexityCount.total_complexity, ComplexityCount.function_count, ComplexityCount.average_complexity,
+        entity_counts.c.entity_breakdown,
+        duplications.c.total_number_duplications,
+    ).outerjoin(
+        ComplexityCount, ComplexityCount.commit_id == Commit.id
+    ).outerjoin(
+        entity_counts, entity_counts.c.commit_id == Commit.id
+    ).outerjoin(
+        duplications, duplications.c.commit_id == Commit.id
+    ).filter(Commit.id.in_(commit_ids)).all()
+
+    data_points = {}
+    for row in rows:
+        entity_breakdown = row.entity_breakdown or {}
+        data_points[row.id] = {
+            "commit_sha": row.sha,
+            "commit_date": row.date.isoformat() if row.date else None,
+            "commit_author": row.author,
+            "commit_message": row.message,
+            "total_identifiable_entities": sum(entity_breakdown.values()),
+            "entity_breakdown": entity_breakdown,
+            "complexity_data": {
+                "total_complexity": row.total_complexity,
+                "function_count": row.function_count,
+                "average_complexity": row.average_complexity
+            },
+            "total_number_duplications": row.total_number_duplications or 0,
+        }
+
+    return data_points
+
+
 def get_identifiable_entity_counts_for_commit(commit_id):
     """
     Count the number of times an identifiable identity for each one
@@ -306,52 +563,353 @@ LINKED_BUGS_KEYWORDS = re.compile(
 )
 
 
-def calculate_bug_counts_in_range(commits_in_range):
+BUG_ROLLING_WINDOW = 10
+
+
+def is_bug_linked_message(message):
+    """Whether a commit message mentions a bug or its fix (see LINKED_BUGS_KEYWORDS)."""
+    message = (message or "").strip().lower()
+
+    # Only count meaningful bug-related terms, not debug/prefix/etc.
+    return LINKED_BUGS_KEYWORDS.search(message) is not None
+
+
+def classify_bug_linked_commits(commit_ids):
     """
-    Receives a list of commits (each being a dict with a 'message' field)
-    Counts how many commit messages contain 'bug' or 'fix' (case-insensitive)
-    Returns a dict like: {"total": 7}
+    Classify the messages of the commits that were not classified yet and
+    store the result in Commit.is_bug_linked (and in the CommitMetricSummary
+    of the commit), so that each message is only matched once.
+
+    Args:
+        commit_ids (list[str]): ids of the commits
+
+    Returns:
+        dict[str, bool]: commit id -> whether the commit is linked to a bug
     """
-    linked_bugs = {"total": 0}
+    flags = {}
+    unclassified = {True: [], False: []}
+
+    for i in range(0, len(commit_ids), 1000):
+        rows = db.session.query(Commit.id, Commit.message, Commit.is_bug_linked).filter(
+            Commit.id.in_(commit_ids[i:i + 1000])
+        ).all()
+        for commit_id, message, is_bug_linked in rows:
+            if is_bug_linked is None:
+                is_bug_linked = is_bug_linked_message(message)
+                unclassified[is_bug_linked].append(commit_id)
+            flags[commit_id] = is_bug_linked
+
+    for is_bug_linked, ids in unclassified.items():
+        for i in range(0, len(ids), 1000):
+            Commit.query.filter(Commit.id.in_(ids[i:i + 1000])).update(
+                {Commit.is_bug_linked: is_bug_linked}, synchronize_session=False
+            )
+            CommitMetricSummary.query.filter(CommitMetricSummary.commit_id.in_(ids[i:i + 1000])).update(
+                {CommitMetricSummary.is_bug_linked: is_bug_linked}, synchronize_session=False
+            )
 
-    if not commits_in_range:
-        return linked_bugs
+    if unclassified[True] or unclassified[False]:
+        db.session.commit()
 
-    count = 0
-    for commit in commits_in_range:
-        message = commit.get("message", "") or ""
-        message = message.strip().lower()
+    return flags
 
-        # Only count meaningful bug-related terms, not debug/prefix/etc.
-        if LINKED_BUGS_KEYWORDS.search(message):
-            count += 1
 
-    linked_bugs["total"] = count    
+def bug_linked_series(flags, window=BUG_ROLLING_WINDOW):
+    """
+    Running counts of bug-linked commits.
 
-    return linked_bugs
+    Args:
+        flags (list[bool]): is_bug_linked of the commits, oldest first
+        window (int): number of commits of the rolling count
+
+    Returns:
+        list[tuple[int, int]]: (cumulative count, count over the last `window` commits) per commit
+    """
+    series = []
+    cumulative = 0
+    for i, is_bug_linked in enumerate(flags):
+        cumulative += bool(is_bug_linked)
+        rolling = cumulative - (series[i - window][0] if i >= window else 0)
+        series.append((cumulative, rolling))
+    return series
+
+
+def debt_evolution_concurrency():
+    """DEBT_EVOLUTION_CONCURRENCY, the number of commits analyzed at the same time (default 4)."""
+    return max(1, int(os.getenv("DEBT_EVOLUTION_CONCURRENCY", "4")))
+
+
+def _split_contiguous(items, parts):
+    """Split the indexes of `items` into at most `parts` contiguous runs of (almost) equal length."""
+    parts = max(1, min(parts, len(items)))
+    size, extra = divmod(len(items), parts)
+    runs = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        runs.append(list(range(start, end)))
+        start = end
+    return [run for run in runs if run]
+
+
+def snapshot_commits(app, repo_id, branch_id, commits, incremental=False, max_workers=None, on_snapshot=None, timing_stats=None,
+                     cancellation=None):
+    """
+    Create the commits in database and calculate their metric snapshots,
+    several commits at a time.
+
+    Each worker thread runs in its own application context (so its own
+    database session) and reads the commit it analyzes from the object store
+    or a leased worktree, nothing is shared between commits. In incremental
+    mode the commits are split into contiguous runs, each run diffing from
+    its own baseline.
 
+    Args:
+        app: Flask application, pushed in each worker thread
+        commits (list[dict]): commits as returned by github_service
+        max_workers (int, optional): defaults to debt_evolution_concurrency()
+        on_snapshot (callable, optional): called with (number of commits done, sha, commit id) after each
+            commit, from the worker thread
+        timing_stats (dict[str, list], optional): durations of the steps are appended to it
+        cancellation (CancellationToken, optional): checked between commits and between files, a
+            cancelled commit leaves no rows behind
 
-def calculate_debt_evolution(repo_id, branch_id, start_date, end_date, task_id=None):
+    Returns:
+        list[str]: ids of the commits, in the order of `commits`
+    """
+    cancellation = cancellation or CancellationToken()
+    max_workers = max_workers or debt_evolution_concurrency()
+    timing_stats = timing_stats if timing_stats is not None else defaultdict(list)
+    commit_ids = [None] * len(commits)
+    if not commits:
+        return commit_ids
+
+    # one commit per task, unless each run has to carry its baseline forward
+    runs = _split_contiguous(commits, max_workers) if incremental else [[i] for i in range(len(commits))]
+
+    progress_lock = threading.Lock()
+    stop = threading.Event()
+    done = 0
+
+    def snapshot_run(run):
+        nonlocal done
+        with app.app_context():
+            metrics_class = MetricsClass(repo_id, branch_id)
+            baseline = None
+            for index in run:
+                if stop.is_set():
+                    return
+                cancellation.check()
+
+                step_start = time.time()
+                commit = commit_service.ensure_commit_exists_by_sha(commits[index], branch_id)
+                timing_stats['ensure_commit'].append(time.time() - step_start)
+
+                step_start = time.time()
+                if incremental:
+                    baseline = metrics_class.ensure_incremental_snapshot(commit, baseline, cancellation)
+                else:
+                    metrics_class.ensure_metric_snapshot(commit, cancellation)
+                timing_stats['ensure_metric_snapshot'].append(time.time() - step_start)
+
+                commit_ids[index] = commit.id
+                with progress_lock:
+                    done += 1
+                    if on_snapshot:
+                        on_snapshot(done, commit.sha, commit.id)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="debt-evolution")
+    try:
+        futures = [executor.submit(snapshot_run, run) for run in runs]
+        finished, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in finished:
+            if future.exception() is not None:
+                # let the running commits finish, do not start the others
+                stop.set()
+                raise future.exception()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return commit_ids
+
+
+def _commit_sha(found_commit):
+    # Get SHA from commit (handle both dict and object)
+    return found_commit.get('sha') if isinstance(found_commit, dict) else found_commit.sha
+
+
+SAMPLING_PERIODS = ("day", "week")
+
+
+def parse_sampling(value):
+    """
+    Read a sampling from a request argument.
+
+    Returns:
+        str | int | None: "day", "week", every N-th commit (N > 1), or None for every commit
+    """
+    if value in SAMPLING_PERIODS:
+        return value
+    try:
+        n = int(value)
+    except (TypeError, ValueError):
+        return None
+    return n if n > 1 else None
+
+
+def sample_commits(commits, sampling):
+    """
+    Pick the commits of a coarse series: the last commit of each day or week,
+    or every N-th commit. The oldest commit is always kept, so the series
+    covers the whole range.
+
+    Args:
+        commits (list[dict]): commits as returned by github_service, newest first
+        sampling (str | int | None): see parse_sampling
+
+    Returns:
+        list[dict]: the sampled commits, newest first
+    """
+    if not sampling or not commits:
+        return list(commits)
+
+    if sampling in SAMPLING_PERIODS:
+        sample = []
+        seen_periods = set()
+        for commit in commits:
+            date = datetime.fromisoformat(commit.get("date").replace('Z', '+00:00'))
+            period = date.date() if sampling == "day" else date.isocalendar()[:2]
+            # newest first, so the first commit seen of a period is its last one
+            if period not in seen_periods:
+                seen_periods.add(period)
+                sample.append(commit)
+    else:
+        sample = list(commits[::sampling])
+
+    if sample[-1] is not commits[-1]:
+        sample.append(commits[-1])
+    return sample
+
+
+def refinement_passes(sampling):
+    """
+    The samplings of the successive passes of a progressively refined series,
+    from `sampling` down to every commit (None).
+    """
+    if not sampling:
+        return [None]
+    if sampling == "week":
+        return ["week", "day", None]
+    if sampling == "day":
+        return ["day", None]
+
+    passes = []
+    while sampling > 1:
+        passes.append(sampling)
+        sampling //= 4
+    return passes + [None]
+
+
+def get_cached_debt_evolution(repo_id, branch_id, start_date, end_date, incremental=False, sampling=None, refine=True):
+    """
+    Return the debt evolution of a range from the cache, when the commits of
+    the range have not changed since it was calculated.
+
+    The range is read from the clone as it is (no clone, no fetch), so the
+    lookup does no network work; without a clone it is a cache miss.
+
+    Returns:
+        list | None: the data points (see calculate_debt_evolution), None on a cache miss
+    """
+    metrics_class = MetricsClass(repo_id, branch_id)
+    commits_in_range = github_service.get_cached_commits_in_date_range(
+        metrics_class.repo.owner, metrics_class.repo.name, metrics_class.branch.name, start_date, end_date
+    )
+    if commits_in_range is None:
+        return None
+    if not refine:
+        commits_in_range = sample_commits(commits_in_range, sampling)
+    return debt_evolution_cache.get(branch_id, [_commit_sha(found_commit) for found_commit in commits_in_range], incremental)
+
+
+def _finalize_debt_evolution(data_points, commits_in_range, bug_flags):
+    """
+    Sort the data points by date and add the bug counts.
+
+    The bug counts run over every commit of the range, analyzed or not, so
+    that a sampled series reports the same counts as the full one.
+
+    Args:
+        data_points (list[dict]): data points, see get_debt_evolution_points
+        commits_in_range (list[dict]): every commit of the range, newest first
+        bug_flags (dict[str, bool]): SHA -> stored is_bug_linked, the others are classified from their message
+    """
+    data_points.sort(key=lambda x: x["commit_date"] or "")
+
+    oldest_first = list(reversed(commits_in_range))
+    flags = [
+        bug_flags[_commit_sha(found_commit)] if _commit_sha(found_commit) in bug_flags
+        else is_bug_linked_message(found_commit.get("message"))
+        for found_commit in oldest_first
+    ]
+    series = dict(zip((_commit_sha(found_commit) for found_commit in oldest_first), bug_linked_series(flags)))
+    linked_bugs_total = sum(flags)
+
+    for point in data_points:
+        cumulative, rolling = series.get(point["commit_sha"], (0, 0))
+        point["is_bug_linked"] = bug_flags.get(point["commit_sha"], False)
+        point["linked_bugs_cumulative"] = cumulative
+        point["linked_bugs_rolling"] = rolling
+        point["linked_bugs_total"] = linked_bugs_total
+
+    return data_points
+
+
+def _publish_data_points(task_manager, task_id, data_points):
+    """Stream data points on the task, see TaskManager.publish_data_point."""
+    for data_point in data_points:
+        # the bug counts are only known once the whole range is analyzed
+        data_point["is_bug_linked"] = is_bug_linked_message(data_point["commit_message"])
+        task_manager.publish_data_point(task_id, data_point)
+
+
+def calculate_debt_evolution(repo_id, branch_id, start_date, end_date, task_id=None, incremental=False, sampling=None, refine=True,
+                             cancellation=None):
     """
     Calculate the evolution of technical debt (identifiable entities) over time.
-    
+
+    With a sampling, a coarse series (see sample_commits) is calculated first
+    and, when refining, the commits between the samples are filled in by
+    successive passes (see refinement_passes). The series of each finished
+    pass is published on the task as a partial result, and every data point
+    is streamed on the task as soon as its commit is analyzed.
+
     Args:
         repo_id (str): Repository ID
         branch_id (str): Branch ID
         start_date (str): Start date in format "dd/mm/YYYY HH:MM"
         end_date (str): End date in format "dd/mm/YYYY HH:MM"
         task_id (str, optional): Task ID for progress reporting
-        
+        incremental (bool, optional): Only analyze the files changed since the previously
+            analyzed commit (see MetricsClass.ensure_incremental_snapshot)
+        sampling (str | int, optional): "day", "week" or every N-th commit, see parse_sampling
+        refine (bool, optional): Refine a sampled series down to every commit
+        cancellation (CancellationToken, optional): stops the calculation between commits (TaskCancelled),
+            nothing is cached then
+
     Returns:
         list: List of debt evolution data points
     """
     from src.services.task_manager import task_manager
+
+    cancellation = cancellation or CancellationToken()
     
     # Start timing the entire function
     function_start_time = time.time()
     print(f"[TIMING] calculate_debt_evolution started at {time.strftime('%Y-%m-%d %H:%M:%S')}")
     
     debt_evolution = []
+    repo_holds = ExitStack()
 
     try:
         if task_id:
@@ -360,6 +918,7 @@ def calculate_debt_evolution(repo_id, branch_id, start_date, end_date, task_id=N
         # Time: Creating MetricsClass instance
         step_start = time.time()
         metrics_class = MetricsClass(repo_id, branch_id)
+        repo_holds.enter_context(github_service.hold_local_repo(metrics_class.repo.owner, metrics_class.repo.name))
         print(f"[TIMING] MetricsClass initialization took {time.time() - step_start:.2f}s")
 
         # Time: Fetching commits
@@ -367,83 +926,84 @@ def calculate_debt_evolution(repo_id, branch_id, start_date, end_date, task_id=N
         commits_in_range = metrics_class.get_commits_in_date_range(start_date, end_date)
         print(f"[TIMING] Fetching {len(commits_in_range)} commits took {time.time() - step_start:.2f}s")
 
+        passes = [sample_commits(commits_in_range, pass_sampling) for pass_sampling in refinement_passes(sampling)]
+        if not refine:
+            passes = passes[:1]
+
         # Initialize timing statistics
         timing_stats = defaultdict(list)
-        total_iterations = len(commits_in_range)
+        total_iterations = len(passes[-1])
         
         if task_id:
             task_manager.update_progress(task_id, 10, "Processing commits", f"Analyzing {total_iterations} commits...")
 
         # Time: Processing all commits
         all_commits_start = time.time()
-        
-        for i, found_commit in enumerate(commits_in_range, 1):
-            iteration_start = time.time()
-            
-            # Calculate progress (10% to 90% of the task)
-            progress = 10 + int((i / total_iterations) * 80)
-            
-            # Get SHA from commit (handle both dict and object)
-            commit_sha = found_commit.get('sha') if isinstance(found_commit, dict) else found_commit.sha
-            
-            if task_id:
-                task_manager.update_progress(
-                    task_id, 
-                    progress, 
-                    f"Processing commit {i}/{total_iterations}",
-                    f"Analyzing commit {commit_sha[:7]}..."
-                )
-            
-            # 1 - Create commit in database, if missing
+        data_points = {}  # sha -> data point
+        bug_flags = {}  # sha -> is_bug_linked
+
+        for pass_number, pass_commits in enumerate(passes, 1):
+            cancellation.check()
+
+            # the commits of the previous passes are already there
+            pass_commits = [found_commit for found_commit in pass_commits if _commit_sha(found_commit) not in data_points]
+            done_before = len(data_points)
+
+            # Commits whose snapshots already exist are only read back
+            commit_shas = [_commit_sha(found_commit) for found_commit in pass_commits]
+            snapshotted = get_snapshotted_commit_ids(commit_shas, full=not incremental)
+            missing = [found_commit for found_commit in pass_commits if _commit_sha(found_commit) not in snapshotted]
+            print(f"[TIMING] Pass {pass_number}/{len(passes)}: {len(snapshotted)} commits already analyzed, {len(missing)} to analyze")
+
+            def on_snapshot(done, commit_sha, commit_id):
+                if task_id:
+                    # stream the data point, so the chart grows while the other commits are analyzed
+                    _publish_data_points(task_manager, task_id, get_debt_evolution_points([commit_id]).values())
+
+                    done += done_before + len(snapshotted)
+                    # Calculate progress (10% to 90% of the task)
+                    task_manager.update_progress(
+                        task_id,
+                        10 + int((done / total_iterations) * 80),
+                        f"Processing commit {done}/{total_iterations}",
+                        f"Analyzed commit {commit_sha[:7]}"
+                    )
+
+            if task_id and snapshotted:
+                # the commits analyzed before are streamed at once
+                _publish_data_points(task_manager, task_id, get_debt_evolution_points(list(snapshotted.values())).values())
+
+            # 1 and 2 - Create the missing commits in database and calculate their metrics, several commits at a time
+            missing_ids = iter(snapshot_commits(
+                current_app._get_current_object(), repo_id, branch_id, missing,
+                incremental=incremental, on_snapshot=on_snapshot, timing_stats=timing_stats, cancellation=cancellation
+            ))
+            commit_ids = [snapshotted.get(sha) or next(missing_ids) for sha in commit_shas]
+
+            # Classify the commit messages once, the bug counts are derived from the stored flags
             step_start = time.time()
-            commit = commit_service.ensure_commit_exists_by_sha(found_commit, branch_id)
-            timing_stats['ensure_commit'].append(time.time() - step_start)
+            flags = classify_bug_linked_commits(commit_ids)
+            print(f"[TIMING] Classifying bug-linked commits took {time.time() - step_start:.2f}s")
 
-            # 2 - Calculate metrics, if the commit was missing
+            # 3 - Read all the data points back at once
             step_start = time.time()
-            metrics_class.ensure_metric_snapshot(commit)
-            timing_stats['ensure_metric_snapshot'].append(time.time() - step_start)
+            points = get_debt_evolution_points(commit_ids)
+            print(f"[TIMING] Reading {len(points)} data points took {time.time() - step_start:.2f}s")
 
-            # Get entity counts for current commit, if missing
-            step_start = time.time()
-            entity_counts = get_identifiable_entity_counts_for_commit(commit.id)
-            print(f"[DEBUG] Commit {commit.sha[:7]} - Entity counts: {entity_counts}")
-            total_identifiable_entities = 0
-            for count in entity_counts.values():
-                total_identifiable_entities += count
-            timing_stats['get_entity_counts'].append(time.time() - step_start)
-
-            # Get complexity counts for current commit, if missing
-            step_start = time.time()
-            complexity_count = get_complexity_count_for_commit(commit.id)
-            linked_bugs = calculate_bug_counts_in_range(commits_in_range)
-            timing_stats['get_complexity_and_bugs'].append(time.time() - step_start)
+            for commit_id, sha in zip(commit_ids, commit_shas):
+                data_points[sha] = points[commit_id]
+                bug_flags[sha] = flags.get(commit_id, False)
 
-            step_start = time.time()
-            files = File.query.filter_by(commit_id=commit.id).all()
-            file_ids = [f.id for f in files]
-            total_number_duplications = Duplication.query.filter(
-                Duplication.file_id.in_(file_ids)
-            ).count()
-            timing_stats['get_duplications'].append(time.time() - step_start)
-
-            # Build result data
-            step_start = time.time()
-            debt_evolution.append({
-                "commit_sha": commit.sha,
-                "commit_date": commit.date.isoformat() if commit.date else None,
-                "commit_author": commit.author,
-                "commit_message": commit.message,
-                "total_identifiable_entities": total_identifiable_entities,
-                "entity_breakdown": entity_counts,
-                "complexity_data": complexity_count,
-                "linked_bugs_total": linked_bugs["total"],
-                "total_number_duplications": total_number_duplications,
-            })
-            timing_stats['build_result'].append(time.time() - step_start)
-            
-            iteration_time = time.time() - iteration_start
-            timing_stats['total_iteration'].append(iteration_time)
+            if task_id and pass_number < len(passes):
+                # the coarser series is shown while the next pass fills it in
+                partial = _finalize_debt_evolution(list(data_points.values()), commits_in_range, bug_flags)
+                task_manager.update_task(task_id, partial_result=partial)
+                task_manager.update_progress(
+                    task_id,
+                    10 + int((len(data_points) / max(total_iterations, 1)) * 80),
+                    f"Refining ({pass_number}/{len(passes)} passes)",
+                    f"{len(data_points)} of {total_iterations} commits analyzed"
+                )
 
         all_commits_time = time.time() - all_commits_start
         print(f"[TIMING] Processing all {total_iterations} commits took {all_commits_time:.2f}s (avg {all_commits_time/max(total_iterations, 1):.2f}s per commit)")
@@ -451,9 +1011,9 @@ def calculate_debt_evolution(repo_id, branch_id, start_date, end_date, task_id=N
         if task_id:
             task_manager.update_progress(task_id, 95, "Finalizing", "Sorting and preparing results...")
 
-        # Sort by date
+        # Sort by date, with the bug counts as a time series
         step_start = time.time()
-        debt_evolution.sort(key=lambda x: x["commit_date"] or "")
+        debt_evolution = _finalize_debt_evolution(list(data_points.values()), commits_in_range, bug_flags)
         print(f"[TIMING] Sorting results took {time.time() - step_start:.2f}s")
 
         # Print detailed timing statistics
@@ -465,12 +1025,13 @@ def calculate_debt_evolution(repo_id, branch_id, start_date, end_date, task_id=N
                 min_time = min(times)
                 print(f"  {operation}: avg={avg_time:.3f}s, min={min_time:.3f}s, max={max_time:.3f}s, total={sum(times):.2f}s")
 
-        #Bug: this line breaks the a part in debt_evolution.js because it is not json
-        #debt_evolution.append({"linked_bugs_total": linked_bugs["total"]})
+        # the next visit of the same range is rendered from the cache
+        debt_evolution_cache.put(branch_id, [_commit_sha(found_commit) for found_commit in passes[-1]], incremental, debt_evolution)
     except Exception as e:
         print(f"Error calculating debt evolution: {str(e)}")
         raise
     finally:
+        repo_holds.close()
         total_time = time.time() - function_start_time
         print(f"[TIMING] calculate_debt_evolution TOTAL TIME: {total_time:.2f}s ({total_time/60:.2f} minutes)")
         print(f"[TIMING] calculate_debt_evolution ended at {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
@@ -0,0 +1,167 @@
+"""
+Disk quota of the cached clones (see github_service.repo_cache_root).
+
+Every clone has a size and a last access time. When the total goes over the
+quota, the least recently used clones are evicted, except those held by a
+running task, leased as worktrees or used very recently.
+"""
+import os
+import shutil
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from src.services.worktree_pool import discard_worktree_pool
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(root, filename)).st_size
+            except OSError:
+                # removed while walking (gc, fetch)
+                pass
+    return total
+
+
+class RepoCache:
+    WORKTREES_SUFFIX = ".worktrees"
+
+    def __init__(self, quota_bytes=None, min_idle_seconds=None):
+        self.quota_bytes = quota_bytes if quota_bytes is not None else int(os.getenv("REPO_CACHE_QUOTA_BYTES", "0"))
+        self.min_idle_seconds = min_idle_seconds if min_idle_seconds is not None else float(os.getenv("REPO_CACHE_MIN_IDLE_SECONDS", "60"))
+        self._lock = threading.Lock()
+        self._holds = defaultdict(int)  # repo_path -> number of active holds
+        self._sizes = {}  # repo_path -> measured size in bytes
+        self._dirty = set()  # repos accessed since their size was measured
+
+    def touch(self, repo_path):
+        """Record an access to a clone (its mtime is the last access, so it survives restarts)."""
+        try:
+            os.utime(repo_path)
+        except OSError:
+            pass
+        with self._lock:
+            self._dirty.add(repo_path)
+
+    @contextmanager
+    def hold(self, repo_path):
+        """Protect a clone from eviction while a task uses it."""
+        with self._lock:
+            self._holds[repo_path] += 1
+        try:
+            yield repo_path
+        finally:
+            with self._lock:
+                self._holds[repo_path] -= 1
+                if self._holds[repo_path] <= 0:
+                    del self._holds[repo_path]
+
+    def is_held(self, repo_path):
+        with self._lock:
+            return self._holds.get(repo_path, 0) > 0
+
+    def entries(self, root):
+        """
+        Returns:
+            list[dict]: one entry per clone under `root`, least recently used first
+        """
+        entries = []
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            if name.endswith(RepoCache.WORKTREES_SUFFIX) or not os.path.isdir(path):
+                continue
+            try:
+                last_access = os.path.getmtime(path)
+            except OSError:
+                continue
+            entries.append({
+                "name": name,
+                "path": path,
+                "size_bytes": self._size(path),
+                "last_access": last_access,
+                "held": self.is_held(path),
+            })
+
+        entries.sort(key=lambda entry: entry["last_access"])
+        return entries
+
+    def stats(self, root):
+        entries = self.entries(root)
+        return {
+            "root": root,
+            "quota_bytes": self.quota_bytes,
+            "total_bytes": sum(entry["size_bytes"] for entry in entries),
+            "repository_count": len(entries),
+            "repositories": entries,
+        }
+
+    def enforce_quota(self, root, keep=None):
+        """
+        Evict least recently used clones until the cache fits in the quota.
+
+        Args:
+            root (str): cache root
+            keep (str, optional): clone never evicted (e.g. the one just cloned)
+        Returns:
+            list[str]: paths of the evicted clones
+        """
+        if self.quota_bytes <= 0:
+            return []
+
+        entries = self.entries(root)
+        total = sum(entry["size_bytes"] for entry in entries)
+        now = time.time()
+        evicted = []
+
+        for entry in entries:
+            if total <= self.quota_bytes:
+                break
+            path = entry["path"]
+            if path == keep or entry["held"] or now - entry["last_access"] < self.min_idle_seconds:
+                continue
+            if self.evict(path):
+                total -= entry["size_bytes"]
+                evicted.append(path)
+
+        if total > self.quota_bytes:
+            print(f"Repository cache uses {total} bytes, over its quota of {self.quota_bytes} bytes, but the remaining clones are in use")
+        return evicted
+
+    def evict(self, repo_path):
+        """Delete a clone and its worktrees unless it is in use. Returns True if it was deleted."""
+        # deferred: github_service calls into this module
+        from src.services import github_service
+
+        with self._lock:
+            if self._holds.get(repo_path, 0) > 0:
+                return False
+            if not discard_worktree_pool(repo_path):
+                # a worktree is leased
+                return False
+            self._sizes.pop(repo_path, None)
+            self._dirty.discard(repo_path)
+
+        github_service.forget_local_repo(repo_path)
+        shutil.rmtree(repo_path + RepoCache.WORKTREES_SUFFIX, ignore_errors=True)
+        shutil.rmtree(repo_path, ignore_errors=True)
+        return True
+
+    def _size(self, repo_path):
+        with self._lock:
+            size = self._sizes.get(repo_path)
+            if size is not None and repo_path not in self._dirty:
+                return size
+            self._dirty.discard(repo_path)
+
+        size = _dir_size(repo_path) + _dir_size(repo_path + RepoCache.WORKTREES_SUFFIX)
+        with self._lock:
+            self._sizes[repo_path] = size
+        return size
+
+
+# Global singleton instance
+repo_cache = RepoCache()
@@ -7,6 +7,8 @@ from src.models import db
 from src.models.model import *
 
 import src.services.github_service as github_service
+import src.services.branch_service as branch_service
+import src.services.commit_service as commit_service
 
 def create_repository(owner, name):
     repository = Repository(
@@ -42,3 +44,48 @@ def get_repository_url_by_repository_id(id):
     repo = db.session.query(Repository).filter_by(id=id).first()
 
     return f"https://github.com/{repo.owner}/{repo.name}.git"
+
+
+def onboard_repository(repository_id, task_id=None, max_commits_per_branch=100):
+    """
+    Store the branches of a repository and the latest commits of each branch.
+
+    Meant to run as a background task: the branches are listed from the cached
+    clone after a single fetch, and the branches and commits are bulk inserted.
+
+    Args:
+        repository_id (str): Repository ID
+        task_id (str, optional): Task ID for progress reporting
+        max_commits_per_branch (int, optional): Number of latest commits stored per branch
+
+    Returns:
+        dict: number of stored branches and commits
+    """
+    from src.services.task_manager import task_manager
+
+    repo = get_repository_by_repository_id(repository_id)
+
+    with github_service.hold_local_repo(repo.owner, repo.name):
+        if task_id:
+            task_manager.update_progress(task_id, 5, "Fetching branches", f"Fetching {repo.owner}/{repo.name}...")
+
+        branch_names = github_service.fetch_branches(repo.owner, repo.name)
+        branches = branch_service.create_branches(repo.id, branch_names)
+
+        if task_id:
+            task_manager.update_progress(task_id, 20, "Loading commits", f"Loading commits of {len(branches)} branches...")
+
+        commits_by_branch = []
+        for i, branch in enumerate(branches, 1):
+            commits_by_branch.append((branch.id, github_service.get_branch_commits(repo.owner, repo.name, branch.name, max_commits_per_branch)))
+
+            if task_id:
+                progress = 20 + int((i / len(branches)) * 70)
+                task_manager.update_progress(task_id, progress, f"Loading commits {i}/{len(branches)}", f"Branch {branch.name}")
+
+        if task_id:
+            task_manager.update_progress(task_id, 95, "Storing commits", "Saving commits...")
+
+        commit_count = commit_service.create_commits_for_branches(commits_by_branch)
+
+    return {"branch_count": len(branches), "commit_count": commit_count}
@@ -0,0 +1,90 @@
+"""
+Bounded pool of threads running the background tasks of the task manager.
+
+At most TASK_WORKERS tasks run at the same time. The others wait in a queue,
+ordered by the priority of their type (see TASK_PRIORITIES) and then by
+arrival, so that interactive requests (the metrics of one commit) overtake
+bulk work (a debt evolution over a whole range) without starving tasks of
+the same type.
+"""
+import heapq
+import itertools
+import os
+import threading
+
+# lower runs first, unknown task types run last
+TASK_PRIORITIES = {
+    "metrics_calculation": 0,
+    "repository_onboarding": 1,
+    "debt_evolution": 2,
+}
+DEFAULT_PRIORITY = max(TASK_PRIORITIES.values()) + 1
+
+
+def default_worker_count():
+    """TASK_WORKERS, the number of tasks running at the same time (default 2)."""
+    return max(1, int(os.getenv("TASK_WORKERS", "2")))
+
+
+class TaskExecutor:
+    def __init__(self, max_workers=None, priorities=None, on_dequeue=None):
+        self.max_workers = max_workers if max_workers is not None else default_worker_count()
+        self.priorities = priorities if priorities is not None else TASK_PRIORITIES
+        # called with the ids of the tasks still queued each time one leaves the queue, e.g. to report their new positions
+        self.on_dequeue = on_dequeue
+        self._queue = []  # heap of (priority, arrival, task_id, func)
+        self._arrival = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+
+    def submit(self, task_id, task_type, func):
+        """
+        Queue `func` (called without arguments) to run on a worker thread.
+
+        Returns:
+            int: position of the task in the queue (1 = next to run)
+        """
+        with self._condition:
+            priority = self.priorities.get(task_type, DEFAULT_PRIORITY)
+            heapq.heappush(self._queue, (priority, next(self._arrival), task_id, func))
+            if len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify()
+            return self._position(task_id)
+
+    def position(self, task_id):
+        """Position of a queued task (1 = next to run), None once it runs."""
+        with self._condition:
+            return self._position(task_id)
+
+    def queued(self):
+        """Ids of the queued tasks, in the order they will run."""
+        with self._condition:
+            return [task_id for _, _, task_id, _ in sorted(self._queue)]
+
+    def _position(self, task_id):
+        for position, (_, _, queued_id, _) in enumerate(sorted(self._queue), 1):
+            if queued_id == task_id:
+                return position
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue)
+                _, _, task_id, func = heapq.heappop(self._queue)
+                queued = [queued_id for _, _, queued_id, _ in sorted(self._queue)]
+
+            if self.on_dequeue and queued:
+                try:
+                    self.on_dequeue(queued)
+                except Exception as e:
+                    print(f"Error reporting queue positions: {str(e)}")
+
+            try:
+                func()
+            except Exception as e:
+                # the task manager reports the failures of its tasks, nothing should reach this point
+                print(f"Task {task_id} failed: {str(e)}")
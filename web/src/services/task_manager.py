@@ -1,14 +1,18 @@
 """
 Task manager for handling long-running operations with progress tracking.
 """
+import os
 import uuid
 import threading
-from typing import Dict, Callable, Any
-from datetime import datetime
+from typing import Callable, Any
+from datetime import datetime, timedelta
 import time
-import queue
 import json
 
+from src.services.cancellation import CancellationToken, TaskCancelled
+from src.services.task_executor import TaskExecutor
+from src.services.task_store import InMemoryTaskStore
+
 
 class DateTimeEncoder(json.JSONEncoder):
     """Custom JSON encoder that handles datetime objects."""
@@ -19,18 +23,21 @@ class DateTimeEncoder(json.JSONEncoder):
 
 
 class Task:
-    def __init__(self, task_id: str, task_type: str):
+    def __init__(self, task_id: str, task_type: str, idempotency_key: str = None):
         self.task_id = task_id
         self.task_type = task_type
+        self.idempotency_key = idempotency_key  # see TaskManager.create_or_get_task
         self.status = "pending"  # pending, running, completed, failed
         self.progress = 0  # 0-100
         self.current_step = ""
         self.result = None
+        self.partial_result = None  # result of a task that is still refining it
         self.error = None
         self.created_at = datetime.now()
         self.started_at = None
         self.completed_at = None
         self.message = ""
+        self.queue_position = None  # position in the queue of the task executor while pending
 
     def to_dict(self):
         return {
@@ -40,14 +47,33 @@ class Task:
             "progress": self.progress,
             "current_step": self.current_step,
             "result": self.result,
+            "partial_result_size": len(self.partial_result) if self.partial_result else 0,
             "error": self.error,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "started_at": self.started_at.isoformat() if self.started_at else None,
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
-            "message": self.message
+            "message": self.message,
+            "queue_position": self.queue_position
         }
 
 
+def task_key(task_type: str, *parts) -> str:
+    """Idempotency key of a task, e.g. task_key("debt_evolution", repo_id, branch_id, start_date, end_date)."""
+    return json.dumps([task_type, *parts], default=str)
+
+
+def heartbeat_interval() -> float:
+    """TASK_HEARTBEAT_SECONDS, how often the unfinished tasks of a process are marked alive (default 60), see TASK_STALE_SECONDS."""
+    return max(1.0, float(os.getenv("TASK_HEARTBEAT_SECONDS", "60")))
+
+
+# the attributes of a task that update_task may set
+TASK_ATTRIBUTES = (
+    "status", "progress", "current_step", "message", "result", "partial_result",
+    "error", "started_at", "completed_at",
+)
+
+
 class TaskManager:
     _instance = None
     _lock = threading.Lock()
@@ -62,44 +88,77 @@ class TaskManager:
     def __init__(self):
         if self._initialized:
             return
-        self.tasks: Dict[str, Task] = {}
-        self.task_queues: Dict[str, queue.Queue] = {}  # For SSE updates
+        self.store = InMemoryTaskStore()  # see use_store
+        self.executor = TaskExecutor(on_dequeue=self._report_queue_positions)
+        self._cancellations: dict[str, CancellationToken] = {}  # tasks queued or running in this process
+        self._heartbeat = None
         self._initialized = True
 
-    def create_task(self, task_type: str) -> str:
-        """Create a new task and return its ID."""
-        task_id = str(uuid.uuid4())
-        task = Task(task_id, task_type)
-        self.tasks[task_id] = task
-        self.task_queues[task_id] = queue.Queue()
+    def use_store(self, store):
+        """Keep the tasks in `store` (see services.task_store), e.g. the database so that every worker sees them."""
+        self.store = store
+
+    def create_task(self, task_type: str, idempotency_key: str = None) -> str:
+        """Create a new task and return its ID, see create_or_get_task for `idempotency_key`."""
+        task_id, _ = self.create_or_get_task(task_type, idempotency_key)
         return task_id
 
+    def create_or_get_task(self, task_type: str, idempotency_key: str = None):
+        """
+        Create a new task, unless an unfinished task has the same idempotency key
+        (see task_key): the request then attaches to that task instead of
+        starting the same work again.
+
+        Returns:
+            tuple: (task_id, created), only a created task should be run
+        """
+        task = Task(str(uuid.uuid4()), task_type, idempotency_key)
+        stored = self.store.add(task)
+        return stored.task_id, stored is task
+
     def get_task(self, task_id: str) -> Task:
         """Get task by ID."""
-        task = self.tasks.get(task_id)
+        return self._with_queue_position(self.store.get(task_id))
+
+    def _with_queue_position(self, task):
+        # the queue belongs to this process, it is not kept in the store
+        if task is not None:
+            task.queue_position = self.executor.position(task.task_id)
         return task
 
     def update_task(self, task_id: str, **kwargs):
         """Update task properties."""
-        task = self.tasks.get(task_id)
+        fields = {key: value for key, value in kwargs.items() if key in TASK_ATTRIBUTES}
+        task = self._with_queue_position(self.store.update(task_id, fields))
+        if task and task.status == "failed":
+            # e.g. cancelled from another worker, the running task stops at its next check
+            token = self._cancellations.get(task_id)
+            if token:
+                token.cancel()
         if task:
-            for key, value in kwargs.items():
-                if hasattr(task, key):
-                    setattr(task, key, value)
-            
-            # Push update to SSE queue
-            if task_id in self.task_queues:
-                try:
-                    self.task_queues[task_id].put_nowait(task.to_dict())
-                except queue.Full:
-                    pass  # Skip if queue is full
+            # Push update to the SSE streams
+            self.store.append_event(task_id, {"type": "update", "data": task.to_dict()})
+        return task
+
+    def publish_data_point(self, task_id: str, data_point: Any):
+        """Stream one finished piece of the result (e.g. a debt evolution data point) before the task completes."""
+        self.store.append_event(task_id, {"type": "data_point", "data": data_point})
+
+    def get_data_points(self, task_id: str) -> list:
+        """The data points published so far, for the clients that connect late."""
+        return self.store.data_points(task_id)
+
+    def event_cursor(self, task_id: str):
+        """Position after the last event of a task, see get_task_updates."""
+        return self.store.last_cursor(task_id)
 
     def start_task(self, task_id: str):
         """Mark task as started."""
         self.update_task(
             task_id,
             status="running",
-            started_at=datetime.now()
+            started_at=datetime.now(),
+            message=""
         )
 
     def complete_task(self, task_id: str, result: Any = None):
@@ -131,10 +190,47 @@ class TaskManager:
             message=message
         )
 
+    def cancellation_token(self, task_id: str) -> CancellationToken:
+        """Token of a task run by run_task_in_background, to pass down to the work it does."""
+        return self._cancellations.get(task_id) or CancellationToken()
+
+    def cancel_task(self, task_id: str):
+        """Stop a queued or running task: its work stops at the next check and its processes are terminated."""
+        token = self._cancellations.get(task_id)
+        if token:
+            token.cancel()
+        self.fail_task(task_id, "Cancelled by user")
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        """Tell the store that the tasks of this process are alive, even while they wait in the queue or on a long step."""
+        while True:
+            time.sleep(heartbeat_interval())
+            self.touch_tasks()
+
+    def touch_tasks(self):
+        """One heartbeat, see _beat."""
+        try:
+            self.store.touch(list(self._cancellations))
+        except Exception as e:
+            print(f"Task heartbeat failed: {str(e)}")
+
     def run_task_in_background(self, task_id: str, func: Callable, app=None, *args, **kwargs):
-        """Run a task function in a background thread with Flask app context."""
+        """Queue a task function on the task executor, it runs with Flask app context."""
+        token = self._cancellations.setdefault(task_id, CancellationToken())
+        self._start_heartbeat()
+
         def wrapper():
             try:
+                task = self.get_task(task_id)
+                if token.cancelled or task is None or task.status == "failed":
+                    # cancelled while queued (maybe from another worker)
+                    return
                 self.start_task(task_id)
                 
                 # Push Flask app context if provided
@@ -144,64 +240,74 @@ class TaskManager:
                 else:
                     result = func(task_id, *args, **kwargs)
                     
+                token.check()
                 self.complete_task(task_id, result)
             except Exception as e:
+                if isinstance(e, TaskCancelled) or token.cancelled:
+                    # e.g. the output of a terminated process could not be read
+                    print(f"Task {task_id} cancelled")
+                    self.fail_task(task_id, "Cancelled by user")
+                    return
                 print(f"Task {task_id} failed: {str(e)}")
                 import traceback
                 traceback.print_exc()
                 self.fail_task(task_id, str(e))
+            finally:
+                self._cancellations.pop(task_id, None)
 
-        thread = threading.Thread(target=wrapper, daemon=True)
-        thread.start()
+        task = self.update_task(task_id, message="Queued")
+        self.executor.submit(task_id, task.task_type, wrapper)
+        # sends the queue position, unless a worker already took the task
+        self._report_queue_positions([task_id])
 
-    def get_task_updates(self, task_id: str, timeout: float = 30.0):
-        """Generator for SSE updates. Yields task updates as they occur."""
-        task_queue = self.task_queues.get(task_id)
-        if not task_queue:
+    def _report_queue_positions(self, task_ids):
+        """Tell the clients of the tasks still queued where they stand."""
+        for task_id in task_ids:
+            if self.executor.position(task_id) is not None:
+                self.update_task(task_id)
+
+    def get_task_updates(self, task_id: str, timeout: float = 30.0, cursor=0):
+        """
+        Generator for SSE updates. Yields task updates and data points as they occur.
+
+        Each stream reads the events after its own `cursor` (see event_cursor),
+        so several clients may follow the same task.
+        """
+        if self.get_task(task_id) is None:
             return
 
         start_time = time.time()
         while True:
-            try:
-                # Check for timeout
-                if time.time() - start_time > timeout:
-                    # Send heartbeat
-                    yield {"type": "heartbeat"}
-                    start_time = time.time()
-                
-                # Get update from queue with timeout
-                update = task_queue.get(timeout=1.0)
-                yield {"type": "update", "data": update}
-                
+            # Check for timeout
+            if time.time() - start_time > timeout:
+                # Send heartbeat
+                yield {"type": "heartbeat"}
+                start_time = time.time()
+
+            # Get updates (or data points) with timeout
+            events, cursor = self.store.read_events(task_id, cursor, wait=1.0)
+            for event in events:
+                yield event
+
                 # If task is completed or failed, stop
-                if update.get("status") in ["completed", "failed"]:
-                    break
-                    
-            except queue.Empty:
+                if event["type"] == "update" and event["data"].get("status") in ["completed", "failed"]:
+                    return
+
+            if not events:
                 # Send heartbeat to keep connection alive
                 yield {"type": "heartbeat"}
-                
+
                 # Check if task is done
                 task = self.get_task(task_id)
-                if task and task.status in ["completed", "failed"]:
+                if task is None:
+                    return
+                if task.status in ["completed", "failed"]:
                     yield {"type": "update", "data": task.to_dict()}
-                    break
+                    return
 
     def cleanup_old_tasks(self, max_age_seconds: int = 3600):
         """Remove old completed/failed tasks."""
-        current_time = datetime.now()
-        to_remove = []
-        
-        for task_id, task in self.tasks.items():
-            if task.status in ["completed", "failed"] and task.completed_at:
-                age = (current_time - task.completed_at).total_seconds()
-                if age > max_age_seconds:
-                    to_remove.append(task_id)
-        
-        for task_id in to_remove:
-            del self.tasks[task_id]
-            if task_id in self.task_queues:
-                del self.task_queues[task_id]
+        self.store.remove_finished_before(datetime.now() - timedelta(seconds=max_age_seconds))
 
 
 # Global singleton instance
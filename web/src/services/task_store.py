@@ -0,0 +1,245 @@
+"""
+Storage of the tasks of the task manager (see services.task_manager).
+
+The state of a task (status, progress, result...) and the events streamed to
+its SSE clients (updates and data points) live in a store:
+
+- InMemoryTaskStore keeps them in the process, so only the worker that
+  started a task sees it and tasks vanish on restart. It is the default, and
+  the store of the tests.
+- DatabaseTaskStore keeps them in Postgres, so every gunicorn worker sees
+  every task, across restarts.
+
+TASK_STORE=database selects the database store (see create_task_store).
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from src.models.model import BackgroundTask, BackgroundTaskEvent
+
+FINISHED_STATUSES = ("completed", "failed")
+TASK_FIELDS = (
+    "task_type", "idempotency_key", "status", "progress", "current_step", "message", "result", "partial_result",
+    "error", "created_at", "started_at", "completed_at",
+)
+
+
+def _json_safe(value):
+    def default(obj):
+        if isinstance(obj, datetime):
+            return obj.isoformat()
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    return json.loads(json.dumps(value, default=default))
+
+
+class InMemoryTaskStore:
+    def __init__(self):
+        self._tasks = {}  # task_id -> Task
+        self._events = {}  # task_id -> list of events, the cursor is an index in it
+        self._condition = threading.Condition()
+
+    def add(self, task):
+        """
+        Store a new task, unless an unfinished task has the same idempotency key.
+
+        Returns:
+            Task: `task`, or the unfinished task with its idempotency key
+        """
+        with self._condition:
+            if task.idempotency_key is not None:
+                for stored in self._tasks.values():
+                    if stored.idempotency_key == task.idempotency_key and stored.status not in FINISHED_STATUSES:
+                        return stored
+            self._tasks[task.task_id] = task
+            self._events[task.task_id] = []
+            return task
+
+    def get(self, task_id):
+        return self._tasks.get(task_id)
+
+    def update(self, task_id, fields):
+        """Set fields of a task. Returns: the updated task, None if it does not exist."""
+        task = self._tasks.get(task_id)
+        if task:
+            for key, value in fields.items():
+                setattr(task, key, value)
+        return task
+
+    def append_event(self, task_id, event):
+        with self._condition:
+            if task_id in self._events:
+                self._events[task_id].append(event)
+                self._condition.notify_all()
+
+    def last_cursor(self, task_id):
+        with self._condition:
+            return len(self._events.get(task_id, ()))
+
+    def read_events(self, task_id, cursor, wait):
+        """
+        Wait up to `wait` seconds for the events after `cursor`.
+
+        Returns:
+            tuple: (events, cursor to pass next time)
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._events.get(task_id, ())) > cursor, timeout=wait)
+            events = self._events.get(task_id, [])[cursor:]
+            return events, cursor + len(events)
+
+    def data_points(self, task_id):
+        with self._condition:
+            return [event["data"] for event in self._events.get(task_id, ()) if event["type"] == "data_point"]
+
+    def remove_finished_before(self, cutoff):
+        with self._condition:
+            finished = [
+                task_id for task_id, task in self._tasks.items()
+                if task.status in FINISHED_STATUSES and task.completed_at and task.completed_at < cutoff
+            ]
+            for task_id in finished:
+                del self._tasks[task_id]
+                self._events.pop(task_id, None)
+        return len(finished)
+
+    def touch(self, task_ids):
+        """Heartbeat of the tasks of this process, nothing to do: they live and die with it."""
+
+
+class DatabaseTaskStore:
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, app, stale_seconds=None):
+        # the store is used from request handlers and background threads alike, so it talks to
+        # the engine directly instead of sharing their session
+        self.app = app
+        self.stale_seconds = stale_seconds if stale_seconds is not None else float(os.getenv("TASK_STALE_SECONDS", "900"))
+        self._tasks = BackgroundTask.__table__
+        self._events = BackgroundTaskEvent.__table__
+
+    def _engine(self):
+        from src.models import db
+        return db.get_engine(self.app)
+
+    def _to_task(self, row):
+        from src.services.task_manager import Task
+
+        task = Task(row.id, row.task_type)
+        for key in TASK_FIELDS:
+            setattr(task, key, getattr(row, key))
+        return task
+
+    def add(self, task):
+        """See InMemoryTaskStore.add, the unique index on the keys of the unfinished tasks arbitrates between workers."""
+        values = {key: getattr(task, key) for key in TASK_FIELDS}
+        stmt = insert(self._tasks).values(id=task.task_id, updated_at=datetime.now(), **_json_safe_fields(values))
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[self._tasks.c.idempotency_key],
+            index_where=self._tasks.c.status.in_(("pending", "running")),
+        )
+
+        while True:
+            with self._engine().begin() as conn:
+                if conn.execute(stmt.returning(self._tasks.c.id)).first() is not None:
+                    return task
+                existing_id = conn.execute(
+                    select(self._tasks.c.id)
+                    .where(self._tasks.c.idempotency_key == task.idempotency_key, self._tasks.c.status.in_(("pending", "running")))
+                ).scalar()
+
+            # the existing task may have finished in between, or belong to a worker that stopped
+            existing = self.get(existing_id) if existing_id else None
+            if existing is not None and existing.status not in FINISHED_STATUSES:
+                return existing
+
+    def get(self, task_id):
+        with self._engine().begin() as conn:
+            row = conn.execute(select(self._tasks).where(self._tasks.c.id == task_id)).first()
+            if row is None:
+                return None
+
+            if row.status not in FINISHED_STATUSES and row.updated_at and datetime.now() - row.updated_at > timedelta(seconds=self.stale_seconds):
+                # no heartbeat (see touch): the worker running it is gone (restart, crash), its clients would wait forever
+                conn.execute(update(self._tasks).where(self._tasks.c.id == task_id).values(
+                    status="failed", error="Task lost, the worker running it stopped", completed_at=datetime.now(), updated_at=datetime.now()
+                ))
+                row = conn.execute(select(self._tasks).where(self._tasks.c.id == task_id)).first()
+
+        return self._to_task(row)
+
+    def update(self, task_id, fields):
+        with self._engine().begin() as conn:
+            conn.execute(update(self._tasks).where(self._tasks.c.id == task_id).values(
+                updated_at=datetime.now(), **_json_safe_fields(fields)
+            ))
+            row = conn.execute(select(self._tasks).where(self._tasks.c.id == task_id)).first()
+        return self._to_task(row) if row is not None else None
+
+    def touch(self, task_ids):
+        """Heartbeat: refresh `updated_at` of the unfinished tasks queued or running in this process."""
+        if not task_ids:
+            return
+        with self._engine().begin() as conn:
+            conn.execute(update(self._tasks).where(
+                self._tasks.c.id.in_(list(task_ids)), self._tasks.c.status.notin_(FINISHED_STATUSES)
+            ).values(updated_at=datetime.now()))
+
+    def append_event(self, task_id, event):
+        with self._engine().begin() as conn:
+            conn.execute(self._events.insert().values(task_id=task_id, type=event["type"], data=_json_safe(event["data"])))
+
+    def last_cursor(self, task_id):
+        with self._engine().begin() as conn:
+            return conn.execute(select(func.coalesce(func.max(self._events.c.id), 0)).where(self._events.c.task_id == task_id)).scalar()
+
+    def read_events(self, task_id, cursor, wait):
+        deadline = time.time() + wait
+        while True:
+            with self._engine().begin() as conn:
+                rows = conn.execute(
+                    select(self._events.c.id, self._events.c.type, self._events.c.data)
+                    .where(self._events.c.task_id == task_id, self._events.c.id > cursor)
+                    .order_by(self._events.c.id)
+                ).all()
+            if rows or time.time() >= deadline:
+                break
+            time.sleep(self.POLL_INTERVAL)
+
+        events = [{"type": row.type, "data": row.data} for row in rows]
+        return events, (rows[-1].id if rows else cursor)
+
+    def data_points(self, task_id):
+        with self._engine().begin() as conn:
+            rows = conn.execute(
+                select(self._events.c.data)
+                .where(self._events.c.task_id == task_id, self._events.c.type == "data_point")
+                .order_by(self._events.c.id)
+            ).all()
+        return [row.data for row in rows]
+
+    def remove_finished_before(self, cutoff):
+        finished = select(self._tasks.c.id).where(self._tasks.c.status.in_(FINISHED_STATUSES), self._tasks.c.completed_at < cutoff)
+        with self._engine().begin() as conn:
+            conn.execute(delete(self._events).where(self._events.c.task_id.in_(finished)))
+            return conn.execute(delete(self._tasks).where(self._tasks.c.id.in_(finished))).rowcount
+
+
+def _json_safe_fields(fields):
+    return {
+        key: _json_safe(value) if key in ("result", "partial_result") else value
+        for key, value in fields.items()
+    }
+
+
+def create_task_store(app=None):
+    """The store selected by TASK_STORE: "memory" (default) or "database"."""
+    if os.getenv("TASK_STORE", "memory").strip().lower() == "database":
+        return DatabaseTaskStore(app)
+    return InMemoryTaskStore()
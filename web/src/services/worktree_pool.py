@@ -0,0 +1,161 @@
+"""
+Pool of `git worktree` checkouts of a cached clone.
+
+Tools that read a commit from disk (e.g. PMD-CPD) lease a worktree checked
+out at that commit instead of moving the shared clone, so several tasks can
+analyze the same repository at the same time.
+
+With `sparse_patterns`, only the matching files are checked out. In a
+partial clone this keeps `git worktree add` from downloading every blob of
+the commit (images, datasets, ...): only the blobs of the checked out files
+are fetched.
+"""
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def default_pool_size():
+    return max(1, int(os.getenv("WORKTREE_POOL_SIZE", "2")))
+
+
+class WorktreePool:
+    def __init__(self, repo_path, size=None, sparse_patterns=None):
+        self.repo_path = repo_path
+        self.size = size if size is not None else default_pool_size()
+        # non-cone sparse-checkout patterns (e.g. "*.py"), None checks out every file
+        self.sparse_patterns = list(sparse_patterns) if sparse_patterns else None
+        self._root = f"{repo_path}.worktrees"
+        self._condition = threading.Condition()
+        # free worktrees, least recently used first: path -> checked out sha
+        self._free = OrderedDict()
+        self._leased = set()
+        self._unbuilt = set()  # slots whose `git worktree add` failed, added again on next lease
+        self._count = 0
+        self._pruned = False
+
+    def leased_count(self):
+        with self._condition:
+            return len(self._leased)
+
+    def acquire(self, commit_sha, timeout=None):
+        """
+        Lease a worktree with `commit_sha` checked out, blocking while all worktrees are leased.
+
+        Returns:
+            str: path of the leased worktree
+        """
+        with self._condition:
+            while True:
+                path = self._take_free(commit_sha)
+                if path is not None:
+                    needs_checkout = self._free.pop(path) != commit_sha
+                    is_new = path in self._unbuilt
+                    break
+
+                if self._count < self.size:
+                    path = os.path.join(self._root, f"wt-{self._count}")
+                    self._count += 1
+                    needs_checkout = True
+                    is_new = True
+                    break
+
+                if not self._condition.wait(timeout):
+                    raise TimeoutError(f"No free worktree for {self.repo_path}")
+
+            self._leased.add(path)
+
+        try:
+            if is_new:
+                self._add_worktree(path, commit_sha)
+            elif needs_checkout:
+                subprocess.run(["git", "-C", path, "checkout", "--detach", "-f", commit_sha], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except Exception:
+            with self._condition:
+                if is_new:
+                    # the worktree may not exist at all, it is added again on next lease
+                    self._unbuilt.add(path)
+            # the worktree content is unknown, it will be checked out again on next lease
+            self.release(path, None)
+            raise
+
+        if is_new:
+            with self._condition:
+                self._unbuilt.discard(path)
+
+        return path
+
+    def release(self, path, commit_sha):
+        with self._condition:
+            self._leased.discard(path)
+            self._free[path] = commit_sha
+            self._free.move_to_end(path)
+            self._condition.notify()
+
+    @contextmanager
+    def lease(self, commit_sha, timeout=None):
+        path = self.acquire(commit_sha, timeout)
+        try:
+            yield path
+        finally:
+            self.release(path, commit_sha)
+
+    def _take_free(self, commit_sha):
+        # prefer a worktree already at the commit, else the least recently used one
+        for path, sha in self._free.items():
+            if sha == commit_sha:
+                return path
+        return next(iter(self._free), None)
+
+    def _add_worktree(self, path, commit_sha):
+        if not self._pruned:
+            # forget worktrees left behind by a previous process
+            subprocess.run(["git", "-C", self.repo_path, "worktree", "prune"], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self._pruned = True
+        if os.path.exists(path):
+            shutil.rmtree(path, ignore_errors=True)
+            subprocess.run(["git", "-C", self.repo_path, "worktree", "prune"], check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        os.makedirs(self._root, exist_ok=True)
+        if not self.sparse_patterns:
+            subprocess.run(["git", "-C", self.repo_path, "worktree", "add", "--detach", "-f", path, commit_sha], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return
+
+        # the patterns must be set before the first checkout, which would otherwise fetch every blob
+        subprocess.run(["git", "-C", self.repo_path, "worktree", "add", "--no-checkout", "--detach", "-f", path, commit_sha], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # sparse-checkout keeps the patterns in the worktree's own config, the clone is left untouched
+        subprocess.run(["git", "-C", path, "sparse-checkout", "set", "--no-cone", *self.sparse_patterns], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run(["git", "-C", path, "checkout", "--detach", "-f", commit_sha], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_worktree_pool(repo_path, sparse_patterns=None):
+    """Return the shared WorktreePool of a cached clone (`sparse_patterns` is only used when the pool is created)."""
+    with _pools_lock:
+        pool = _pools.get(repo_path)
+        if pool is None:
+            pool = WorktreePool(repo_path, sparse_patterns=sparse_patterns)
+            _pools[repo_path] = pool
+        return pool
+
+
+def discard_worktree_pool(repo_path):
+    """
+    Forget the pool of a clone about to be deleted.
+
+    Returns:
+        bool: False (and keep the pool) if one of its worktrees is leased
+    """
+    with _pools_lock:
+        pool = _pools.get(repo_path)
+        if pool is not None:
+            if pool.leased_count() > 0:
+                return False
+            del _pools[repo_path]
+        return True
@@ -8,6 +8,33 @@ document.addEventListener("DOMContentLoaded", function() {
     }
 });
 
+// Add a data point streamed by a running task, and redraw the charts (at most twice per second)
+let redrawTimeout = null;
+
+function addDataPoint(point) {
+    const index = debtData.findIndex(commit => commit.commit_sha === point.commit_sha);
+    if (index >= 0) {
+        debtData[index] = point;
+    } else {
+        debtData.push(point);
+    }
+    debtData.sort((a, b) => (a.commit_date || '').localeCompare(b.commit_date || ''));
+
+    if (redrawTimeout === null) {
+        redrawTimeout = setTimeout(() => {
+            redrawTimeout = null;
+            const streamedCharts = document.getElementById('streamed-charts');
+            if (streamedCharts) {
+                streamedCharts.classList.remove('d-none');
+            }
+            createDebtEvolutionChart();
+            createComplexityEvolutionChart();
+            createDuplicationEvolutionChart();
+            updateSummaryStats();
+        }, 500);
+    }
+}
+
 function createDebtEvolutionChart() {
     // Process the data to create separate traces for each entity type
     const entityTypes = getUniqueEntityTypes();
@@ -49,6 +76,31 @@ function createDebtEvolutionChart() {
         });
     });
 
+    // Bug-linked commits, on the secondary axis
+    const bugSeries = [
+        { key: 'linked_bugs_cumulative', name: 'Linked Bugs (cumulative)', dash: 'solid' },
+        { key: 'linked_bugs_rolling', name: 'Linked Bugs (last 10 commits)', dash: 'dot' }
+    ];
+    bugSeries.forEach(series => {
+        traces.push({
+            x: debtData.map(commit => new Date(commit.commit_date)),
+            y: debtData.map(commit => commit[series.key] || 0),
+            mode: 'lines',
+            name: series.name,
+            yaxis: 'y2',
+            line: {
+                color: '#ffc107',
+                width: 2,
+                dash: series.dash
+            },
+            hovertemplate:
+                '<b>%{fullData.name}</b><br>' +
+                'Date: %{x}<br>' +
+                'Count: %{y}<br>' +
+                '<extra></extra>'
+        });
+    });
+
     // Chart layout
     const layout = {
         title: {
@@ -65,6 +117,12 @@ function createDebtEvolutionChart() {
             title: 'Number of Identifiable Entities',
             rangemode: 'tozero'
         },
+        yaxis2: {
+            title: 'Bug-linked Commits',
+            overlaying: 'y',
+            side: 'right',
+            rangemode: 'tozero'
+        },
         legend: {
             x: 0.02,
             y: 0.98,
@@ -78,7 +136,7 @@ function createDebtEvolutionChart() {
         paper_bgcolor: 'white',
         margin: {
             l: 60,
-            r: 30,
+            r: 60,
             t: 60,
             b: 80
         }
@@ -292,13 +350,14 @@ function getUniqueEntityTypes() {
 }
 
 function updateSummaryStats() {
-    if (debtData.length === 0) return;
+    // the summary is not shown while the first data points are streamed
+    if (debtData.length === 0 || !document.getElementById('total-commits')) return;
     // Calculate statistics
     const totalCommits = debtData.length;
     const totalDebts = debtData.map(commit => commit.total_identifiable_entities);
     const maxDebt = Math.max(...totalDebts);
     const currentDebt = totalDebts[totalDebts.length - 1];
-    const linkedBugsTotal = (debtData[1] && debtData[1].linked_bugs_total); 
+    const linkedBugsTotal = debtData[debtData.length - 1].linked_bugs_cumulative || 0;
     
     // Calculate trend
     let trend = "No Change";
@@ -6,6 +6,7 @@ class TaskTracker {
         this.eventSource = null;
         this.pollInterval = null;
         this.onProgress = null;
+        this.onDataPoint = null;
         this.onComplete = null;
         this.onError = null;
     }
@@ -30,6 +31,17 @@ class TaskTracker {
             }
         };
 
+        // Partial results, published before the task completes
+        this.eventSource.addEventListener('data_point', (event) => {
+            try {
+                if (this.onDataPoint) {
+                    this.onDataPoint(JSON.parse(event.data));
+                }
+            } catch (e) {
+                console.error('Error parsing SSE data point:', e);
+            }
+        });
+
         this.eventSource.onerror = (error) => {
             console.error('SSE error:', error);
             this.stopSSE();
@@ -173,6 +185,16 @@ function showProgressModal(title = 'Processing...') {
     return modal;
 }
 
+/**
+ * Message of a task, with its place in the queue while it waits for a worker
+ */
+function taskMessage(data) {
+    if (data.queue_position) {
+        return `Queued (position ${data.queue_position})`;
+    }
+    return data.message;
+}
+
 /**
  * Update progress modal
  */
@@ -191,8 +213,8 @@ function updateProgressModal(data) {
         progressStep.textContent = data.current_step;
     }
 
-    if (progressMessage && data.message) {
-        progressMessage.textContent = data.message;
+    if (progressMessage && taskMessage(data)) {
+        progressMessage.textContent = taskMessage(data);
     }
 }
 
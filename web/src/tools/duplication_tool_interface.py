@@ -1,5 +1,7 @@
 from src.reports.duplication_report import DuplicationReport
+from src.services.cancellation import CancellationToken
 
 class DuplicationToolInterface:
-    def run(self, dir : str, file_extensions : set[str]) -> list[DuplicationReport]:
+    # `paths` (relative to `dir`) restricts the analysis to these files, None analyzes the whole directory
+    def run(self, dir : str, file_extensions : set[str], cancellation : CancellationToken = None, paths : list[str] = None) -> list[DuplicationReport]:
         return []
\ No newline at end of file
@@ -3,6 +3,9 @@ from subprocess import *
 from src.utilities.value_range import ValueRange
 from src.reports.duplication_report import DuplicationReport
 from src.tools.duplication_tool_interface import DuplicationToolInterface
+from src.services.cancellation import CancellationToken
+import os
+import tempfile
 import xml.etree.ElementTree as xml
 
 # DOCUMENTATION PMD:
@@ -79,30 +82,56 @@ class PMD_CopyPasteDetector(DuplicationToolInterface):
         else:
             return dir + "/"
 
-    def _start_pmd(self, language_id : str, dir : str) -> str:
+    def _start_pmd(self, language_id : str, dir : str, cancellation : CancellationToken = None, paths : list[str] = None) -> str:
         MINIMUM_TOKENS = 20
         args = [
             "/pmd/pmd-bin-7.18.0/bin/pmd", "cpd", 
             "--minimum-tokens", str(MINIMUM_TOKENS), 
             "--language", language_id, 
             "--format", "xml", 
-            "--dir", dir, 
         ]
 
-        done_proc = run(args, capture_output=True, text=True)
-        return done_proc.stdout
+        file_list = None
+        if paths is None:
+            args += ["--dir", dir]
+        else:
+            # only the listed files are analyzed, one absolute path per line
+            with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as file_list:
+                file_list.write("".join(dir + path + "\n" for path in paths))
+            args += ["--file-list", file_list.name]
+
+        # the JVM is terminated as soon as the task is cancelled. `pmd` is a launcher script, the JVM is its
+        # child: in a session of its own, the whole process group is terminated
+        cancellation = cancellation or CancellationToken()
+        try:
+            with cancellation.track(Popen(args, stdout=PIPE, stderr=PIPE, text=True, start_new_session=True)) as proc:
+                stdout, _ = proc.communicate()
+        finally:
+            if file_list is not None:
+                os.remove(file_list.name)
+        cancellation.check()
+        return stdout
 
-    def run(self, dir : str,  file_extensions : set[str]) -> list[DuplicationReport]: 
+    def run(self, dir : str,  file_extensions : set[str], cancellation : CancellationToken = None, paths : list[str] = None) -> list[DuplicationReport]: 
         dir = self._format_dir(dir)
         result_list = []
-        
+
+        # one run per language, several extensions can share one (e.g. ".c" and ".h")
+        languages = set()
         for extension in file_extensions:
             # on saute si l'extension n'est pas supportée
             if extension not in PMD_CopyPasteDetector._EXTENSIONS:
                 continue
+            languages.add(PMD_CopyPasteDetector._EXTENSIONS[extension])
+
+        for language_id in sorted(languages):
+            language_paths = None
+            if paths is not None:
+                language_paths = [path for path in paths if PMD_CopyPasteDetector._EXTENSIONS.get(os.path.splitext(path)[1]) == language_id]
+                if not language_paths:
+                    continue
 
-            language_id = PMD_CopyPasteDetector._EXTENSIONS[extension]
-            output = self._start_pmd(language_id, dir)
+            output = self._start_pmd(language_id, dir, cancellation, language_paths)
             report = self._read_xml(output, dir)
             result_list.extend(report)
             continue
@@ -0,0 +1,64 @@
+import bisect
+import re
+from functools import lru_cache
+
+# the line boundaries of str.splitlines()
+_LINE_BREAK = re.compile(r"\r\n|[\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+class EntityScanner:
+    """
+    Finds the lines of a file mentioning identifiable entities (e.g. TODO, FIXME).
+
+    All the entities are compiled into one alternation regex and the file is
+    scanned once, instead of once per entity and line. An entity matches as a
+    whole word, case-insensitively, and is reported once per line.
+
+    ```
+    scanner = get_entity_scanner(("todo", "fixme"))
+    scanner.scan(code)  # {"todo": [3, 12], "fixme": []}
+    ```
+    """
+    entity_names : tuple[str, ...]
+
+    def __init__(self, entity_names):
+        self.entity_names = tuple(entity_names)
+        self._patterns = {name: re.compile(rf"\b{re.escape(name)}\b", re.IGNORECASE) for name in self.entity_names}
+
+        # longest first, so that an entity that is a prefix of another one does not hide it
+        tags = sorted({name.lower() for name in self.entity_names}, key=len, reverse=True)
+        # zero-width, so that matches of different entities may overlap
+        self._alternation = re.compile(r"(?=\b(" + "|".join(re.escape(tag) for tag in tags) + r")\b)", re.IGNORECASE) if tags else None
+
+    def scan(self, code : str) -> dict[str, list[int]]:
+        """
+        Returns:
+            dict[str, list[int]]: entity name -> line numbers (1-based, like enumerate(code.splitlines(), 1))
+        """
+        found = {name: [] for name in self.entity_names}
+        if self._alternation is None:
+            return found
+
+        line_breaks = None
+        for match in self._alternation.finditer(code):
+            if line_breaks is None:
+                line_breaks = [m.end() for m in _LINE_BREAK.finditer(code)]
+            line = bisect.bisect_right(line_breaks, match.start()) + 1
+            matched = match.group(1).lower()
+
+            for name in self.entity_names:
+                tag = name.lower()
+                # other entities may match at the same offset (e.g. a shorter prefix of the matched one)
+                if tag != matched and not self._patterns[name].match(code, match.start()):
+                    continue
+                lines = found[name]
+                if not lines or lines[-1] != line:
+                    lines.append(line)
+
+        return found
+
+
+@lru_cache(maxsize=16)
+def get_entity_scanner(entity_names : tuple[str, ...]) -> EntityScanner:
+    """Return the scanner of an entity catalogue, compiled once and reused until the catalogue changes."""
+    return EntityScanner(entity_names)
@@ -0,0 +1,129 @@
+import re
+
+class SourceFilter:
+    """
+    Decides which files of a commit are worth analyzing: excludes vendored or
+    generated directories, paths matched by the `.gitignore` files of the
+    commit, files over a size cap, binary files and minified files.
+
+    ```
+    source_filter = SourceFilter(max_file_bytes=1024 * 1024)
+    source_filter.add_gitignore("", root_gitignore_text)
+    if not source_filter.is_excluded("src/app.py"):
+        ...
+    ```
+    """
+    EXCLUDED_DIRS = {"vendor", "node_modules", "dist", "bower_components", "third_party"}
+    MINIFIED_SUFFIXES = (".min.js", ".min.css")
+    MINIFIED_MIN_BYTES = 1024
+    MINIFIED_AVERAGE_LINE_LENGTH = 300
+    BINARY_SNIFF_BYTES = 8000
+
+    _max_file_bytes : int
+    _rules : list[tuple[str, re.Pattern, bool, bool]]
+
+    def __init__(self, max_file_bytes : int = None):
+        self._max_file_bytes = max_file_bytes
+        # (base directory, pattern, negated, directory only), in .gitignore order
+        self._rules = []
+
+    def add_gitignore(self, base_dir : str, text : str):
+        """Add the rules of the `.gitignore` file found in `base_dir` ("" for the root)."""
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            if line.startswith("\\"):
+                line = line[1:]
+
+            dir_only = line.endswith("/")
+            line = line.strip("/") if dir_only else line
+
+            # a pattern with a slash (other than a trailing one) is relative to its .gitignore
+            anchored = "/" in line
+            line = line.lstrip("/")
+            if not line:
+                continue
+
+            regex = self._glob_to_regex(line)
+            if not anchored:
+                regex = "(?:.*/)?" + regex
+            self._rules.append((base_dir, re.compile(regex + r"\Z", re.DOTALL), negated, dir_only))
+
+    def is_excluded(self, path : str) -> bool:
+        """True if `path` (relative to the repository root) must not be analyzed."""
+        parts = path.split("/")
+        if any(part in SourceFilter.EXCLUDED_DIRS for part in parts[:-1]):
+            return True
+        if path.endswith(SourceFilter.MINIFIED_SUFFIXES):
+            return True
+
+        # like git: a file inside an ignored directory cannot be re-included
+        for i in range(1, len(parts)):
+            if self._is_ignored("/".join(parts[:i]), True):
+                return True
+        return self._is_ignored(path, False)
+
+    def is_too_large(self, size : int) -> bool:
+        return self._max_file_bytes is not None and size > self._max_file_bytes
+
+    def is_binary(self, data : bytes) -> bool:
+        return b"\0" in data[:SourceFilter.BINARY_SNIFF_BYTES]
+
+    def is_minified(self, code : str) -> bool:
+        if len(code) < SourceFilter.MINIFIED_MIN_BYTES:
+            return False
+        line_count = code.count("\n") + 1
+        return len(code) / line_count > SourceFilter.MINIFIED_AVERAGE_LINE_LENGTH
+
+    def _is_ignored(self, path : str, is_dir : bool) -> bool:
+        ignored = False
+        for base_dir, pattern, negated, dir_only in self._rules:
+            if dir_only and not is_dir:
+                continue
+            if base_dir:
+                if not path.startswith(base_dir + "/"):
+                    continue
+                relative = path[len(base_dir) + 1:]
+            else:
+                relative = path
+            if pattern.match(relative):
+                ignored = not negated
+        return ignored
+
+    def _glob_to_regex(self, glob : str) -> str:
+        regex = ""
+        i = 0
+        while i < len(glob):
+            if glob.startswith("**/", i):
+                regex += "(?:.*/)?"
+                i += 3
+            elif glob.startswith("/**", i) and i + 3 == len(glob):
+                regex += "/.*"
+                i += 3
+            elif glob[i] == "*":
+                regex += "[^/]*"
+                i += 1
+            elif glob[i] == "?":
+                regex += "[^/]"
+                i += 1
+            elif glob[i] == "[":
+                end = glob.find("]", i + 1)
+                if end == -1:
+                    regex += re.escape(glob[i])
+                    i += 1
+                else:
+                    content = glob[i + 1:end]
+                    if content.startswith("!"):
+                        content = "^" + content[1:]
+                    regex += "[" + content + "]"
+                    i = end + 1
+            else:
+                regex += re.escape(glob[i])
+                i += 1
+        return regex
+
@@ -13,9 +13,10 @@ class LocalToolMock(DuplicationToolInterface):
         LocalToolMock.called = False
         LocalToolMock.params_valid = True
 
-    def run(self, dir, file_extensions):
+    def run(self, dir, file_extensions, cancellation=None, paths=None):
         LocalToolMock.called = True
         LocalToolMock.params_valid &= dir == "/dir" and file_extensions == {".py"}
+        LocalToolMock.params_valid &= paths == ["123.py", "456.py"]
         return [DuplicationReport(1, "hello")]
     
 class LocalServiceMock(CodeDuplicationService):
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from src.database.analysis_bulk_writer import AnalysisBulkWriter
+from src.models import db
+from src.models.model import *
+
+
+def _make_commit():
+    repo = Repository(id='repo0', owner='test', name='test')
+    branch = Branch(id='branch0', name='main', repository_id=repo.id)
+    commit = Commit(id='commit0', sha='0', date=datetime.now(), author='test', message='test', branch_id=branch.id)
+    entities = [IdentifiableEntity(id='ie0', name='todo'), IdentifiableEntity(id='ie1', name='fixme')]
+    # no relationships between the models, so each parent is committed first
+    for rows in ([repo], [branch], [commit], entities):
+        db.session.add_all(rows)
+        db.session.commit()
+    return commit, {"todo": "ie0", "fixme": "ie1"}
+
+
+def test_flush_writes_all_rows_of_a_commit(app):
+    commit, entity_ids = _make_commit()
+
+    writer = AnalysisBulkWriter(commit.id, batch_size=2)
+    writer.add_file("a.py", [("f", 1, 3), ("g", 10, 1)], [("todo", 2), ("fixme", 4)], entity_ids)
+    writer.add_file("b.py", [("h", 1, 5), ("h", 20, 7)], [("todo", 1)], entity_ids)
+    writer.add_file("c.py", [], [], entity_ids)
+    files = writer.flush()
+    db.session.commit()
+
+    assert sorted(file.name for file in files) == ["a.py", "b.py", "c.py"]
+    stored = {file.name: file.id for file in File.query.filter_by(commit_id=commit.id).all()}
+    assert {file.name: file.id for file in files} == stored
+
+    functions = {(f.file_id, f.name): f for f in Function.query.all()}
+    assert len(functions) == 3
+    # a function name seen twice keeps its first line and its last complexity
+    h = functions[(stored["b.py"], "h")]
+    assert h.line_position == 1
+    assert Complexity.query.filter_by(function_id=h.id).one().value == 7
+
+    assert FileIdentifiableEntity.query.count() == 3
+
+
+def test_flush_upserts_rows_that_already_exist(app):
+    commit, entity_ids = _make_commit()
+
+    first = AnalysisBulkWriter(commit.id)
+    first.add_file("a.py", [("f", 1, 3)], [("todo", 2)], entity_ids)
+    [stored_file] = first.flush()
+    db.session.commit()
+
+    # same commit analyzed again, e.g. after a retry
+    second = AnalysisBulkWriter(commit.id)
+    second.add_file("a.py", [("f", 1, 9), ("g", 5, 2)], [("todo", 2), ("fixme", 8)], entity_ids)
+    [file] = second.flush()
+    db.session.commit()
+
+    assert file.id == stored_file.id
+    assert File.query.count() == 1
+    assert Function.query.count() == 2
+    f = Function.query.filter_by(name="f").one()
+    assert Complexity.query.filter_by(function_id=f.id).one().value == 9
+    assert FileIdentifiableEntity.query.count() == 2
+
+
+def test_add_functions_to_stored_file(app):
+    commit, entity_ids = _make_commit()
+    file = File(id='file0', name='a.py', commit_id=commit.id)
+    db.session.add(file)
+    db.session.commit()
+
+    writer = AnalysisBulkWriter(commit.id)
+    writer.add_functions(file.id, [("f", 1, 4)])
+    writer.add_entity_lines(file.id, [("fixme", 3)], entity_ids)
+    assert writer.flush() == []
+    db.session.commit()
+
+    assert Function.query.filter_by(file_id=file.id).one().name == "f"
+    assert Complexity.query.one().value == 4
+    assert FileIdentifiableEntity.query.filter_by(file_id=file.id).one().line_position == 3
@@ -90,3 +90,18 @@ def test_get_fragments_for_many_file():
             print(e)
             assert False
     return
+
+def test_inserts_are_left_to_the_caller_transaction():
+    app = init_mock_app()
+    with app.app_context():
+        # arrange
+        facade = CodeDuplicationDatabaseFacade()
+        fragment = CodeFragment("hello world", 10)
+
+        # act
+        facade.insert_many_fragments([fragment])
+        db.session.rollback()
+
+        # assert
+        assert facade.get_duplication_by_id(fragment.id) is None
+    return
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from src.models import db
+from src.models.model import *
+from src.scripts.init_db import upgrade_db
+
+
+def _add(*rows):
+    # no relationships between the models, so each parent is committed first
+    for row in rows:
+        db.session.add(row)
+        db.session.commit()
+
+
+def test_upgrade_removes_rows_written_twice_before_the_unique_indexes(app):
+    # a database created before the constraints, with a file analyzed twice
+    for table, constraint in (
+        ("file", "uq_file_commit_id_name"),
+        ("function", "uq_function_file_id_name"),
+        ("complexity", "uq_complexity_function_id"),
+    ):
+        db.session.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {constraint}"))
+    db.session.commit()
+
+    _add(
+        Repository(id='repo0', owner='test', name='test'),
+        Branch(id='branch0', name='main', repository_id='repo0'),
+        Commit(id='commit0', sha='0', date=datetime.now(), author='test', message='test', branch_id='branch0'),
+    )
+    for file_id in ('file0', 'file1'):
+        _add(
+            File(id=file_id, name='a.py', commit_id='commit0'),
+            Function(id=f'{file_id}-f', name='f', line_position=1, file_id=file_id),
+            Complexity(id=f'{file_id}-c', value=3, function_id=f'{file_id}-f'),
+        )
+    _add(Complexity(id='file0-c2', value=3, function_id='file0-f'))
+
+    upgrade_db()
+
+    assert [file.id for file in File.query.all()] == ['file0']
+    assert [function.id for function in Function.query.all()] == ['file0-f']
+    assert Complexity.query.count() == 1
+
+    # the index now rejects a second copy
+    db.session.add(File(id='file2', name='a.py', commit_id='commit0'))
+    with pytest.raises(Exception):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_upgrade_stops_at_the_first_statement_that_fails(app, monkeypatch):
+    monkeypatch.setattr("src.scripts.init_db.UPGRADES", ["SELECT 1 FROM missing_table", "SELECT 1"])
+
+    with pytest.raises(SystemExit):
+        upgrade_db()
@@ -0,0 +1,49 @@
+# analysis_engine_test.py
+from src.services.analysis_engine import AnalysisEngine, analyze_source, default_worker_count
+
+
+def test_analyze_source_returns_plain_tuples():
+    code = (
+        "def f(x):\n"
+        "    # TODO: handle negatives\n"
+        "    if x > 0:\n"
+        "        return x\n"
+        "    return -x  # fixme\n"
+    )
+
+    path, functions, entity_lines = analyze_source("main.py", code, ["todo", "fixme"])
+
+    assert path == "main.py"
+    assert functions == [("f", 1, 2)]
+    assert entity_lines == [("todo", 2), ("fixme", 5)]
+
+
+def test_engine_analyzes_files_on_worker_processes():
+    files = ((f"file{i}.py", f"def f{i}():\n    return {i}\n") for i in range(10))
+
+    engine = AnalysisEngine(max_workers=2)
+    try:
+        results = sorted(engine.analyze(files, ["todo"]))
+    finally:
+        engine.shutdown()
+
+    assert [path for path, _, _ in results] == [f"file{i}.py" for i in range(10)]
+    assert all(functions == [(f"f{path[4]}", 1, 1)] for path, functions, _ in results)
+
+
+def test_engine_skips_files_that_fail():
+    engine = AnalysisEngine(max_workers=1)
+    try:
+        results = list(engine.analyze([("bad.py", None), ("good.py", "x = 1\n")], []))
+    finally:
+        engine.shutdown()
+
+    assert results == [("good.py", [], [])]
+
+
+def test_default_worker_count(monkeypatch):
+    monkeypatch.setenv("ANALYSIS_WORKERS", "3")
+    assert default_worker_count() == 3
+
+    monkeypatch.delenv("ANALYSIS_WORKERS")
+    assert default_worker_count() >= 1
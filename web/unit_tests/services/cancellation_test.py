@@ -0,0 +1,66 @@
+# cancellation_test.py
+import subprocess
+import time
+
+import pytest
+
+from src.services.cancellation import CancellationToken, TaskCancelled
+
+
+def test_check_raises_once_cancelled():
+    token = CancellationToken()
+    token.check()
+    assert not token.cancelled
+
+    token.cancel()
+
+    assert token.cancelled
+    with pytest.raises(TaskCancelled):
+        token.check()
+
+
+def test_cancel_terminates_tracked_processes():
+    token = CancellationToken()
+    start = time.time()
+
+    with token.track(subprocess.Popen(["sleep", "30"])) as process:
+        token.cancel()
+        process.wait(timeout=5)
+
+    assert process.returncode != 0
+    assert time.time() - start < 5
+
+
+def test_process_started_after_cancel_is_terminated():
+    token = CancellationToken()
+    token.cancel()
+
+    with token.track(subprocess.Popen(["sleep", "30"])) as process:
+        assert process.wait(timeout=5) != 0
+
+
+def _is_running(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # a zombie is already dead, it only waits for its parent to reap it
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_cancel_terminates_the_children_of_a_process_group_leader():
+    token = CancellationToken()
+    # like the pmd launcher script, the shell runs the actual work in a child process
+    args = ["sh", "-c", "sleep 30 & echo $!; wait"]
+
+    with token.track(subprocess.Popen(args, stdout=subprocess.PIPE, text=True, start_new_session=True)) as process:
+        child = int(process.stdout.readline())
+        assert _is_running(child)
+        token.cancel()
+        process.wait(timeout=5)
+
+    deadline = time.time() + 5
+    while _is_running(child) and time.time() < deadline:
+        time.sleep(0.05)
+    assert not _is_running(child)
+    process.stdout.close()
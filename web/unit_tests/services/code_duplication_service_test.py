@@ -158,44 +158,39 @@ def test_insert_elements_from_parsed_xml():
     assert LocalServiceMock.called and LocalServiceMock.params_valid
 
 
-def test_insert_elements__exception_file_not_in_db(): 
+def test_insert_elements__skips_files_not_in_db(): 
     # arrange
     class LocalServiceMock(CodeDuplicationService):
-        called = False
-        params_valid = False
+        fragments = None
+        duplications = None
 
         def __init__(self):
             super().__init__(None)
 
         def insert(self, fragments, duplications):
-            LocalServiceMock.called = True
+            LocalServiceMock.fragments = fragments
+            LocalServiceMock.duplications = duplications
             return
 
     files = [
         File(id='file0', name='file0.py', commit_id='...'),
         File(id='file1', name='file1.py', commit_id='...'),
     ]
-    report0_files = [
-        DuplicationReport.File("file0.py", ValueRange(0, 3), ValueRange(0, 10)),
-        DuplicationReport.File("file1.py", ValueRange(10, 13), ValueRange(0, 10)),
-        DuplicationReport.File("file2.py", ValueRange(3, 39), ValueRange(0, 10))
-    ]
-
     report0 = DuplicationReport(3, "hello world")
-
-    report0.add_file(report0_files[0])
-    report0.add_file(report0_files[1])
-    report0.add_file(report0_files[2])
-    reports = [report0]
+    report0.add_file(DuplicationReport.File("file0.py", ValueRange(0, 3), ValueRange(0, 10)))
+    report0.add_file(DuplicationReport.File("file1.py", ValueRange(10, 13), ValueRange(0, 10)))
+    # e.g. a vendored file, filtered out of the analysis
+    report0.add_file(DuplicationReport.File("file2.py", ValueRange(3, 39), ValueRange(0, 10)))
+    report1 = DuplicationReport(3, "world hello")
+    report1.add_file(DuplicationReport.File("file2.py", ValueRange(0, 3), ValueRange(0, 10)))
+    report1.add_file(DuplicationReport.File("file3.py", ValueRange(0, 3), ValueRange(0, 10)))
     service = LocalServiceMock()
 
     # act
-    try:
-        service.insert_from_report(reports, files)
+    service.insert_from_report([report0, report1], files)
         
     # assert
-        assert False
-    except Exception as e:
-        assert LocalServiceMock.called == False
+    assert [fragment.text for fragment in LocalServiceMock.fragments] == ["hello world"]
+    assert sorted(duplication.file_id for duplication in LocalServiceMock.duplications) == ["file0", "file1"]
     return 
     
@@ -0,0 +1,67 @@
+# debt_evolution_cache_test.py
+from datetime import datetime, timedelta
+
+from src.models import db
+from src.models.model import Branch, DebtEvolutionResult, IdentifiableEntity, Repository
+from src.services.debt_evolution_cache import DebtEvolutionCache
+
+
+def _make_branch():
+    # no relationships between the models, so each parent is committed first
+    for row in (Repository(id='repo0', owner='test', name='test'), Branch(id='branch0', name='main', repository_id='repo0')):
+        db.session.add(row)
+        db.session.commit()
+
+
+def test_result_is_returned_for_the_same_commits(app):
+    _make_branch()
+    cache = DebtEvolutionCache(ttl_seconds=60, max_entries=10)
+    result = [{"commit_sha": "a", "total_identifiable_entities": 3}]
+
+    assert cache.get("branch0", ["a", "b"]) is None
+    cache.put("branch0", ["a", "b"], False, result)
+
+    assert cache.get("branch0", ["a", "b"]) == result
+    # a new commit in the range, or another mode, is another result
+    assert cache.get("branch0", ["a", "b", "c"]) is None
+    assert cache.get("branch0", ["a", "b"], incremental=True) is None
+
+
+def test_a_new_identifiable_entity_misses_the_cache(app):
+    _make_branch()
+    cache = DebtEvolutionCache(ttl_seconds=60, max_entries=10)
+    cache.put("branch0", ["a"], False, [])
+
+    db.session.add(IdentifiableEntity(id='ie0', name='hack'))
+    db.session.commit()
+
+    assert cache.get("branch0", ["a"]) is None
+
+
+def test_expired_result_is_deleted(app):
+    _make_branch()
+    cache = DebtEvolutionCache(ttl_seconds=60, max_entries=10)
+    cache.put("branch0", ["a"], False, [])
+
+    entry = DebtEvolutionResult.query.one()
+    entry.created_at = datetime.utcnow() - timedelta(seconds=120)
+    db.session.commit()
+
+    assert cache.get("branch0", ["a"]) is None
+    assert DebtEvolutionResult.query.count() == 0
+
+
+def test_least_recently_used_results_are_evicted(app):
+    _make_branch()
+    cache = DebtEvolutionCache(ttl_seconds=60, max_entries=2)
+    cache.put("branch0", ["a"], False, [1])
+    cache.put("branch0", ["b"], False, [2])
+    # "a" is used again, so "b" is the least recently used one
+    assert cache.get("branch0", ["a"]) == [1]
+
+    cache.put("branch0", ["c"], False, [3])
+
+    assert DebtEvolutionResult.query.count() == 2
+    assert cache.get("branch0", ["b"]) is None
+    assert cache.get("branch0", ["a"]) == [1]
+    assert cache.get("branch0", ["c"]) == [3]
@@ -0,0 +1,113 @@
+# fetch_coordinator_test.py
+import subprocess
+import threading
+import time
+
+import pytest
+
+from src.services import fetch_coordinator as fetch_coordinator_module
+from src.services.fetch_coordinator import FetchCoordinator
+
+
+def _git(path, *args):
+    return subprocess.check_output(["git", "-C", str(path), *args], text=True, stderr=subprocess.DEVNULL).strip()
+
+
+def _commit(work, message):
+    (work / "main.py").write_text(f"# {message}\n")
+    _git(work, "add", "-A")
+    _git(work, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "-q", "-m", message)
+    return _git(work, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def origin(tmp_path):
+    """A local bare repo standing in for origin, returns (work_dir, clone_dir)."""
+    work = tmp_path / "work"
+    work.mkdir()
+    _git(work, "init", "-q", "-b", "main")
+    _commit(work, "first")
+
+    bare = tmp_path / "origin.git"
+    subprocess.run(["git", "clone", "-q", "--bare", str(work), str(bare)], check=True)
+    _git(work, "remote", "add", "origin", str(bare))
+
+    clone = tmp_path / "clone"
+    subprocess.run(["git", "clone", "-q", "--no-checkout", str(bare), str(clone)], check=True)
+    return work, clone
+
+
+def _push_commit(work, message):
+    sha = _commit(work, message)
+    _git(work, "push", "-q", "origin", "main")
+    return sha
+
+
+def _origin_main(clone):
+    return _git(clone, "rev-parse", "refs/remotes/origin/main")
+
+
+def test_fetch_is_skipped_while_fresh(origin):
+    work, clone = origin
+    coordinator = FetchCoordinator(ttl=60)
+
+    assert coordinator.refresh(str(clone)) is True
+    new_sha = _push_commit(work, "second")
+
+    # within the TTL nothing is fetched
+    assert coordinator.refresh(str(clone)) is False
+    assert _origin_main(clone) != new_sha
+
+    # forcing bypasses the TTL
+    assert coordinator.refresh(str(clone), force=True) is True
+    assert _origin_main(clone) == new_sha
+
+
+def test_concurrent_fetches_are_coalesced(origin, monkeypatch):
+    _, clone = origin
+    coordinator = FetchCoordinator(ttl=0)
+
+    real_run = subprocess.run
+    runs = []
+    def slow_run(cmd, *args, **kwargs):
+        runs.append(cmd)
+        time.sleep(0.3)
+        return real_run(cmd, *args, **kwargs)
+    monkeypatch.setattr(fetch_coordinator_module.subprocess, "run", slow_run)
+
+    threads = [threading.Thread(target=coordinator.refresh, args=(str(clone),)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(runs) == 1
+
+
+def test_failed_fetch_is_shared_and_not_cached(tmp_path):
+    coordinator = FetchCoordinator(ttl=60)
+    not_a_repo = tmp_path / "missing"
+    not_a_repo.mkdir()
+
+    with pytest.raises(subprocess.CalledProcessError):
+        coordinator.refresh(str(not_a_repo))
+    # a failure does not count as fresh
+    with pytest.raises(subprocess.CalledProcessError):
+        coordinator.refresh(str(not_a_repo))
+
+
+def test_scheduler_keeps_tracked_repos_warm(origin):
+    work, clone = origin
+    coordinator = FetchCoordinator(ttl=60)
+    coordinator.track(str(clone))
+    new_sha = _push_commit(work, "second")
+
+    coordinator.start_scheduler(0.1)
+    try:
+        deadline = time.time() + 5
+        while _origin_main(clone) != new_sha and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        coordinator.stop_scheduler()
+
+    assert _origin_main(clone) == new_sha
@@ -0,0 +1,112 @@
+# git_access_test.py
+import os
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.services.git_access import GitAccess, get_git_access, close_git_access
+
+
+def _git(path, *args, env=None):
+    return subprocess.check_output(["git", "-C", str(path), *args], text=True, stderr=subprocess.DEVNULL, env=env).strip()
+
+
+def _commit(repo, message, date, files):
+    for rel_path, content in files.items():
+        file_path = repo / rel_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+    _git(repo, "add", "-A")
+    env = {**os.environ, "GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date}
+    _git(repo, "-c", "user.name=Jane Doe", "-c", "user.email=jane@test", "commit", "-q", "-m", message, env=env)
+    return _git(repo, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    _git(repo, "init", "-q", "-b", "main")
+    return repo
+
+
+def test_read_returns_none_for_missing_object(repo):
+    sha = _commit(repo, "init", "2025-01-01T00:00:00+00:00", {"main.py": "x = 1\n"})
+
+    git = GitAccess(str(repo))
+    try:
+        assert git.has_commit(sha)
+        assert git.read("0" * 40) is None
+        assert git.info("0" * 40) is None
+        # the processes survive a missing object
+        assert git.has_commit(sha)
+        assert git.read(f"{sha}:main.py") == b"x = 1\n"
+    finally:
+        git.close()
+
+
+def test_read_commit_parses_metadata(repo):
+    sha = _commit(repo, "Fix parser\n\nLonger body", "2025-03-04T05:06:07+02:00", {"main.py": "x = 1\n"})
+
+    git = GitAccess(str(repo))
+    try:
+        commit = git.read_commit("main")
+    finally:
+        git.close()
+
+    assert commit["sha"] == sha
+    assert commit["parents"] == []
+    assert commit["author"] == "Jane Doe"
+    assert commit["author_email"] == "jane@test"
+    assert commit["committer_date"] == datetime(2025, 3, 4, 5, 6, 7, tzinfo=timezone(timedelta(hours=2)))
+    assert commit["message"] == "Fix parser\n\nLonger body\n"
+
+
+def test_iter_tree_matches_ls_tree(repo):
+    sha = _commit(repo, "init", "2025-01-01T00:00:00+00:00", {
+        "a.py": "1\n",
+        "a-b/c.py": "2\n",
+        "a/z.py": "3\n",
+        "a0.py": "4\n",
+        "src/deep/lib.c": "5\n",
+    })
+
+    git = GitAccess(str(repo))
+    try:
+        entries = [(path, oid) for path, _, oid in git.iter_tree(sha)]
+    finally:
+        git.close()
+
+    expected = [tuple(line.split("\t")[::-1]) for line in _git(repo, "ls-tree", "-r", "--format=%(objectname)\t%(path)", sha).splitlines()]
+    assert entries == [(path, oid) for path, oid in expected]
+
+
+def test_iter_commits_walks_newest_first(repo):
+    shas = [
+        _commit(repo, f"commit {i}", f"2025-01-0{i}T00:00:00+00:00", {"main.py": f"x = {i}\n"})
+        for i in range(1, 5)
+    ]
+
+    git = GitAccess(str(repo))
+    try:
+        walked = [commit["sha"] for commit in git.iter_commits("main", max_count=3)]
+    finally:
+        git.close()
+
+    assert walked == shas[::-1][:3]
+
+
+def test_get_git_access_is_shared_per_repository(repo):
+    _commit(repo, "init", "2025-01-01T00:00:00+00:00", {"main.py": "x = 1\n"})
+
+    git = get_git_access(str(repo))
+    try:
+        assert get_git_access(str(repo)) is git
+        assert git.config("user.missing") is None
+        assert not git.is_shallow()
+    finally:
+        close_git_access(str(repo))
+
+    assert get_git_access(str(repo)) is not git
+    close_git_access(str(repo))
@@ -1,5 +1,6 @@
 # test_github_service.py
 import os
+import subprocess
 from pathlib import Path
 
 from src.services import github_service
@@ -37,6 +38,19 @@ def test_ensure_local_repo_clones_when_missing(tmp_path, monkeypatch):
 
 
 
+def test_ensure_local_repo_clones_with_filter(tmp_path, monkeypatch):
+    monkeypatch.setenv("REPO_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("REPO_CLONE_FILTER", "blob:none")
+
+    calls = []
+    monkeypatch.setattr(github_service.subprocess, "run", lambda cmd, **kwargs: calls.append(cmd))
+
+    github_service.ensure_local_repo("my-owner", "my-repo")
+
+    assert len(calls) == 1
+    assert calls[0][0:4] == ["git", "clone", "--no-checkout", "--filter=blob:none"]
+
+
 # ---- ensure_local_repo tests ----
 def test_ensure_local_repo_uses_existing_repo(tmp_path, monkeypatch):
     # Use test directory as fake cache root
@@ -75,59 +89,297 @@ def test_ensure_local_repo_uses_existing_repo(tmp_path, monkeypatch):
         assert "clone" not in cmd
 
 
-# ---- safe_walk_source_files tests ----
-def test_safe_walk_source_files_yields_supported_extensions(tmp_path):
-    # Create a fake repo structure
-    root = tmp_path / "repo"
-    root.mkdir()
-
-    # Supported files
-    (root / "main.py").write_text("print('hello')")
-    (root / "lib.cpp").write_text("int main(){return 0;}")
-    (root / "index.js").write_text("console.log('x')")
-
-    # Unsupported file
-    (root / "readme.md").write_text("# doc")
-
-    yielded = list(github_service.safe_walk_source_files(str(root)))
-    names = {name for _, name in yielded}
-
-    assert "main.py" in names
-    assert "lib.cpp" in names
-    assert "index.js" in names
-    assert "readme.md" not in names
+# ---- object store reader tests ----
+def _git(path, *args):
+    subprocess.run(["git", "-C", str(path), *args], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
 
-def test_safe_walk_source_files_skips_git_directory(tmp_path):
-    root = tmp_path / "repo"
-    root.mkdir()
-
-    # Normal supported file
-    (root / "main.py").write_text("print('hello')")
-
-    # Inside .git should be ignored
-    git_dir = root / ".git"
-    git_dir.mkdir()
-    (git_dir / "ignored.py").write_text("print('ignore')")
-
-    yielded = list(github_service.safe_walk_source_files(str(root)))
-    names = {name for _, name in yielded}
-
-    assert "main.py" in names
-    assert "ignored.py" not in names
-
-
-def test_safe_walk_source_files_handles_multiple_dots(tmp_path):
-    root = tmp_path / "repo"
-    root.mkdir()
-
-    # Supported with multiple dots
-    (root / "module.test.util.py").write_text("x=1")
-    # Unsupported with multiple dots
-    (root / "archive.tar.gz").write_text("binary")
-
-    yielded = list(github_service.safe_walk_source_files(str(root)))
-    names = {name for _, name in yielded}
-
-    assert "module.test.util.py" in names
-    assert "archive.tar.gz" not in names
+def _make_cached_repo(tmp_path, monkeypatch, files):
+    """Create a committed repo where ensure_local_repo expects the cached clone."""
+    monkeypatch.setenv("REPO_CACHE_DIR", str(tmp_path))
+    # fetches against the fake github.com origin must fail fast instead of prompting
+    monkeypatch.setenv("GIT_TERMINAL_PROMPT", "0")
+    repo_path = tmp_path / "my-owner__my-repo"
+    repo_path.mkdir()
+    _git(repo_path, "init", "-q")
+    _git(repo_path, "remote", "add", "origin", github_service.remote_url("my-owner", "my-repo"))
+
+    for rel_path, content in files.items():
+        file_path = repo_path / rel_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+
+    _git(repo_path, "add", "-A")
+    _git(repo_path, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "-q", "-m", "init")
+    sha = subprocess.check_output(["git", "-C", str(repo_path), "rev-parse", "HEAD"], text=True).strip()
+    return repo_path, sha
+
+
+def test_fetch_files_reads_from_object_store(tmp_path, monkeypatch):
+    repo_path, sha = _make_cached_repo(tmp_path, monkeypatch, {
+        "main.py": "print('hello')\n",
+        "src/lib.cpp": "int main(){return 0;}\n",
+        "readme.md": "# doc\n",
+    })
+
+    # wipe the working tree, files must come from the object store
+    (repo_path / "main.py").unlink()
+    (repo_path / "src" / "lib.cpp").unlink()
+
+    files = dict(github_service.fetch_files("my-owner", "my-repo", sha))
+
+    assert files == {
+        "main.py": "print('hello')\n",
+        "src/lib.cpp": "int main(){return 0;}\n",
+    }
+    # working tree was not checked out again
+    assert not (repo_path / "main.py").exists()
+
+
+def test_fetch_files_skips_excluded_large_binary_and_minified_files(tmp_path, monkeypatch):
+    _, sha = _make_cached_repo(tmp_path, monkeypatch, {
+        ".gitignore": "generated/\n*.gen.py\n!keep.gen.py\n",
+        "src/app.py": "x = 1\n",
+        "src/keep.gen.py": "kept = True\n",
+        "src/skip.gen.py": "skipped = True\n",
+        "generated/out.py": "x = 2\n",
+        "node_modules/lib/index.js": "module.exports = 1;\n",
+        "web/bundle.js": "var a=1;" * 500,
+        "big.py": "y = 1\n" * 100,
+        "blob.c": "int x;\0\0",
+    })
+
+    files = github_service.fetch_files("my-owner", "my-repo", sha, max_file_bytes=500)
+
+    # files are streamed
+    assert not isinstance(files, list)
+    assert dict(files) == {
+        "src/app.py": "x = 1\n",
+        "src/keep.gen.py": "kept = True\n",
+    }
+
+
+def test_fetch_files_hydrates_only_source_blobs_of_partial_clone(tmp_path, monkeypatch):
+    work = tmp_path / "work"
+    work.mkdir()
+    _git(work, "init", "-q", "-b", "main")
+    (work / "main.py").write_text("x = 1\n")
+    (work / "lib.js").write_text("var y = 2;\n")
+    (work / "logo.png").write_bytes(b"\x89PNG\0\0")
+    (work / "notes.md").write_text("# notes\n")
+    _git(work, "add", "-A")
+    _git(work, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "-q", "-m", "init")
+    sha = subprocess.check_output(["git", "-C", str(work), "rev-parse", "HEAD"], text=True).strip()
+
+    origin = tmp_path / "origin.git"
+    subprocess.run(["git", "clone", "-q", "--bare", str(work), str(origin)], check=True)
+    _git(origin, "config", "uploadpack.allowFilter", "true")
+    _git(origin, "config", "uploadpack.allowAnySHA1InWant", "true")
+    origin_url = f"file://{origin}"
+    monkeypatch.setattr(github_service, "remote_url", lambda owner, name: origin_url)
+    monkeypatch.setenv("REPO_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("REPO_CLONE_FILTER", "blob:none")
+
+    real_run = subprocess.run
+    blob_fetches = []
+
+    def tracking_run(cmd, *args, **kwargs):
+        if "--stdin" in cmd:
+            blob_fetches.append(kwargs["input"].split())
+        return real_run(cmd, *args, **kwargs)
+
+    monkeypatch.setattr(github_service.subprocess, "run", tracking_run)
+
+    files = dict(github_service.fetch_files("my-owner", "my-repo", sha))
+
+    assert files == {"main.py": "x = 1\n", "lib.js": "var y = 2;\n"}
+    # one batch for the two source files
+    assert len(blob_fetches) == 1
+    assert len(blob_fetches[0]) == 2
+
+    repo_path = github_service.repo_dir("my-owner", "my-repo")
+    assert github_service.is_partial_clone(repo_path)
+    missing = subprocess.check_output(["git", "-C", repo_path, "rev-list", "--objects", "--no-walk", "--missing=print", sha], text=True)
+    # the blobs of the other files were never downloaded
+    assert len([line for line in missing.splitlines() if line.startswith("?")]) == 2
+
+
+def test_diff_name_status_reports_changed_source_files(tmp_path, monkeypatch):
+    repo_path, old_sha = _make_cached_repo(tmp_path, monkeypatch, {
+        "keep.py": "a = 1\n",
+        "edit.py": "b = 1\n",
+        "gone.py": "c = 1\n",
+    })
+
+    (repo_path / "edit.py").write_text("b = 2\n")
+    (repo_path / "gone.py").unlink()
+    (repo_path / "new.py").write_text("d = 1\n")
+    (repo_path / "notes.md").write_text("# ignored\n")
+    _git(repo_path, "add", "-A")
+    _git(repo_path, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "-q", "-m", "change")
+    new_sha = subprocess.check_output(["git", "-C", str(repo_path), "rev-parse", "HEAD"], text=True).strip()
+
+    changes = github_service.diff_name_status("my-owner", "my-repo", old_sha, new_sha)
+
+    assert changes == {"edit.py": "M", "gone.py": "D", "new.py": "A"}
+    assert list(github_service.fetch_files("my-owner", "my-repo", new_sha, paths={"new.py"})) == [("new.py", "d = 1\n")]
+
+
+# ---- get_commits_in_date_range tests ----
+def _commit_at(repo_path, message, date):
+    (repo_path / "history.py").write_text(f"# {message}\n")
+    env = dict(os.environ, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+    subprocess.run(
+        ["git", "-C", str(repo_path), "-c", "user.name=dev", "-c", "user.email=dev@test", "commit", "-q", "-am", message],
+        check=True, env=env,
+    )
+    return subprocess.check_output(["git", "-C", str(repo_path), "rev-parse", "HEAD"], text=True).strip()
+
+
+def test_get_commits_in_date_range_reads_local_clone(tmp_path, monkeypatch):
+    repo_path, _ = _make_cached_repo(tmp_path, monkeypatch, {"history.py": "\n"})
+    _commit_at(repo_path, "before range", "2025-01-01T12:00:00+00:00")
+    first = _commit_at(repo_path, "fix: first in range", "2025-01-10T12:00:00+02:00")
+    second = _commit_at(repo_path, "second in range\n\nwith a body", "2025-01-20T12:00:00+00:00")
+    _commit_at(repo_path, "after range", "2025-02-10T12:00:00+00:00")
+    _git(repo_path, "update-ref", "refs/remotes/origin/main", "HEAD")
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("the GitHub API should not be called")
+    monkeypatch.setattr(github_service.requests, "get", no_network)
+
+    commits = github_service.get_commits_in_date_range("my-owner", "my-repo", "main", "05/01/2025 00:00", "31/01/2025 23:59")
+
+    assert [c["sha"] for c in commits] == [second, first]
+    assert commits[1] == {
+        "sha": first,
+        "author": "dev",
+        "date": "2025-01-10T10:00:00Z",
+        "message": "fix: first in range",
+        "url": f"https://github.com/my-owner/my-repo/commit/{first}",
+    }
+    assert commits[0]["message"] == "second in range\n\nwith a body"
+
+
+def test_get_commits_in_date_range_falls_back_to_api(tmp_path, monkeypatch):
+    _make_cached_repo(tmp_path, monkeypatch, {"main.py": "x = 1\n"})
+
+    class FakeResponse:
+        status_code = 200
+        def __init__(self, payload):
+            self._payload = payload
+        def json(self):
+            return self._payload
+
+    pages = [[{
+        "sha": "abc",
+        "html_url": "https://github.com/my-owner/my-repo/commit/abc",
+        "commit": {"message": "from api", "author": {"name": "dev", "date": "2025-01-10T10:00:00Z"}},
+    }], []]
+    monkeypatch.setattr(github_service.requests, "get", lambda url, params: FakeResponse(pages.pop(0)))
+
+    # no refs/remotes/origin/unknown in the clone
+    commits = github_service.get_commits_in_date_range("my-owner", "my-repo", "unknown", "05/01/2025 00:00", "31/01/2025 23:59")
+
+    assert [c["sha"] for c in commits] == ["abc"]
+
+
+def test_get_cached_commits_in_date_range_does_no_git_network_work(tmp_path, monkeypatch):
+    repo_path, _ = _make_cached_repo(tmp_path, monkeypatch, {"history.py": "\n"})
+    sha = _commit_at(repo_path, "in range", "2025-01-10T12:00:00+00:00")
+    _git(repo_path, "update-ref", "refs/remotes/origin/main", "HEAD")
+
+    def no_clone_or_fetch(*args, **kwargs):
+        raise AssertionError("nothing should be cloned or fetched")
+    monkeypatch.setattr(github_service, "ensure_local_repo", no_clone_or_fetch)
+    monkeypatch.setattr(github_service.fetch_coordinator, "refresh", no_clone_or_fetch)
+    monkeypatch.setattr(github_service.requests, "get", no_clone_or_fetch)
+
+    commits = github_service.get_cached_commits_in_date_range("my-owner", "my-repo", "main", "05/01/2025 00:00", "31/01/2025 23:59")
+    assert [c["sha"] for c in commits] == [sha]
+
+    # unknown branch, or no clone at all: the caller starts the task instead
+    assert github_service.get_cached_commits_in_date_range("my-owner", "my-repo", "unknown", "05/01/2025 00:00", "31/01/2025 23:59") is None
+    assert github_service.get_cached_commits_in_date_range("my-owner", "other", "main", "05/01/2025 00:00", "31/01/2025 23:59") is None
+
+
+# ---- get_closest_commits tests ----
+def _make_origin(tmp_path, monkeypatch, dated_messages):
+    """Bare origin with one commit per (message, date) and a shallow cached clone of it."""
+    work = tmp_path / "work"
+    work.mkdir()
+    _git(work, "init", "-q", "-b", "main")
+    (work / "history.py").write_text("\n")
+    _git(work, "add", "-A")
+    shas = [_commit_at(work, message, date) for message, date in dated_messages]
+
+    origin = tmp_path / "origin.git"
+    subprocess.run(["git", "clone", "-q", "--bare", str(work), str(origin)], check=True)
+    origin_url = f"file://{origin}"
+    monkeypatch.setattr(github_service, "remote_url", lambda owner, name: origin_url)
+
+    cache = tmp_path / "cache"
+    monkeypatch.setenv("REPO_CACHE_DIR", str(cache))
+    subprocess.run(["git", "clone", "-q", "--no-checkout", "--depth", "1", "--no-single-branch", origin_url, str(cache / "my-owner__my-repo")], check=True)
+    return shas
+
+
+def test_get_closest_commits_resolves_many_dates_with_one_history_fetch(tmp_path, monkeypatch):
+    shas = _make_origin(tmp_path, monkeypatch, [
+        ("jan 01", "2025-01-01T00:00:00+00:00"),
+        ("jan 10", "2025-01-10T00:00:00+00:00"),
+        ("jan 20", "2025-01-20T00:00:00+00:00"),
+        ("feb 01", "2025-02-01T00:00:00+00:00"),
+    ])
+
+    real_run = subprocess.run
+    fetches = []
+    def counting_run(cmd, *args, **kwargs):
+        if "fetch" in cmd:
+            fetches.append(cmd)
+        return real_run(cmd, *args, **kwargs)
+    monkeypatch.setattr(github_service.subprocess, "run", counting_run)
+
+    url = "https://github.com/my-owner/my-repo.git"
+    results = github_service.get_closest_commits(url, "main", [
+        "04/01/2025 00:00",   # closer to jan 01
+        "15/01/2025 00:00",   # equidistant: the later commit wins
+        "31/12/2030 00:00",   # after the last commit
+    ])
+
+    assert results == [
+        (shas[0], "01/01/2025 00:00"),
+        (shas[2], "20/01/2025 00:00"),
+        (shas[3], "01/02/2025 00:00"),
+    ]
+    assert len(fetches) > 0
+
+    # history back to the earliest date is known, nothing is fetched again within the TTL
+    fetches.clear()
+    assert github_service.get_closest_commit(url, "main", "19/01/2025 00:00") == (shas[2], "20/01/2025 00:00")
+    assert fetches == []
+
+
+def test_get_closest_commits_fetches_the_new_tip_once_the_ttl_expired(tmp_path, monkeypatch):
+    _make_origin(tmp_path, monkeypatch, [("jan 01", "2025-01-01T00:00:00+00:00")])
+    url = "https://github.com/my-owner/my-repo.git"
+    assert github_service.get_closest_commit(url, "main", "31/12/2030 00:00")[1] == "01/01/2025 00:00"
+
+    # a commit is pushed after the history was fetched
+    work = tmp_path / "work"
+    newer = _commit_at(work, "mar 01", "2025-03-01T00:00:00+00:00")
+    _git(work, "push", "-q", str(tmp_path / "origin.git"), "HEAD:main")
+    monkeypatch.setattr(github_service.fetch_coordinator, "ttl", 0)
+
+    assert github_service.get_closest_commit(url, "main", "31/12/2030 00:00") == (newer, "01/03/2025 00:00")
+
+
+def test_fetch_branches_lists_remote_tracking_branches(tmp_path, monkeypatch):
+    shas = _make_origin(tmp_path, monkeypatch, [("first", "2025-01-01T00:00:00+00:00")])
+    subprocess.run(["git", "-C", str(tmp_path / "origin.git"), "branch", "feature/x", shas[0]], check=True)
+
+    branches = github_service.fetch_branches("my-owner", "my-repo")
+
+    assert sorted(branches) == ["feature/x", "main"]
+    commits = github_service.get_branch_commits("my-owner", "my-repo", "feature/x")
+    assert [c["sha"] for c in commits] == [shas[0]]
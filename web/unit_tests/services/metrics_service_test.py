@@ -3,7 +3,7 @@
 import pytest
 from unittest.mock import Mock
 
-from src.services.metrics_service import calculate_bug_counts_in_range
+from src.services.metrics_service import is_bug_linked_message
 from src.services import metrics_service
 from src.services.metrics_service import MetricsClass
 
@@ -112,32 +112,84 @@ def test_get_commits_in_date_range_uses_services(monkeypatch, mock_services):
     )
 
 
-# ---------- Tests for calculate_bug_counts_in_range ----------
-class TestCalculateBugCountsInRange:
+# ---------- Tests for is_bug_linked_message ----------
+class TestIsBugLinkedMessage:
     
-    @pytest.mark.parametrize("commits,expected", [
-        ([], {"total": 0}),
-        ([{"message": "Refactor code"}, {"message": "Add new feature"}], {"total": 0}),
-        ([{}, {"message": "fix small bug"}, {"msg": "wrong key"}], {"total": 1}),
+    @pytest.mark.parametrize("message,expected", [
+        (None, False),
+        ("", False),
+        ("Refactor code", False),
+        ("Add new feature", False),
+        ("fix small bug", True),
     ])
-    def test_edge_cases(self, commits, expected):
-        """Test edge cases: empty list, no matches, missing keys."""
-        assert calculate_bug_counts_in_range(commits) == expected
-
-    def test_counts_all_matching_commits(self, sample_commits):
-        """Test that all bug/fix related commits are counted."""
-        result = calculate_bug_counts_in_range(sample_commits)
-        assert result == {"total": 4}
-
-    @pytest.mark.parametrize("commits,expected", [
-        ([{"message": "Bug: something happened"}, {"message": "FIX this today"}], 2),
-        ([{"message": "this fixes issue #22"}, {"message": "login flow fixed"}], 2),
-        ([{"message": "BUG found"}, {"message": "fIxEs logout"}], 2),
+    def test_edge_cases(self, message, expected):
+        """Test edge cases: missing message, no matches."""
+        assert is_bug_linked_message(message) == expected
+
+    def test_matches_all_bug_commits(self, sample_commits):
+        """Test that all bug/fix related commits are matched."""
+        result = [is_bug_linked_message(commit["message"]) for commit in sample_commits]
+        assert result == [True, True, True, True, False]
+
+    @pytest.mark.parametrize("message", [
+        "Bug: something happened", "FIX this today",
+        "this fixes issue #22", "login flow fixed",
+        "BUG found", "fIxEs logout",
     ])
-    def test_keyword_variants(self, commits, expected):
+    def test_keyword_variants(self, message):
         """Test different bug/fix keyword variants and case insensitivity."""
-        result = calculate_bug_counts_in_range(commits)
-        assert result["total"] == expected
+        assert is_bug_linked_message(message)
+
+
+# ---------- Tests for the bug-linked commit series ----------
+class TestBugLinkedCommits:
+    def test_classification_is_stored_once(self, app, monkeypatch):
+        from datetime import datetime
+        from src.models import db
+        from src.models.model import Repository, Branch, Commit
+
+        # no relationships between the models, so each parent is committed first
+        for row in (Repository(id='repo0', owner='test', name='test'), Branch(id='branch0', name='main', repository_id='repo0')):
+            db.session.add(row)
+            db.session.commit()
+        messages = {"c0": "Fix crash on login", "c1": "Add feature", "c2": None}
+        db.session.add_all([
+            Commit(id=commit_id, sha=commit_id, date=datetime.now(), author='test', message=message, branch_id='branch0')
+            for commit_id, message in messages.items()
+        ])
+        db.session.commit()
+
+        assert metrics_service.classify_bug_linked_commits(["c0", "c1", "c2"]) == {"c0": True, "c1": False, "c2": False}
+        assert {c.id: c.is_bug_linked for c in Commit.query.all()} == {"c0": True, "c1": False, "c2": False}
+
+        # the stored flags are used, the messages are not matched again
+        monkeypatch.setattr(metrics_service, "is_bug_linked_message", Mock(side_effect=AssertionError))
+        assert metrics_service.classify_bug_linked_commits(["c0", "c1"]) == {"c0": True, "c1": False}
+
+    def test_classification_is_stored_in_the_summary(self, app):
+        from datetime import datetime
+        from src.models import db
+        from src.models.model import Repository, Branch, Commit, CommitMetricSummary
+
+        for row in (
+            Repository(id='repo0', owner='test', name='test'),
+            Branch(id='branch0', name='main', repository_id='repo0'),
+            Commit(id='c0', sha='c0', date=datetime.now(), author='test', message='Fix crash', branch_id='branch0'),
+            CommitMetricSummary(id='s0', commit_id='c0', total_complexity=1, function_count=1),
+        ):
+            db.session.add(row)
+            db.session.commit()
+
+        metrics_service.classify_bug_linked_commits(["c0"])
+
+        assert CommitMetricSummary.query.one().is_bug_linked is True
+
+    def test_series_is_cumulative_and_rolling(self):
+        flags = [True, False, True, True, False, True]
+        assert metrics_service.bug_linked_series(flags, window=3) == [
+            (1, 1), (1, 1), (2, 2), (3, 2), (3, 2), (4, 2)
+        ]
+        assert metrics_service.bug_linked_series([]) == []
 
 
 # ---------- Tests for ensure_metric_snapshot ----------
@@ -167,6 +219,7 @@ class TestEnsureMetricSnapshot:
             "github_service": github_service_mock,
             "calculate_identifiable_identities_analysis": calc_identifiable_mock,
             "calculate_cyclomatic_complexity_analysis": calc_complexity_mock,
+            "_has_incremental_snapshot": Mock(return_value=False),
             "db": mock_db,
         }
         
@@ -202,7 +255,9 @@ class TestEnsureMetricSnapshot:
         mock_complexity_count.side_effect = lambda *args, **kwargs: Mock(**kwargs)
         
         # Mock entities
-        entities = [Mock(id="e1", name="PASSWORD"), Mock(id="e2", name="API_KEY")]
+        entities = [Mock(id="e1"), Mock(id="e2")]
+        entities[0].name = "PASSWORD"
+        entities[1].name = "API_KEY"
         mock_entity_service = Mock()
         mock_entity_service.get_all_identifiable_entities.return_value = entities
         
@@ -210,23 +265,30 @@ class TestEnsureMetricSnapshot:
         mock_file_service = Mock()
         mock_file_service.create_file.side_effect = lambda name, commit_id: Mock(id=f"file-{name}", name=name, commit_id=commit_id)
         
-        # Mock analysis functions
-        def mock_calc_identifiable(file, code):
-            if file.name == "file1.py":
-                return [
-                    {"file": file.name, "start_line": 10, "entity_name": "PASSWORD"},
-                    {"file": file.name, "start_line": 20, "entity_name": "PASSWORD"},
-                ]
-            return [{"file": file.name, "start_line": 5, "entity_name": "API_KEY"}]
-    
-        def mock_calc_complexity(file, code):
-            complexity = 3 if file.name == "file1.py" else 7
-            return [{
-                "file": file.name,
-                "function": f"f{1 if file.name == 'file1.py' else 2}",
-                "start_line": 1,
-                "cyclomatic_complexity": complexity,
-            }]
+        # Mock the analysis workers: (path, functions, entity lines) per file
+        def mock_analyze(files, entity_ids):
+            assert entity_ids == {"PASSWORD": "e1", "API_KEY": "e2"}
+            for filename, code in files:
+                if filename == "file1.py":
+                    yield filename, [("f1", 1, 3)], [("PASSWORD", 10), ("PASSWORD", 20)]
+                else:
+                    yield filename, [("f2", 1, 7)], [("API_KEY", 5)]
+
+        mock_engine = Mock()
+        mock_engine.analyze.side_effect = mock_analyze
+
+        # Mock the bulk writer: records the buffered files
+        written = []
+
+        class FakeWriter:
+            def __init__(self, commit_id):
+                self.commit_id = commit_id
+
+            def add_file(self, name, functions, entity_lines, entity_ids):
+                written.append((name, functions, entity_lines))
+
+            def flush(self):
+                return [Mock(id=f"file-{name}") for name, _, _ in written]
         
         # Mock DB
         mock_db = Mock()
@@ -238,8 +300,10 @@ class TestEnsureMetricSnapshot:
             "ComplexityCount": mock_complexity_count,
             "identifiable_entity_service": mock_entity_service,
             "file_service": mock_file_service,
-            "calculate_identifiable_identities_analysis": mock_calc_identifiable,
-            "calculate_cyclomatic_complexity_analysis": mock_calc_complexity,
+            "analysis_engine": mock_engine,
+            "AnalysisBulkWriter": FakeWriter,
+            "_write_commit_summary": Mock(),
+            "_files_with_duplications": Mock(return_value=set()),
             "db": mock_db,
         }
         
@@ -249,9 +313,11 @@ class TestEnsureMetricSnapshot:
         for service_name, mock_service in mock_services.items():
             monkeypatch.setattr(metrics_service, f"{service_name}_service", mock_service)
 
+        return written
+
     def test_creates_metrics_when_no_snapshot_exists(self, monkeypatch, mock_services, mock_commit, mock_db_session):
         """Test that metrics are created when no snapshot exists."""
-        self._setup_new_snapshot_mocks(monkeypatch, mock_services, mock_commit, mock_db_session)
+        written = self._setup_new_snapshot_mocks(monkeypatch, mock_services, mock_commit, mock_db_session)
         
         metrics = MetricsClass(repo_id=123, branch_id=456)
         result = metrics.ensure_metric_snapshot(mock_commit)
@@ -263,3 +329,408 @@ class TestEnsureMetricSnapshot:
         assert mock_db_session.commit_called
         assert not mock_db_session.rollback_called
         assert len(mock_db_session.added) > 0
+
+        # the analysis results are persisted by the calling process, through the bulk writer
+        assert sorted(written) == [
+            ("file1.py", [("f1", 1, 3)], [("PASSWORD", 10), ("PASSWORD", 20)]),
+            ("file2.py", [("f2", 1, 7)], [("API_KEY", 5)]),
+        ]
+        assert metrics_service.ComplexityCount.call_args.kwargs["total_complexity"] == 10
+        entity_counts = {call.kwargs["identifiable_entity_id"]: call.kwargs["count"] for call in metrics_service.IdentifiableEntityCount.call_args_list}
+        assert entity_counts == {"e1": 2, "e2": 1}
+        # the summary is written in the same transaction, with the two stored files
+        _, _, total_complexity, function_count, file_count = metrics_service._write_commit_summary.call_args.args
+        assert (total_complexity, function_count, file_count) == (10, 2, 2)
+
+
+    def test_completes_an_incremental_snapshot(self, monkeypatch, mock_services, mock_commit, mock_db_session):
+        written = self._setup_new_snapshot_mocks(monkeypatch, mock_services, mock_commit, mock_db_session)
+        # the counts were written by ensure_incremental_snapshot, without files nor duplications
+        metrics_service.IdentifiableEntityCount.query.filter_by.return_value.all.return_value = ["existing"]
+        metrics_service.ComplexityCount.query.filter_by.return_value.first.return_value = "existing"
+        monkeypatch.setattr(metrics_service, "_has_incremental_snapshot", Mock(return_value=True))
+
+        MetricsClass(repo_id=123, branch_id=456).ensure_metric_snapshot(mock_commit)
+
+        assert len(written) == 2
+        # the counts are kept, the summary now counts the duplications
+        assert not metrics_service.IdentifiableEntityCount.called
+        assert not metrics_service.ComplexityCount.called
+        assert metrics_service._write_commit_summary.call_args.kwargs.get("count_duplications", True)
+
+    def test_duplications_are_only_searched_in_files_without_them(self, monkeypatch, mock_services, mock_commit, mock_db_session):
+        from unittest.mock import MagicMock
+
+        self._setup_new_snapshot_mocks(monkeypatch, mock_services, mock_commit, mock_db_session)
+        # file1.py was stored with its duplications by save_commit_and_analyse
+        monkeypatch.setattr(metrics_service, "_files_with_duplications", Mock(return_value={"file-file1.py"}))
+        mock_services['github'].lease_worktree.return_value = MagicMock()
+        controller = Mock()
+        monkeypatch.setattr(metrics_service.DuplicationController, "singleton", Mock(return_value=controller))
+
+        MetricsClass(repo_id=123, branch_id=456).ensure_metric_snapshot(mock_commit)
+
+        _, _, files, _ = controller.find_duplications.call_args.args
+        assert [file.id for file in files] == ["file-file2.py"]
+        # the summary still counts every file of the commit
+        assert metrics_service._write_commit_summary.call_args.args[4] == 2
+
+        # nothing left to analyze, PMD does not run
+        controller.reset_mock()
+        mock_services['github'].lease_worktree.reset_mock()
+        monkeypatch.setattr(metrics_service, "_files_with_duplications", Mock(return_value={"file-file1.py", "file-file2.py"}))
+        MetricsClass(repo_id=123, branch_id=456).ensure_metric_snapshot(mock_commit)
+        assert not mock_services['github'].lease_worktree.called
+        assert not controller.find_duplications.called
+
+    def test_cancelled_snapshot_writes_nothing(self, monkeypatch, mock_services, mock_commit, mock_db_session):
+        from src.services.cancellation import CancellationToken, TaskCancelled
+
+        written = self._setup_new_snapshot_mocks(monkeypatch, mock_services, mock_commit, mock_db_session)
+        token = CancellationToken()
+        token.cancel()
+
+        metrics = MetricsClass(repo_id=123, branch_id=456)
+        with pytest.raises(TaskCancelled):
+            metrics.ensure_metric_snapshot(mock_commit, token)
+
+        assert written == []
+        assert not mock_db_session.commit_called
+        assert mock_db_session.rollback_called
+
+
+# ---------- Tests for ensure_incremental_snapshot ----------
+class TestEnsureIncrementalSnapshot:
+    def _setup_mocks(self, monkeypatch, mock_services, mock_db_session):
+        mock_entity_count = Mock()
+        mock_entity_count.query.filter_by.return_value.all.return_value = []
+        mock_entity_count.side_effect = lambda **kwargs: dict(kwargs, table="identifiable_entity_count")
+
+        mock_complexity_count = Mock()
+        mock_complexity_count.query.filter_by.return_value.first.return_value = None
+        mock_complexity_count.side_effect = lambda **kwargs: dict(kwargs, table="complexity_count")
+
+        entity = Mock(id="e1")
+        entity.name = "TODO"
+        mock_entity_service = Mock()
+        mock_entity_service.get_all_identifiable_entities.return_value = [entity]
+        mock_entity_service.search_identifable_entity.side_effect = lambda code, name: [1] if name in code else []
+
+        mock_db = Mock()
+        mock_db.session = mock_db_session
+
+        patches = {
+            "IdentifiableEntityCount": mock_entity_count,
+            "ComplexityCount": mock_complexity_count,
+            "identifiable_entity_service": mock_entity_service,
+            "_write_commit_summary": Mock(),
+            "db": mock_db,
+        }
+        for attr, mock_obj in patches.items():
+            monkeypatch.setattr(metrics_service, attr, mock_obj)
+
+        for service_name, mock_service in mock_services.items():
+            monkeypatch.setattr(metrics_service, f"{service_name}_service", mock_service)
+
+    def test_only_changed_files_are_analyzed(self, monkeypatch, mock_services, mock_commit, mock_db_session):
+        self._setup_mocks(monkeypatch, mock_services, mock_db_session)
+        github = mock_services['github']
+        github.diff_name_status.return_value = {"a.py": "M", "b.py": "D", "c.py": "A"}
+        github.fetch_files.return_value = [
+            ("a.py", "def f(x):\n    if x:\n        return 1\n    return 0\n"),
+            ("c.py", "# TODO later\ndef g():\n    return 2\n"),
+        ]
+        baseline = metrics_service.SnapshotBaseline("prev", {
+            "a.py": {"total_complexity": 10, "function_count": 3, "entity_counts": {"e1": 4}},
+            "b.py": {"total_complexity": 5, "function_count": 1, "entity_counts": {}},
+            "kept.py": {"total_complexity": 7, "function_count": 2, "entity_counts": {"e1": 1}},
+        })
+
+        metrics = MetricsClass(repo_id=123, branch_id=456)
+        new_baseline = metrics.ensure_incremental_snapshot(mock_commit, baseline)
+
+        github.diff_name_status.assert_called_once_with("test-owner", "test-repo", "prev", "abc123")
+        github.fetch_files.assert_called_once_with("test-owner", "test-repo", "abc123", paths={"a.py", "c.py"})
+        assert new_baseline.sha == "abc123"
+        assert set(new_baseline.file_metrics) == {"a.py", "c.py", "kept.py"}
+        # the baseline passed in is left untouched
+        assert set(baseline.file_metrics) == {"a.py", "b.py", "kept.py"}
+
+        complexity_rows = [row for row in mock_db_session.added if row["table"] == "complexity_count"]
+        entity_rows = [row for row in mock_db_session.added if row["table"] == "identifiable_entity_count"]
+        assert complexity_rows[0]["total_complexity"] == 7 + 2 + 1
+        assert complexity_rows[0]["function_count"] == 2 + 1 + 1
+        assert entity_rows[0]["count"] == 1 + 1
+        # duplications are not analyzed in this mode
+        assert metrics_service._write_commit_summary.call_args.kwargs == {"count_duplications": False}
+        assert mock_db_session.commit_called
+
+    def test_first_commit_is_fully_analyzed(self, monkeypatch, mock_services, mock_commit, mock_db_session):
+        self._setup_mocks(monkeypatch, mock_services, mock_db_session)
+        github = mock_services['github']
+
+        metrics = MetricsClass(repo_id=123, branch_id=456)
+        new_baseline = metrics.ensure_incremental_snapshot(mock_commit)
+
+        github.diff_name_status.assert_not_called()
+        github.fetch_files.assert_called_once_with("test-owner", "test-repo", "abc123")
+        assert set(new_baseline.file_metrics) == {"file1.py", "file2.py"}
+
+
+# ---------- snapshot_commits ----------
+class TestSnapshotCommits:
+    def _setup(self, monkeypatch, delays=None):
+        import threading
+        import time
+        delays = delays or {}
+        calls = []
+        lock = threading.Lock()
+
+        class FakeMetricsClass:
+            def __init__(self, repo_id, branch_id):
+                pass
+
+            def ensure_metric_snapshot(self, commit, cancellation=None):
+                time.sleep(delays.get(commit.sha, 0))
+                with lock:
+                    calls.append((commit.sha, None))
+
+            def ensure_incremental_snapshot(self, commit, baseline=None, cancellation=None):
+                time.sleep(delays.get(commit.sha, 0))
+                with lock:
+                    calls.append((commit.sha, baseline))
+                return commit.sha
+
+        def ensure_commit(found_commit, branch_id):
+            commit = Mock()
+            commit.id = "id-" + found_commit["sha"]
+            commit.sha = found_commit["sha"]
+            return commit
+
+        monkeypatch.setattr(metrics_service, "MetricsClass", FakeMetricsClass)
+        monkeypatch.setattr(metrics_service.commit_service, "ensure_commit_exists_by_sha", ensure_commit)
+        return calls
+
+    def test_results_keep_the_order_of_the_commits(self, app, monkeypatch):
+        # the first commits are the slowest, so they finish last
+        delays = {"c0": 0.2, "c1": 0.1}
+        calls = self._setup(monkeypatch, delays)
+        commits = [{"sha": f"c{i}"} for i in range(6)]
+        progress = []
+
+        commit_ids = metrics_service.snapshot_commits(
+            app, "repo", "branch", commits, max_workers=3,
+            on_snapshot=lambda done, sha, commit_id: progress.append((done, sha))
+        )
+
+        assert commit_ids == [f"id-c{i}" for i in range(6)]
+        assert len(calls) == 6
+        assert [done for done, _ in progress] == [1, 2, 3, 4, 5, 6]
+        assert progress[-1][1] in ("c0", "c1")
+
+    def test_incremental_runs_carry_their_own_baseline(self, app, monkeypatch):
+        calls = self._setup(monkeypatch)
+        commits = [{"sha": f"c{i}"} for i in range(5)]
+
+        commit_ids = metrics_service.snapshot_commits(app, "repo", "branch", commits, incremental=True, max_workers=2)
+
+        assert commit_ids == [f"id-c{i}" for i in range(5)]
+        # runs c0..c2 and c3..c4, each starting without a baseline
+        assert sorted(calls, key=lambda call: call[0]) == [
+            ("c0", None), ("c1", "c0"), ("c2", "c1"), ("c3", None), ("c4", "c3")
+        ]
+
+    def test_failure_is_raised(self, app, monkeypatch):
+        self._setup(monkeypatch)
+
+        def fail(found_commit, branch_id):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(metrics_service.commit_service, "ensure_commit_exists_by_sha", fail)
+
+        with pytest.raises(RuntimeError):
+            metrics_service.snapshot_commits(app, "repo", "branch", [{"sha": "c0"}, {"sha": "c1"}], max_workers=2)
+
+
+    def test_cancellation_stops_before_the_next_commit(self, app, monkeypatch):
+        from src.services.cancellation import CancellationToken, TaskCancelled
+
+        calls = self._setup(monkeypatch)
+        token = CancellationToken()
+
+        with pytest.raises(TaskCancelled):
+            metrics_service.snapshot_commits(
+                app, "repo", "branch", [{"sha": f"c{i}"} for i in range(4)], max_workers=1,
+                on_snapshot=lambda done, sha, commit_id: token.cancel(), cancellation=token
+            )
+
+        assert calls == [("c0", None)]
+
+
+def test_split_contiguous():
+    assert metrics_service._split_contiguous(list("abcde"), 2) == [[0, 1, 2], [3, 4]]
+    assert metrics_service._split_contiguous(list("ab"), 4) == [[0], [1]]
+    assert metrics_service._split_contiguous([], 3) == []
+
+
+# ---------- Tests for the aggregate read path ----------
+class TestDebtEvolutionPoints:
+    def _make_commits(self):
+        from datetime import datetime
+        from src.models import db
+        from src.models.model import (
+            Repository, Branch, Commit, File, CodeFragment, Duplication, IdentifiableEntity, IdentifiableEntityCount, ComplexityCount
+        )
+        from src.utilities.value_range import ValueRange
+
+        fragment = CodeFragment("x = 1\ny = 2\nz = 3\n", 3)
+        date = datetime(2024, 1, 2, 3, 4, 5)
+        # no relationships between the models, so each parent is committed first
+        for rows in (
+            [Repository(id='repo0', owner='test', name='test')],
+            [Branch(id='branch0', name='main', repository_id='repo0')],
+            [Commit(id=f"c{i}", sha=f"sha{i}", date=date, author='me', message=f"m{i}", branch_id='branch0') for i in range(3)],
+            [IdentifiableEntity(id='ie0', name='todo'), IdentifiableEntity(id='ie1', name='fixme')],
+            [File(id=f"f{i}", name=f"{i}.py", commit_id='c0') for i in range(2)] + [fragment],
+            [
+                Duplication(fragment.id, 'f0', 3, ValueRange(1, 3), ValueRange(0, 10)),
+                Duplication(fragment.id, 'f0', 3, ValueRange(7, 9), ValueRange(0, 10)),
+                Duplication(fragment.id, 'f1', 3, ValueRange(1, 3), ValueRange(0, 10)),
+                IdentifiableEntityCount(id='n0', count=2, identifiable_entity_id='ie0', commit_id='c0'),
+                IdentifiableEntityCount(id='n1', count=3, identifiable_entity_id='ie1', commit_id='c0'),
+                IdentifiableEntityCount(id='n2', count=0, identifiable_entity_id='ie0', commit_id='c1'),
+                ComplexityCount(id='cc0', total_complexity=10, function_count=4, average_complexity=2.5, commit_id='c0'),
+                ComplexityCount(id='cc1', total_complexity=1, function_count=1, average_complexity=1.0, commit_id='c1'),
+            ],
+        ):
+            db.session.add_all(rows)
+            db.session.commit()
+
+    def test_points_are_read_in_one_query(self, app):
+        from sqlalchemy import event
+        from src.models import db
+
+        self._make_commits()
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            points = metrics_service._aggregate_debt_evolution_points(["c0", "c1"])
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert len(statements) == 1
+        assert points["c0"] == {
+            "commit_sha": "sha0",
+            "commit_date": "2024-01-02T03:04:05",
+            "commit_author": "me",
+            "commit_message": "m0",
+            "total_identifiable_entities": 5,
+            "entity_breakdown": {"todo": 2, "fixme": 3},
+            "complexity_data": {"total_complexity": 10, "function_count": 4, "average_complexity": 2.5},
+            "total_number_duplications": 3,
+        }
+        assert points["c1"]["entity_breakdown"] == {"todo": 0}
+        assert points["c1"]["total_number_duplications"] == 0
+
+    def test_summaries_are_read_before_the_aggregate(self, app):
+        from src.models import db
+        from src.models.model import Commit, CommitMetricSummary
+
+        self._make_commits()
+        # c1 was analyzed before the summaries existed
+        metrics_service._write_commit_summary(
+            Commit.query.get("c0"), {"ie0": {"name": "todo", "count": 7}}, 12, 3, 2
+        )
+        db.session.commit()
+
+        summary = CommitMetricSummary.query.filter_by(commit_id="c0").one()
+        assert (summary.duplication_count, summary.duplicated_line_count, summary.file_count) == (3, 9, 2)
+        assert summary.is_bug_linked is False
+        # classified with the summary, the commit keeps the same flag
+        assert Commit.query.get("c0").is_bug_linked is False
+
+        points = metrics_service.get_debt_evolution_points(["c0", "c1"])
+
+        assert points["c0"]["entity_breakdown"] == {"todo": 7}
+        assert points["c0"]["complexity_data"] == {"total_complexity": 12, "function_count": 3, "average_complexity": 4.0}
+        assert points["c0"]["total_number_duplications"] == 3
+        assert points["c1"]["complexity_data"]["total_complexity"] == 1
+
+        # written again, e.g. after a retry
+        metrics_service._write_commit_summary(Commit.query.get("c0"), {}, 0, 0, 0, count_duplications=False)
+        db.session.commit()
+        assert CommitMetricSummary.query.count() == 1
+        assert CommitMetricSummary.query.one().duplication_count is None
+
+    def test_snapshotted_commits(self, app):
+        self._make_commits()
+
+        # sha2 has no snapshot, sha3 does not exist
+        assert metrics_service.get_snapshotted_commit_ids(["sha0", "sha1", "sha2", "sha3"]) == {"sha0": "c0", "sha1": "c1"}
+
+    def test_incremental_snapshots_are_not_complete_for_full_mode(self, app):
+        from src.models import db
+        from src.models.model import CommitMetricSummary
+
+        self._make_commits()
+        # c1 was analyzed in incremental mode: counts, but no files nor duplications
+        db.session.add(CommitMetricSummary(id='s1', commit_id='c1', total_complexity=1, function_count=1, duplication_count=None))
+        db.session.commit()
+
+        assert metrics_service.get_snapshotted_commit_ids(["sha0", "sha1"]) == {"sha0": "c0", "sha1": "c1"}
+        assert metrics_service.get_snapshotted_commit_ids(["sha0", "sha1"], full=True) == {"sha0": "c0"}
+        assert metrics_service._has_incremental_snapshot('c1')
+        assert not metrics_service._has_incremental_snapshot('c0')
+
+    def test_files_with_duplications(self, app):
+        from src.models import db
+        from src.models.model import File
+
+        self._make_commits()
+        db.session.add(File(id='f2', name='2.py', commit_id='c0'))
+        db.session.commit()
+
+        assert metrics_service._files_with_duplications('c0') == {'f0', 'f1'}
+        assert metrics_service._files_with_duplications('c1') == set()
+
+
+# ---------- Tests for the sampled series ----------
+class TestSampling:
+    def _commits(self, dates):
+        # newest first, like github_service
+        return [{"sha": f"s{i}", "date": date} for i, date in enumerate(sorted(dates, reverse=True))]
+
+    def test_last_commit_of_each_day_and_the_oldest_commit(self):
+        commits = self._commits([
+            "2024-01-01T09:00:00Z", "2024-01-01T18:00:00Z",
+            "2024-01-02T10:00:00Z",
+            "2024-01-08T10:00:00Z", "2024-01-08T11:00:00Z",
+        ])
+
+        by_day = metrics_service.sample_commits(commits, "day")
+        assert [c["date"] for c in by_day] == [
+            "2024-01-08T11:00:00Z", "2024-01-02T10:00:00Z", "2024-01-01T18:00:00Z", "2024-01-01T09:00:00Z"
+        ]
+
+        by_week = metrics_service.sample_commits(commits, "week")
+        assert [c["date"] for c in by_week] == ["2024-01-08T11:00:00Z", "2024-01-02T10:00:00Z", "2024-01-01T09:00:00Z"]
+
+    def test_every_nth_commit(self):
+        commits = [{"sha": f"s{i}"} for i in range(10)]
+
+        assert [c["sha"] for c in metrics_service.sample_commits(commits, 4)] == ["s0", "s4", "s8", "s9"]
+        assert metrics_service.sample_commits(commits, None) == commits
+        assert metrics_service.sample_commits([], "day") == []
+
+    def test_passes_refine_down_to_every_commit(self):
+        assert metrics_service.refinement_passes(None) == [None]
+        assert metrics_service.refinement_passes("week") == ["week", "day", None]
+        assert metrics_service.refinement_passes(50) == [50, 12, 3, None]
+
+    @pytest.mark.parametrize("value,expected", [
+        ("day", "day"), ("week", "week"), ("10", 10), ("1", None), ("", None), (None, None), ("month", None),
+    ])
+    def test_parse_sampling(self, value, expected):
+        assert metrics_service.parse_sampling(value) == expected
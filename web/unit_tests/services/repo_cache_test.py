@@ -0,0 +1,82 @@
+# repo_cache_test.py
+import os
+
+from src.services import github_service
+from src.services.repo_cache import RepoCache
+from src.services.worktree_pool import get_worktree_pool
+
+
+def _make_clone(root, name, size, last_access):
+    """Fake clone of `size` bytes last accessed at `last_access` (epoch seconds)."""
+    path = root / name
+    (path / ".git").mkdir(parents=True)
+    (path / ".git" / "pack").write_bytes(b"x" * size)
+    os.utime(path, (last_access, last_access))
+    return str(path)
+
+
+def test_enforce_quota_evicts_least_recently_used_clones(tmp_path):
+    oldest = _make_clone(tmp_path, "a__old", 400, 1000)
+    middle = _make_clone(tmp_path, "a__middle", 400, 2000)
+    newest = _make_clone(tmp_path, "a__new", 400, 3000)
+    os.makedirs(oldest + ".worktrees/wt-0")
+
+    cache = RepoCache(quota_bytes=900, min_idle_seconds=0)
+    evicted = cache.enforce_quota(str(tmp_path))
+
+    assert evicted == [oldest]
+    assert not os.path.exists(oldest)
+    assert not os.path.exists(oldest + ".worktrees")
+    assert os.path.exists(middle) and os.path.exists(newest)
+
+
+def test_enforce_quota_never_evicts_held_kept_or_leased_clones(tmp_path, monkeypatch):
+    held = _make_clone(tmp_path, "a__held", 400, 1000)
+    leased = _make_clone(tmp_path, "a__leased", 400, 2000)
+    kept = _make_clone(tmp_path, "a__kept", 400, 3000)
+    idle = _make_clone(tmp_path, "a__idle", 400, 4000)
+
+    pool = get_worktree_pool(leased)
+    monkeypatch.setattr(pool, "leased_count", lambda: 1)
+
+    cache = RepoCache(quota_bytes=500, min_idle_seconds=0)
+    with cache.hold(held):
+        evicted = cache.enforce_quota(str(tmp_path), keep=kept)
+
+    # over quota, but only the idle clone could go
+    assert evicted == [idle]
+    assert os.path.exists(held) and os.path.exists(leased) and os.path.exists(kept)
+    assert not cache.is_held(held)
+
+
+def test_enforce_quota_spares_recently_used_clones(tmp_path):
+    recent = _make_clone(tmp_path, "a__recent", 400, 1000)
+    os.utime(recent)
+
+    cache = RepoCache(quota_bytes=100, min_idle_seconds=3600)
+
+    assert cache.enforce_quota(str(tmp_path)) == []
+    assert os.path.exists(recent)
+
+
+def test_stats_reports_sizes_and_quota(tmp_path):
+    _make_clone(tmp_path, "a__one", 100, 2000)
+    _make_clone(tmp_path, "a__two", 50, 1000)
+
+    stats = RepoCache(quota_bytes=1000).stats(str(tmp_path))
+
+    assert stats["quota_bytes"] == 1000
+    assert stats["total_bytes"] == 150
+    assert stats["repository_count"] == 2
+    # least recently used first
+    assert [entry["name"] for entry in stats["repositories"]] == ["a__two", "a__one"]
+
+
+def test_ensure_local_repo_touches_the_clone(tmp_path, monkeypatch):
+    monkeypatch.setenv("REPO_CACHE_DIR", str(tmp_path))
+    path = _make_clone(tmp_path, "my-owner__my-repo", 10, 1000)
+    monkeypatch.setattr(github_service.subprocess, "check_output", lambda *args, **kwargs: github_service.remote_url("my-owner", "my-repo"))
+
+    github_service.ensure_local_repo("my-owner", "my-repo")
+
+    assert os.path.getmtime(path) > 1000
@@ -0,0 +1,45 @@
+# repository_service_test.py
+from unittest.mock import MagicMock, Mock
+
+from src.models import db
+from src.models.model import Branch, Commit
+from src.services import repository_service
+
+
+def test_onboard_repository_bulk_inserts_branches_and_commits(app, monkeypatch):
+    repo = repository_service.create_repository("test-owner", "test-repo")
+
+    github = MagicMock()
+    github.fetch_branches.return_value = ["main", "dev"]
+    github.get_branch_commits.side_effect = lambda owner, name, branch, max_count: [
+        {"sha": f"{branch}-{i}", "author": "dev", "date": "2025-01-10T10:00:00Z", "message": f"commit {i}"}
+        for i in range(3)
+    ]
+    monkeypatch.setattr(repository_service, "github_service", github)
+
+    result = repository_service.onboard_repository(repo.id)
+
+    assert result == {"branch_count": 2, "commit_count": 6}
+    github.fetch_branches.assert_called_once_with("test-owner", "test-repo")
+
+    branches = {b.name: b for b in db.session.query(Branch).filter_by(repository_id=repo.id).all()}
+    assert set(branches) == {"main", "dev"}
+
+    dev_commits = db.session.query(Commit).filter_by(branch_id=branches["dev"].id).all()
+    assert sorted(c.sha for c in dev_commits) == ["dev-0", "dev-1", "dev-2"]
+
+
+def test_onboard_repository_reports_progress(app, monkeypatch):
+    repo = repository_service.create_repository("test-owner", "test-repo")
+
+    github = MagicMock()
+    github.fetch_branches.return_value = ["main"]
+    github.get_branch_commits.return_value = []
+    monkeypatch.setattr(repository_service, "github_service", github)
+
+    from src.services.task_manager import task_manager
+    task_id = task_manager.create_task("repository_onboarding")
+
+    repository_service.onboard_repository(repo.id, task_id)
+
+    assert task_manager.get_task(task_id).progress == 95
@@ -0,0 +1,86 @@
+# task_executor_test.py
+import threading
+
+from src.services.task_executor import TaskExecutor, default_worker_count
+
+
+def test_tasks_run_by_priority_then_in_arrival_order():
+    executor = TaskExecutor(max_workers=1, priorities={"metrics_calculation": 0, "debt_evolution": 2})
+    started, release, done = threading.Event(), threading.Event(), threading.Event()
+    order = []
+
+    executor.submit("blocker", "debt_evolution", lambda: (started.set(), release.wait()))
+    assert started.wait(timeout=5)
+    assert executor.submit("evolution1", "debt_evolution", lambda: order.append("evolution1")) is not None
+    executor.submit("evolution2", "debt_evolution", lambda: order.append("evolution2"))
+    executor.submit("metrics", "metrics_calculation", lambda: order.append("metrics"))
+    executor.submit("other", "unknown", lambda: (order.append("other"), done.set()))
+
+    assert executor.queued() == ["metrics", "evolution1", "evolution2", "other"]
+    assert executor.position("metrics") == 1
+    assert executor.position("evolution2") == 3
+
+    release.set()
+    assert done.wait(timeout=5)
+    assert order == ["metrics", "evolution1", "evolution2", "other"]
+    assert executor.position("other") is None
+
+
+def test_concurrency_is_bounded():
+    executor = TaskExecutor(max_workers=2)
+    release = threading.Event()
+    running = []
+    lock = threading.Lock()
+    all_started = threading.Barrier(3)
+
+    def task():
+        with lock:
+            running.append(1)
+        if len(running) <= 2:
+            all_started.wait(timeout=5)
+        release.wait()
+
+    for i in range(4):
+        executor.submit(f"t{i}", "debt_evolution", task)
+
+    all_started.wait(timeout=5)
+    # two tasks run, the others wait
+    assert len(running) == 2
+    assert executor.queued() == ["t2", "t3"]
+    release.set()
+
+
+def test_failing_task_does_not_stop_the_worker():
+    executor = TaskExecutor(max_workers=1)
+    done = threading.Event()
+
+    executor.submit("bad", "debt_evolution", lambda: 1 / 0)
+    executor.submit("good", "debt_evolution", done.set)
+
+    assert done.wait(timeout=5)
+
+
+def test_dequeue_reports_the_remaining_tasks():
+    started, release = threading.Event(), threading.Event()
+    reported = []
+    executor = TaskExecutor(max_workers=1, on_dequeue=reported.append)
+
+    executor.submit("t0", "debt_evolution", lambda: (started.set(), release.wait()))
+    assert started.wait(timeout=5)
+    executor.submit("t1", "debt_evolution", lambda: None)
+    executor.submit("t2", "debt_evolution", lambda: None)
+    finished = threading.Event()
+    executor.submit("t3", "debt_evolution", finished.set)
+    release.set()
+
+    assert finished.wait(timeout=5)
+    # t1 left the queue and t2 and t3 moved up, then t2 left; nothing is reported once the queue is empty
+    assert reported == [["t2", "t3"], ["t3"]]
+
+
+def test_default_worker_count(monkeypatch):
+    monkeypatch.setenv("TASK_WORKERS", "3")
+    assert default_worker_count() == 3
+
+    monkeypatch.delenv("TASK_WORKERS")
+    assert default_worker_count() == 2
@@ -0,0 +1,167 @@
+# task_manager_test.py
+import threading
+import time
+from datetime import datetime, timedelta
+
+from src.models import db
+from src.models.model import BackgroundTask
+from src.services.task_executor import TaskExecutor
+from src.services.task_manager import task_key, task_manager
+from src.services.task_store import DatabaseTaskStore
+
+
+def test_data_points_are_streamed_before_completion():
+    task_id = task_manager.create_task("debt_evolution")
+    task_manager.start_task(task_id)
+    task_manager.publish_data_point(task_id, {"commit_sha": "a"})
+    task_manager.publish_data_point(task_id, {"commit_sha": "b"})
+    task_manager.complete_task(task_id, [{"commit_sha": "a"}, {"commit_sha": "b"}])
+
+    events = list(task_manager.get_task_updates(task_id))
+
+    assert [event["type"] for event in events] == ["update", "data_point", "data_point", "update"]
+    assert [event["data"]["commit_sha"] for event in events if event["type"] == "data_point"] == ["a", "b"]
+    assert events[-1]["data"]["status"] == "completed"
+    # kept on the task, for the clients that connect later
+    assert task_manager.get_data_points(task_id) == [{"commit_sha": "a"}, {"commit_sha": "b"}]
+
+
+def test_data_point_of_unknown_task_is_ignored():
+    task_manager.publish_data_point("missing", {"commit_sha": "a"})
+
+
+def test_tasks_of_the_database_store_are_streamed_to_late_subscribers(app):
+    previous = task_manager.store
+    task_manager.use_store(DatabaseTaskStore(app))
+    try:
+        task_id = task_manager.create_task("debt_evolution")
+        task_manager.start_task(task_id)
+        task_manager.publish_data_point(task_id, {"commit_sha": "a"})
+        # a client connecting now only follows what comes next
+        cursor = task_manager.event_cursor(task_id)
+        task_manager.complete_task(task_id, [{"commit_sha": "a"}])
+
+        events = list(task_manager.get_task_updates(task_id, cursor=cursor))
+
+        assert [event["type"] for event in events] == ["update"]
+        assert events[0]["data"]["status"] == "completed"
+        assert task_manager.get_task(task_id).result == [{"commit_sha": "a"}]
+        assert task_manager.get_data_points(task_id) == [{"commit_sha": "a"}]
+    finally:
+        task_manager.use_store(previous)
+
+
+def test_queued_task_reports_its_position():
+    previous = task_manager.executor
+    task_manager.executor = TaskExecutor(max_workers=1, on_dequeue=task_manager._report_queue_positions)
+    started, release = threading.Event(), threading.Event()
+    try:
+        running = task_manager.create_task("debt_evolution")
+        task_manager.run_task_in_background(running, lambda task_id: (started.set(), release.wait()))
+        assert started.wait(timeout=5)
+
+        queued = task_manager.create_task("debt_evolution")
+        task_manager.run_task_in_background(queued, lambda task_id: "done")
+
+        task = task_manager.get_task(queued)
+        assert (task.status, task.to_dict()["queue_position"]) == ("pending", 1)
+        assert task_manager.get_task(running).to_dict()["queue_position"] is None
+
+        release.set()
+        events = list(task_manager.get_task_updates(queued))
+        assert events[-1]["data"]["status"] == "completed"
+        assert events[-1]["data"]["queue_position"] is None
+    finally:
+        release.set()
+        task_manager.executor = previous
+
+
+def test_same_idempotency_key_attaches_to_the_unfinished_task():
+    key = task_key("debt_evolution", "repo0", "branch0", "01/01/2024 00:00", "31/01/2024 23:59")
+    task_id, created = task_manager.create_or_get_task("debt_evolution", key)
+    assert created
+
+    # e.g. the page refreshed while the task runs
+    task_manager.start_task(task_id)
+    assert task_manager.create_or_get_task("debt_evolution", key) == (task_id, False)
+    assert task_manager.create_task("debt_evolution", key) == task_id
+    # another range is another task
+    assert task_manager.create_or_get_task("debt_evolution", task_key("debt_evolution", "repo0", "branch0", "01/02/2024 00:00", "29/02/2024 23:59"))[1]
+
+    task_manager.complete_task(task_id, [])
+    new_task_id, created = task_manager.create_or_get_task("debt_evolution", key)
+    assert created and new_task_id != task_id
+
+
+def test_cancel_stops_a_running_task():
+    started, stopped = threading.Event(), threading.Event()
+
+    def work(task_id):
+        token = task_manager.cancellation_token(task_id)
+        started.set()
+        try:
+            while True:
+                token.check()
+                time.sleep(0.01)
+        finally:
+            stopped.set()
+
+    task_id = task_manager.create_task("debt_evolution")
+    task_manager.run_task_in_background(task_id, work)
+    assert started.wait(timeout=5)
+
+    task_manager.cancel_task(task_id)
+    events = list(task_manager.get_task_updates(task_id))
+
+    assert events[-1]["data"]["status"] == "failed"
+    assert events[-1]["data"]["error"] == "Cancelled by user"
+    # the work stopped, and the task was not completed after it
+    assert stopped.wait(timeout=5)
+    time.sleep(0.1)
+    assert task_manager.get_task(task_id).status == "failed"
+
+
+def test_task_cancelled_while_queued_never_runs():
+    previous = task_manager.executor
+    task_manager.executor = TaskExecutor(max_workers=1)
+    started, release, done = threading.Event(), threading.Event(), threading.Event()
+    ran = []
+    try:
+        running = task_manager.create_task("debt_evolution")
+        task_manager.run_task_in_background(running, lambda task_id: (started.set(), release.wait()))
+        assert started.wait(timeout=5)
+
+        queued = task_manager.create_task("debt_evolution")
+        task_manager.run_task_in_background(queued, lambda task_id: ran.append(task_id))
+        task_manager.cancel_task(queued)
+
+        task_manager.executor.submit("marker", "debt_evolution", done.set)
+        release.set()
+        assert done.wait(timeout=5)
+
+        assert ran == []
+        assert task_manager.get_task(queued).status == "failed"
+    finally:
+        release.set()
+        task_manager.executor = previous
+
+
+
+def test_heartbeat_touches_the_queued_and_running_tasks(app):
+    previous = task_manager.store
+    task_manager.use_store(DatabaseTaskStore(app, stale_seconds=60))
+    release = threading.Event()
+    try:
+        task_id = task_manager.create_task("debt_evolution")
+        task_manager.run_task_in_background(task_id, lambda task_id: release.wait())
+        assert task_manager._heartbeat.is_alive()
+
+        # a long step, nothing updates the task for a while
+        BackgroundTask.query.filter_by(id=task_id).update({"updated_at": datetime.now() - timedelta(minutes=5)})
+        db.session.commit()
+        task_manager.touch_tasks()
+
+        assert task_manager.get_task(task_id).status in ("pending", "running")
+    finally:
+        release.set()
+        task_manager.use_store(previous)
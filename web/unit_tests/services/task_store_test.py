@@ -0,0 +1,112 @@
+# task_store_test.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.models import db
+from src.models.model import BackgroundTask
+from src.services.task_manager import Task
+from src.services.task_store import DatabaseTaskStore, InMemoryTaskStore, create_task_store
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request, app):
+    if request.param == "database":
+        return DatabaseTaskStore(app)
+    return InMemoryTaskStore()
+
+
+def test_task_state_roundtrip(store):
+    store.add(Task("t1", "debt_evolution"))
+    started = datetime.now()
+    task = store.update("t1", {"status": "running", "progress": 40, "started_at": started, "partial_result": [{"date": started}]})
+
+    assert task.status == "running"
+    stored = store.get("t1")
+    assert (stored.task_type, stored.status, stored.progress) == ("debt_evolution", "running", 40)
+    assert stored.started_at == started
+    assert store.get("missing") is None
+    assert store.update("missing", {"status": "running"}) is None
+
+
+def test_events_are_read_after_a_cursor(store):
+    store.add(Task("t1", "debt_evolution"))
+    store.append_event("t1", {"type": "data_point", "data": {"commit_sha": "a"}})
+    cursor = store.last_cursor("t1")
+    store.append_event("t1", {"type": "data_point", "data": {"commit_sha": "b"}})
+    store.append_event("t1", {"type": "update", "data": {"status": "running"}})
+
+    events, cursor = store.read_events("t1", cursor, wait=0)
+    assert [event["type"] for event in events] == ["data_point", "update"]
+    assert events[0]["data"] == {"commit_sha": "b"}
+    # nothing new, the same cursor comes back
+    assert store.read_events("t1", cursor, wait=0) == ([], cursor)
+    assert store.data_points("t1") == [{"commit_sha": "a"}, {"commit_sha": "b"}]
+
+
+def test_remove_finished_before(store):
+    now = datetime.now()
+    for task_id, status, completed_at in (("old", "completed", now - timedelta(hours=2)), ("new", "failed", now), ("running", "running", None)):
+        store.add(Task(task_id, "debt_evolution"))
+        store.update(task_id, {"status": status, "completed_at": completed_at})
+    store.append_event("old", {"type": "update", "data": {}})
+
+    assert store.remove_finished_before(now - timedelta(hours=1)) == 1
+    assert store.get("old") is None
+    assert store.get("new") is not None and store.get("running") is not None
+
+
+def test_database_store_fails_tasks_of_a_stopped_worker(app):
+    store = DatabaseTaskStore(app, stale_seconds=60)
+    store.add(Task("t1", "debt_evolution"))
+    store.update("t1", {"status": "running"})
+    BackgroundTask.query.filter_by(id="t1").update({"updated_at": datetime.now() - timedelta(minutes=5)})
+    db.session.commit()
+
+    task = store.get("t1")
+    assert task.status == "failed"
+    assert task.completed_at is not None
+
+
+def test_create_task_store(app, monkeypatch):
+    monkeypatch.delenv("TASK_STORE", raising=False)
+    assert isinstance(create_task_store(app), InMemoryTaskStore)
+
+    monkeypatch.setenv("TASK_STORE", "database")
+    assert isinstance(create_task_store(app), DatabaseTaskStore)
+
+
+def test_add_returns_the_unfinished_task_with_the_same_key(store):
+    first = Task("t1", "debt_evolution", "key")
+    assert store.add(first) is first
+    assert store.add(Task("t2", "debt_evolution", "key")).task_id == "t1"
+    # tasks without key are never merged
+    assert store.add(Task("t3", "debt_evolution")).task_id == "t3"
+    assert store.add(Task("t4", "debt_evolution")).task_id == "t4"
+
+    store.update("t1", {"status": "failed"})
+    assert store.add(Task("t5", "debt_evolution", "key")).task_id == "t5"
+
+
+def test_database_store_replaces_the_task_of_a_stopped_worker(app):
+    store = DatabaseTaskStore(app, stale_seconds=60)
+    store.add(Task("t1", "debt_evolution", "key"))
+    BackgroundTask.query.filter_by(id="t1").update({"updated_at": datetime.now() - timedelta(minutes=5)})
+    db.session.commit()
+
+    assert store.add(Task("t2", "debt_evolution", "key")).task_id == "t2"
+    assert store.get("t1").status == "failed"
+
+
+def test_heartbeat_keeps_queued_tasks_alive(app):
+    store = DatabaseTaskStore(app, stale_seconds=60)
+    store.add(Task("t1", "debt_evolution"))
+    store.add(Task("t2", "debt_evolution"))
+    # e.g. waiting in the queue behind long tasks, nothing updated it
+    BackgroundTask.query.update({"updated_at": datetime.now() - timedelta(minutes=5)})
+    db.session.commit()
+
+    store.touch(["t1"])
+
+    assert store.get("t1").status == "pending"
+    assert store.get("t2").status == "failed"
@@ -0,0 +1,113 @@
+# worktree_pool_test.py
+import subprocess
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.services.worktree_pool import WorktreePool
+
+
+def _git(path, *args):
+    return subprocess.check_output(["git", "-C", str(path), *args], text=True, stderr=subprocess.DEVNULL).strip()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A repo with two commits, returns (path, [sha1, sha2])."""
+    path = tmp_path / "owner__repo"
+    path.mkdir()
+    _git(path, "init", "-q")
+    shas = []
+    for version in ("one", "two"):
+        (path / "main.py").write_text(f"version = '{version}'\n")
+        _git(path, "add", "-A")
+        _git(path, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "-q", "-m", version)
+        shas.append(_git(path, "rev-parse", "HEAD"))
+    return path, shas
+
+
+def _head(path):
+    return _git(path, "rev-parse", "HEAD")
+
+
+def test_concurrent_leases_get_separate_worktrees(repo):
+    path, (sha1, sha2) = repo
+    pool = WorktreePool(str(path), size=2)
+
+    with pool.lease(sha1) as wt1, pool.lease(sha2) as wt2:
+        assert wt1 != wt2
+        assert _head(wt1) == sha1
+        assert _head(wt2) == sha2
+        assert pool.leased_count() == 2
+
+    assert pool.leased_count() == 0
+
+
+def test_release_reuses_worktree_at_same_commit(repo):
+    path, (sha1, sha2) = repo
+    pool = WorktreePool(str(path), size=2)
+
+    with pool.lease(sha1) as wt1, pool.lease(sha2) as wt2:
+        pass
+
+    # the worktree already at sha2 is preferred over the least recently used one
+    with pool.lease(sha2) as again:
+        assert again == wt2
+
+    # otherwise the least recently used free worktree is checked out again
+    with pool.lease(sha2):
+        with pool.lease(sha2) as lru:
+            assert lru == wt1
+            assert _head(lru) == sha2
+
+
+def test_lease_blocks_when_pool_is_exhausted(repo):
+    path, (sha1, sha2) = repo
+    pool = WorktreePool(str(path), size=1)
+
+    with pool.lease(sha1):
+        with pytest.raises(TimeoutError):
+            pool.acquire(sha2, timeout=0.1)
+
+        leased = []
+        waiter = threading.Thread(target=lambda: leased.append(pool.acquire(sha2, timeout=5)))
+        waiter.start()
+
+    waiter.join(timeout=5)
+    assert len(leased) == 1
+    assert _head(leased[0]) == sha2
+
+
+def test_slot_whose_worktree_could_not_be_added_is_added_again(repo):
+    path, (sha1, sha2) = repo
+    pool = WorktreePool(str(path), size=1)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        pool.acquire("0" * 40)
+
+    with pool.lease(sha2) as wt:
+        assert _head(wt) == sha2
+
+
+def test_sparse_worktree_of_a_partial_clone_only_fetches_the_matching_blobs(repo, tmp_path):
+    path, (sha1, sha2) = repo
+    (path / "image.png").write_bytes(b"\x89PNG" + bytes(range(256)) * 64)
+    _git(path, "add", "-A")
+    _git(path, "-c", "user.name=test", "-c", "user.email=test@test", "commit", "-q", "-m", "image")
+    sha3 = _git(path, "rev-parse", "HEAD")
+    _git(path, "config", "uploadpack.allowfilter", "true")
+    _git(path, "config", "uploadpack.allowanysha1inwant", "true")
+
+    clone = tmp_path / "clone"
+    subprocess.run(["git", "clone", "-q", "--filter=blob:none", "--no-checkout", f"file://{path}", str(clone)], check=True)
+    pool = WorktreePool(str(clone), size=1, sparse_patterns=["*.py"])
+
+    with pool.lease(sha3) as wt:
+        assert _head(wt) == sha3
+        assert (Path(wt) / "main.py").exists()
+        assert not (Path(wt) / "image.png").exists()
+
+    image_oid = _git(clone, "rev-parse", f"{sha3}:image.png")
+    missing = _git(clone, "rev-list", "--objects", "--no-walk", "--missing=print", sha3)
+    assert f"?{image_oid}" in missing.splitlines()
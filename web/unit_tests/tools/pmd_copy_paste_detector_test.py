@@ -2,6 +2,7 @@ from src.tools.pmd_copy_paste_detector import PMD_CopyPasteDetector
 from src.utilities.json_encoder import JsonEncoder
 from src.reports.duplication_report import DuplicationReport
 from src.utilities.value_range import ValueRange
+import os
 import re
 
 #def test_run_python(): 
@@ -31,7 +32,7 @@ def test_run():
             LocalToolMock.params_valid &= dir == "/app/unit_tests/tools"
             return "/app/unit_tests/tools/"
 
-        def _start_pmd(self, language_id, dir):
+        def _start_pmd(self, language_id, dir, cancellation=None, paths=None):
             LocalToolMock.start_pmd_called += 1
             LocalToolMock.params_valid &= language_id != ".invalid_extension"
             LocalToolMock.params_valid &= dir == "/app/unit_tests/tools/"
@@ -58,6 +59,59 @@ def test_run():
     assert result[0]._files[0].columns.To == 1
     return
 
+def test_run__paths():
+    # arrange
+    class LocalToolMock(PMD_CopyPasteDetector):
+        def __init__(self):
+            self.runs = {}
+
+        def _start_pmd(self, language_id, dir, cancellation=None, paths=None):
+            self.runs[language_id] = paths
+            return "<xml></xml>"
+
+        def _read_xml(self, text, dir):
+            return []
+
+    mock = LocalToolMock()
+
+    # act
+    mock.run("/repo", {".c", ".h", ".py", ".js"}, paths=["a.c", "include/a.h", "b.py"])
+
+    # assert: one run per language with its files, none for a language without files
+    assert mock.runs == {"cpp": ["a.c", "include/a.h"], "python": ["b.py"]}
+    return
+
+def test__start_pmd__file_list(monkeypatch):
+    # arrange
+    import src.tools.pmd_copy_paste_detector as pmd_module
+    started = {}
+
+    class PopenMock:
+        def __init__(self, args, **kwargs):
+            started["args"] = args
+            with open(args[args.index("--file-list") + 1]) as f:
+                started["file_list"] = f.read()
+
+        def communicate(self):
+            return "<xml></xml>", ""
+
+        def poll(self):
+            return 0
+
+    monkeypatch.setattr(pmd_module, "Popen", PopenMock)
+    tool = PMD_CopyPasteDetector()
+
+    # act
+    output = tool._start_pmd("python", "/repo/", paths=["a.py", "src/b.py"])
+
+    # assert
+    assert output == "<xml></xml>"
+    assert "--dir" not in started["args"]
+    assert started["file_list"] == "/repo/a.py\n/repo/src/b.py\n"
+    # the list is removed once PMD is done
+    assert not os.path.exists(started["args"][started["args"].index("--file-list") + 1])
+    return
+
 def test_run_no_extensions():
     # arrange
     tool = PMD_CopyPasteDetector()
@@ -0,0 +1,39 @@
+from src.utilities.entity_scanner import EntityScanner, get_entity_scanner
+
+
+def test_scan_reports_each_entity_once_per_line():
+    code = (
+        "# TODO: first\n"
+        "x = 1  # todo todo\n"
+        "todos = []\n"
+        "# FIXME and TODO\r\n"
+        "done"
+    )
+
+    found = EntityScanner(["todo", "fixme"]).scan(code)
+
+    assert found == {"todo": [1, 2, 4], "fixme": [4]}
+
+
+def test_scan_numbers_lines_like_splitlines():
+    code = "a\rb\x85TODO c\n\ntodo"
+
+    found = EntityScanner(["todo"]).scan(code)
+
+    expected = [i for i, line in enumerate(code.splitlines(), start=1) if "todo" in line.lower()]
+    assert found["todo"] == expected == [3, 6]
+
+
+def test_scan_finds_entities_matching_at_the_same_offset():
+    found = EntityScanner(["fix", "fix me", "fixme"]).scan("fix me\nfixme\nprefix")
+
+    assert found == {"fix": [1], "fix me": [1], "fixme": [2]}
+
+
+def test_scan_without_entities():
+    assert EntityScanner([]).scan("TODO") == {}
+
+
+def test_scanner_is_cached_per_catalogue():
+    assert get_entity_scanner(("todo", "fixme")) is get_entity_scanner(("todo", "fixme"))
+    assert get_entity_scanner(("todo",)) is not get_entity_scanner(("todo", "fixme"))
@@ -0,0 +1,46 @@
+from src.utilities.source_filter import SourceFilter
+
+def test_excludes_vendored_directories():
+    # arrange
+    source_filter = SourceFilter()
+
+    # assert
+    assert source_filter.is_excluded("node_modules/react/index.js")
+    assert source_filter.is_excluded("src/vendor/lib.php")
+    assert source_filter.is_excluded("dist/app.js")
+    assert source_filter.is_excluded("static/app.min.js")
+    assert not source_filter.is_excluded("src/distance.py")
+    assert not source_filter.is_excluded("vendor.py")
+
+def test_gitignore_rules():
+    # arrange
+    source_filter = SourceFilter()
+    source_filter.add_gitignore("", "# comment\nbuild/\n/root_only.py\n*.pb.go\n!keep.pb.go\ndocs/**/gen_*.py\n")
+    source_filter.add_gitignore("sub", "local.py\n")
+
+    # assert
+    assert source_filter.is_excluded("build/out.py")
+    assert source_filter.is_excluded("a/build/out.py")
+    assert not source_filter.is_excluded("build.py")
+    assert source_filter.is_excluded("root_only.py")
+    assert not source_filter.is_excluded("a/root_only.py")
+    assert source_filter.is_excluded("api/service.pb.go")
+    assert not source_filter.is_excluded("api/keep.pb.go")
+    assert source_filter.is_excluded("docs/x/y/gen_api.py")
+    assert source_filter.is_excluded("docs/gen_api.py")
+    assert source_filter.is_excluded("sub/local.py")
+    assert source_filter.is_excluded("sub/deep/local.py")
+    assert not source_filter.is_excluded("local.py")
+
+def test_size_binary_and_minified_detection():
+    # arrange
+    source_filter = SourceFilter(max_file_bytes=100)
+
+    # assert
+    assert source_filter.is_too_large(101)
+    assert not source_filter.is_too_large(100)
+    assert source_filter.is_binary(b"\x7fELF\x00\x01")
+    assert not source_filter.is_binary(b"print('x')\n")
+    assert source_filter.is_minified("var a=1;" * 500)
+    assert not source_filter.is_minified("var a = 1;\n" * 500)
+    assert not SourceFilter().is_too_large(10 ** 9)